@@ -51,6 +51,19 @@ class Cli:
                     "max_worker_threads_per_table": int(
                         cast(str, config.safe_get("riab", "max_worker_threads_per_table", "16"))
                     ),
+                    "max_parallel_upload_queries": int(
+                        cast(str, config.safe_get("riab", "max_parallel_upload_queries", "16"))
+                    ),
+                    "max_parallel_mappings": int(cast(str, config.safe_get("riab", "max_parallel_mappings", "16"))),
+                    "max_concurrent_db_operations": int(
+                        cast(str, config.safe_get("riab", "max_concurrent_db_operations", "16"))
+                    ),
+                    "upload_query_shards": int(cast(str, config.safe_get("riab", "upload_query_shards", "4"))),
+                    "vocabulary_index": config.safe_get("riab", "vocabulary_index"),
+                    "vocabulary_manifest": config.safe_get("riab", "vocabulary_manifest"),
+                    "vocabulary_snapshots": config.safe_get("riab", "vocabulary_snapshots"),
+                    "csv_cache": config.safe_get("riab", "csv_cache"),
+                    "csv_cache_max_size": int(cast(str, config.safe_get("riab", "csv_cache_max_size", "1024"))),
                 }
 
                 match db_engine:
@@ -64,6 +77,9 @@ class Cli:
                             "dataset_dqd": config.safe_get(db_engine, "dataset_dqd", "dqd"),
                             "dataset_achilles": config.safe_get(db_engine, "dataset_achilles", "achilles"),
                             "bucket": config.safe_get(db_engine, "bucket"),
+                            "max_concurrent_jobs": int(
+                                cast(str, config.safe_get(db_engine, "max_concurrent_jobs", "50"))
+                            ),
                         }
                     case "sql_server":
                         sqlserver_kwargs = {
@@ -88,6 +104,7 @@ class Cli:
                             ).lower()
                             in ["true", "1", "yes"],
                             "bcp_code_page": config.safe_get(db_engine, "bcp_code_page", "ACP"),
+                            "max_connections": int(cast(str, config.safe_get(db_engine, "max_connections", "15"))),
                         }
                     case _:
                         raise ValueError("Not a supported database engine: '{db_engine}'")
@@ -188,6 +205,8 @@ class Cli:
                             with BigQueryImportVocabularies(
                                 **etl_kwargs,
                                 **bigquery_kwargs,
+                                incremental=args.incremental,
+                                vocabulary_subset=args.vocabulary_subset,
                             ) as import_vocabularies:
                                 import_vocabularies.run(args.import_vocabularies)
                         case "sql_server":
@@ -196,6 +215,8 @@ class Cli:
                             with SqlServerImportVocabularies(
                                 **etl_kwargs,
                                 **sqlserver_kwargs,
+                                incremental=args.incremental,
+                                vocabulary_subset=args.vocabulary_subset,
                             ) as import_vocabularies:
                                 import_vocabularies.run(args.import_vocabularies)
                         case _:
@@ -213,6 +234,13 @@ class Cli:
                                 skip_usagi_and_custom_concept_upload=args.skip_usagi_and_custom_concept_upload,
                                 process_semi_approved_mappings=args.process_semi_approved_mappings,
                                 skip_event_fks_step=args.skip_event_fks_step,
+                                pipeline_upload_queries=args.pipeline_upload_queries,
+                                resume=args.resume,
+                                skip_unchanged_tables=args.skip_unchanged_tables,
+                                incremental=args.incremental,
+                                combined_mapping_load=args.combined_mapping_load,
+                                plan=args.plan,
+                                trace=args.trace,
                                 **bigquery_kwargs,
                             ) as etl:
                                 etl.run()
@@ -227,6 +255,13 @@ class Cli:
                                 skip_usagi_and_custom_concept_upload=args.skip_usagi_and_custom_concept_upload,
                                 process_semi_approved_mappings=args.process_semi_approved_mappings,
                                 skip_event_fks_step=args.skip_event_fks_step,
+                                pipeline_upload_queries=args.pipeline_upload_queries,
+                                resume=args.resume,
+                                skip_unchanged_tables=args.skip_unchanged_tables,
+                                incremental=args.incremental,
+                                combined_mapping_load=args.combined_mapping_load,
+                                plan=args.plan,
+                                trace=args.trace,
                                 **sqlserver_kwargs,
                             ) as etl:
                                 etl.run()
@@ -474,8 +509,9 @@ ______      _     _     _ _     _                ______ _                _
             nargs="?",
             type=str,
             help="""Extracts the vocabulary zip file (downloaded from the Athena website) and imports it
-            into the OMOP CDM database.""",
-            metavar="VOCABULARIES_ZIP_FILE",
+            into the OMOP CDM database. Instead of a zip file, the id of a local vocabulary snapshot
+            (the SHA-256 hash of the zip file) can be given.""",
+            metavar="VOCABULARIES_ZIP_FILE_OR_SNAPSHOT_ID",
         )
         argument_group.add_argument(
             "-r",
@@ -579,6 +615,71 @@ ______      _     _     _ _     _                ______ _                _
             Skipping results in a significant speed boost.""",
             action="store_true",
         )
+        argument_group.add_argument(
+            "-pu",
+            "--pipeline-upload-queries",
+            help="""Start the upload queries of all tables right away, instead of waiting on the foreign key order.
+            Only the swap and merge steps will wait on the foreign key order.
+            The number of parallel upload queries is limited by the max_parallel_upload_queries config option.""",
+            action="store_true",
+        )
+        argument_group.add_argument(
+            "-rs",
+            "--resume",
+            help="""Resume a failed ETL run (the run id is logged at the start of each ETL run).
+            The steps that were completed in that run, and whose inputs (queries, Usagi and custom concept CSV's)
+            haven't changed, are skipped. Only the runs started with --skip-unchanged-tables or --incremental (and
+            resumed runs) record their completed steps, and can be resumed.""",
+            type=str,
+            metavar="RUN_ID",
+        )
+        argument_group.add_argument(
+            "-su",
+            "--skip-unchanged-tables",
+            help="""Skip the tables whose inputs didn't change since their last ETL.
+            The fingerprint of a table covers its rendered queries, its Usagi and custom concept CSV's and the
+            fingerprints of the tables it has foreign keys to. Changes in the raw data are not detected!""",
+            action="store_true",
+        )
+        argument_group.add_argument(
+            "-in",
+            "--incremental",
+            help="""Incremental merge: instead of rebuilding the OMOP tables, only the rows of the uploaded keys are
+            replaced. The Jinja upload queries get a 'watermark' variable (the start of the run that last merged the
+            table, in UTC), so they can only select the rows that changed since then. The keys of those queries are
+            also loaded without the watermark, to remove the rows that were deleted or filtered out in the source.
+            With --import-vocabularies: only the rows that changed since the loaded release (diffed against the local
+            vocabulary manifest) are deleted and inserted, instead of truncating and refilling the tables. A vocabulary
+            table whose row count differs from the row count in the manifest is fully imported.""",
+            action="store_true",
+        )
+        argument_group.add_argument(
+            "-cm",
+            "--combined-mapping-load",
+            help="""Load the Usagi CSV's of the whole CDM folder in one combined mapping table, and the custom concept
+            CSV's in another, each with one load at the start of the ETL, instead of one upload table per concept
+            column. The per concept column upload tables become views on the combined tables.""",
+            action="store_true",
+        )
+        argument_group.add_argument(
+            "-pl",
+            "--plan",
+            help="""Plan mode: walk through the ETL without running anything and without a database connection.
+            Every statement that would run (rendered queries, swap, merge and event column templates, uploads) is
+            written in order to the plan file, with the dependency level of its table and the thread it came from.
+            On SQL Server this includes the DROP and ADD CONSTRAINT statements of the foreign keys around the merges.""",
+            type=str,
+            metavar="FILE",
+        )
+        argument_group.add_argument(
+            "-tr",
+            "--trace",
+            help="""Record every ETL step and database operation as a span (start, duration, thread, table, concept
+            column or query, SQL fingerprint, rows affected and for BigQuery the bytes processed and slot time) in
+            this trace file. The trace file can be opened in chrome://tracing or https://ui.perfetto.dev.""",
+            type=str,
+            metavar="FILE",
+        )
         argument_group.add_argument(
             "-q",
             "--only-query",
@@ -628,6 +729,20 @@ ______      _     _     _ _     _                ______ _                _
             action="append",
         )
 
+    def _create_import_vocabularies_command_argument_group(self, parser: ArgumentParser):
+        argument_group = parser.add_argument_group("Import vocabularies specific arguments")
+        argument_group.add_argument(
+            "-vs",
+            "--vocabulary-subset",
+            help="""Only import the subset of the vocabularies that is referenced by the Usagi CSV's of this CDM folder
+            (for development and test environments). The concept, concept_relationship, concept_ancestor,
+            concept_synonym and drug_strength tables are filtered to the mapped concepts, the concepts they relate to,
+            their ancestors, their drug strengths and the concepts of the domains, vocabularies, concept classes and
+            relationships. The other vocabulary tables are imported whole.""",
+            type=str,
+            metavar="PATH",
+        )
+
     def _create_cleanup_command_argument_group(self, parser: ArgumentParser):
         argument_group = parser.add_argument_group("Cleanup specific arguments")
         argument_group.add_argument(
@@ -671,6 +786,7 @@ ______      _     _     _ _     _                ______ _                _
         )
 
         self._create_etl_command_argument_group(parser)
+        self._create_import_vocabularies_command_argument_group(parser)
         self._create_cleanup_command_argument_group(parser)
         self._create_data_quality_command_argument_group(parser)
         self._create_data_quality_dashboard_command_argument_group(parser)
@@ -3,12 +3,12 @@
 
 import logging
 import sys
-from datetime import date
+from datetime import date, datetime
 from importlib import metadata
 from pathlib import Path
 from typing import Any, Optional, cast
 
-from google.cloud.bigquery import ScalarQueryParameter
+from google.cloud.bigquery import ScalarQueryParameter, WriteDisposition
 from google.cloud.exceptions import NotFound
 from polars import Config as pl_Config
 from polars import DataFrame, col, from_arrow
@@ -176,35 +176,45 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
                     f"Duplicate custom concepts supplied in the custom concept CSV's for column '{concept_id_column}' of table '{omop_table}'\n{df}\n\n{sql}"
                 )
 
-    def _give_custom_concepts_an_unique_id_above_2bilj(self, omop_table: str, concept_id_column: str) -> None:
-        """Give the custom concepts an unique id (above 2.000.000.000) and store those id's in the concept id swap table.
+    def _load_custom_concept_codes_parquet_in_staging_table(self, parquet_file: Path) -> None:
+        """The custom concept codes of the run are saved in a parquet file.
+        This method replaces the content of the concept id swap staging table with the parquet file.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
+            parquet_file (Path): The path to the parquet file
+        """
+        # upload the Parquet file to the Cloud Storage Bucket
+        uri = self._gcp.upload_file_to_bucket(str(parquet_file), self._bucket_uri)
+        # load the uploaded Parquet file from the bucket in the concept id swap staging table in the work dataset
+        self._gcp.batch_load_from_bucket_into_bigquery_table(
+            uri,
+            self._dataset_work,
+            "concept_id_swap_staging",
+            write_disposition=WriteDisposition.WRITE_TRUNCATE,
+        )
+
+    def _give_the_staged_custom_concepts_an_unique_id(self) -> None:
+        """Gives the staged custom concepts that aren't in the concept id swap table yet an unique id (above 2.000.000.000), in one statement on the database.
+        The new id's follow the highest id in the concept id swap table.
         """  # noqa: E501 # pylint: disable=line-too-long
-        template = self._template_env.get_template("etl/CONCEPT_ID_swap_merge.sql.jinja")
+        template = self._template_env.get_template("etl/CONCEPT_ID_swap_insert.sql.jinja")
         sql = template.render(
             dataset_work=self._dataset_work,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
             min_custom_concept_id=Etl._CUSTOM_CONCEPT_IDS_START,
         )
         self._gcp.run_query_job(sql)
 
-    def _merge_custom_concepts_with_the_omop_concepts(self, omop_table: str, concept_id_column: str) -> None:
-        """Merges the uploaded custom concepts in the OMOP concept table.
+    def _merge_custom_concepts_with_the_omop_concepts(self, custom_concept_columns: list[tuple[str, str]]) -> None:
+        """Merges the uploaded custom concepts of the concept id columns in the OMOP concept table, in one statement.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-        """
+            custom_concept_columns (list[tuple[str, str]]): The omop tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
         template = self._template_env.get_template("etl/CONCEPT_merge.sql.jinja")
         sql = template.render(
             dataset_omop=self._dataset_omop,
             dataset_work=self._dataset_work,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
+            custom_concept_columns=custom_concept_columns,
         )
         self._gcp.run_query_job(sql)
 
@@ -253,6 +263,43 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
             f"{omop_table}__{concept_id_column}_usagi",
         )
 
+    def _load_combined_mapping_parquet(self, mapping_table: str, parquet_file: Path) -> None:
+        """Replaces the content of a combined mapping table (usagi_mappings or custom_concept_mappings) with the parquet file.
+
+        Args:
+            mapping_table (str): The combined mapping table
+            parquet_file (Path): The path to the parquet file
+        """  # noqa: E501 # pylint: disable=line-too-long
+        # upload the Parquet file to the Cloud Storage Bucket
+        uri = self._gcp.upload_file_to_bucket(str(parquet_file), self._bucket_uri)
+        # replace the combined mapping table, clustered so the views only read the blocks of their column
+        self._gcp.batch_load_from_bucket_into_bigquery_table(
+            uri,
+            self._dataset_work,
+            mapping_table,
+            write_disposition=WriteDisposition.WRITE_TRUNCATE,
+            clustering_fields=["omop_table", "concept_id_column"],
+        )
+
+    def _create_mapping_views(
+        self, usagi_columns: list[tuple[str, str]], custom_concept_columns: list[tuple[str, str]]
+    ) -> None:
+        """Creates the Usagi and custom concept upload tables of the concept id columns as views on the combined mapping tables.
+        The Usagi views swap the custom concept codes with their generated concept ids (above 2.000.000.000).
+
+        Args:
+            usagi_columns (list[tuple[str, str]]): The OMOP tables and concept id columns of the Usagi views
+            custom_concept_columns (list[tuple[str, str]]): The OMOP tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/MAPPING_VIEWS_create.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            usagi_columns=usagi_columns,
+            custom_concept_columns=custom_concept_columns,
+            process_semi_approved_mappings=self._process_semi_approved_mappings,
+        )
+        self._gcp.run_query_job(sql)
+
     def _update_custom_concepts_in_usagi(self, omop_table: str, concept_id_column: str) -> None:
         """This method updates the Usagi upload table with with the generated custom concept ids (above 2.000.000.000).
         The concept_id column in the Usagi upload table is swapped by the generated custom concept_id (above 2.000.000.000).
@@ -272,20 +319,43 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         )
         self._gcp.run_query_job(sql)
 
-    def _store_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
-        """Fill up the SOURCE_TO_CONCEPT_MAP table with all approved mappings from the uploaded Usagi CSV's
+    def _create_source_to_concept_map_staging_table(self, replace: bool) -> None:
+        """Creates the SOURCE_TO_CONCEPT_MAP staging table (holds the approved mappings of the Usagi CSV's of all the concept id columns)
+
+        Args:
+            replace (bool): Replace the staging table, to remove the mappings of a previous run
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_STAGING_create.sql.jinja")
+        ddl = template.render(
+            dataset_work=self._dataset_work,
+            replace=replace,
+        )
+        self._gcp.run_query_job(ddl)
+
+    def _stage_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
+        """Appends all approved mappings from the uploaded Usagi CSV's to the SOURCE_TO_CONCEPT_MAP staging table.
+        The concept id columns append to the staging table in parallel, they are merged in one go at the end of the run.
 
         Args:
             omop_table (str): The omop table
             concept_id_column (str): The conept id column
         """
-        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_check_for_duplicates.sql.jinja")
-        sql_doubles = template.render(
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_STAGING_insert.sql.jinja")
+        sql = template.render(
             dataset_work=self._dataset_work,
             omop_table=omop_table,
             concept_id_column=concept_id_column,
             dataset_omop=self._dataset_omop,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
+            resume=bool(self._resume_run_id),
+        )
+        self._gcp.run_query_job(sql)
+
+    def _merge_staged_source_value_to_concept_id_mappings(self) -> None:
+        """Fill up the SOURCE_TO_CONCEPT_MAP table with all the staged mappings, with one duplicate check and one merge."""
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_check_for_duplicates.sql.jinja")
+        sql_doubles = template.render(
+            dataset_work=self._dataset_work,
         )
         rows = self._gcp.run_query_job(sql_doubles)
         ar_table = rows.to_arrow()
@@ -293,16 +363,13 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
             df = from_arrow(ar_table)
             with pl_Config(fmt_str_lengths=1000):
                 raise Exception(
-                    f"Duplicate rows supplied (combination of source_code column and target_concept_id columns must be unique)!\nCheck for duplicate mappings in the Usagi CSV's and custom concept CSV's for column '{concept_id_column}' of table '{omop_table}'\n{df}"
+                    f"Duplicate rows supplied (combination of source_code column and target_concept_id columns must be unique)!\nCheck for duplicate mappings in the Usagi CSV's and custom concept CSV's of these concept columns\n{df}"
                 )
 
         template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_merge.sql.jinja")
         sql = template.render(
             dataset_work=self._dataset_work,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
             dataset_omop=self._dataset_omop,
-            process_semi_approved_mappings=self._process_semi_approved_mappings,
         )
         self._gcp.run_query_job(sql)
 
@@ -322,12 +389,16 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         )
         self._gcp.run_query_job(sql)
 
-    def _get_query_from_sql_file(self, sql_file: Path, omop_table: str) -> str:
+    def _get_query_from_sql_file(
+        self, sql_file: Path, omop_table: str, shard_index: Optional[int] = None, all_rows: bool = False
+    ) -> str:
         """Reads the query from file. If it is a Jinja template, it renders the template.
 
         Args:
             sql_file (Path): Path to the sql or jinja file
             omop_table (str): The omop table
+            shard_index (Optional[int]): The shard of the query, for the Jinja shard() function
+            all_rows (bool): Render the template without the watermark, so the query returns all the rows
 
         Returns:
             str: The query (if it is a Jinja template, the rendered query)
@@ -341,9 +412,25 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
                     dataset_work=self._dataset_work,
                     dataset_omop=self._dataset_omop,
                     omop_table=omop_table,
+                    watermark=None if all_rows else self._get_watermark(omop_table),
+                    shard=self._get_shard_function(shard_index),
                 )
         return select_query
 
+    def _get_shard_predicate(self, column: str, shards: int, shard_index: int) -> str:
+        """Get the predicate that only selects the rows of the shard, based on a hash of the column.
+        Rows with a NULL value in the column belong to the first shard.
+
+        Args:
+            column (str): The column (or expression) to shard on
+            shards (int): The number of shards
+            shard_index (int): The shard
+
+        Returns:
+            str: The predicate
+        """
+        return f"COALESCE(ABS(MOD(FARM_FINGERPRINT(CAST({column} AS STRING)), {shards})), 0) = {shard_index}"
+
     def _query_into_upload_table(self, upload_table: str, select_query: str, omop_table: str) -> None:
         """This method inserts the results from our custom SQL queries the the upload OMOP table.
 
@@ -360,6 +447,45 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         )
         self._gcp.run_query_job(sql)
 
+    def _query_into_keys_table(
+        self, keys_table: str, select_query: str, omop_table: str, key_columns: list[str]
+    ) -> None:
+        """Loads the distinct keys of the results of our custom SQL query in a work keys table.
+
+        Args:
+            keys_table (str): The work keys table
+            select_query (str): The query
+            omop_table (str): The omop table
+            key_columns (list[str]): The key columns of the omop table
+        """
+        template = self._template_env.get_template("etl/{omop_table}_{sql_file}_keys_insert.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            keys_table=keys_table,
+            select_query=select_query,
+            key_columns=key_columns,
+        )
+        self._gcp.run_query_job(sql)
+
+    def _get_non_null_counts(self, upload_table: str, columns: list[str]) -> dict[str, int]:
+        """Counts the non-null values of the columns of the upload table.
+
+        Args:
+            upload_table (str): The work upload table
+            columns (list[str]): The columns to count
+
+        Returns:
+            dict[str, int]: The non-null count per column
+        """
+        template = self._template_env.get_template("etl/{omop_table}_{sql_file}_non_null_counts.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            upload_table=upload_table,
+            columns=columns,
+        )
+        rows = self._gcp.run_query_job(sql)
+        return from_arrow(rows.to_arrow()).row(0, named=True)  # type: ignore
+
     def _create_pk_auto_numbering_swap_table(
         self, primary_key_column: str, concept_id_columns: list[str], events: Any
     ) -> None:
@@ -385,6 +511,7 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         omop_table: str,
         primary_key_column: str,
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
         sql_files: list[str],
         upload_tables: list[str],
@@ -396,6 +523,7 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
             omop_table (str): The OMOP table
             primary_key_column (str): Primary key column
             concept_id_columns (list[str]): List of concept_id columns
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
             sql_files (list[str]): List of upload SQL files
             upload_tables (list[str]): List of upload tables
@@ -405,6 +533,7 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
             dataset_work=self._dataset_work,
             primary_key_column=primary_key_column,
             concept_id_columns=concept_id_columns,
+            mapped_concept_id_columns=mapped_concept_id_columns,
             omop_table=omop_table,
             events=events,
             sql_files=sql_files,
@@ -456,11 +585,14 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         omop_table: str,
         columns: list[str],
         upload_tables: list[str],
+        key_tables: list[str],
         required_columns: list[str],
         primary_key_column: Optional[str],
         pk_auto_numbering: bool,
         foreign_key_columns: Any,
+        null_foreign_key_columns: list[str],
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
     ):
         """The one shot merge of the uploaded query result from the omop table, with the swapped primary and foreign keys, the mapped Usagi concept and custom concepts in the destination OMOP table.
@@ -470,11 +602,15 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         Args:
             omop_table (str): OMOP table.
             columns (list[str]): List of columns of the OMOP table.
+            upload_tables (list[str]): List of the upload tables.
+            key_tables (list[str]): The work tables holding all the keys of the source, an incremental merge removes the rows of the other keys (empty to keep them).
             required_columns (list[str]): List of required columns of the OMOP table.
             primary_key_column (str): The name of the primary key column.
             pk_auto_numbering (bool): Is the primary key a generated incremental number?
             foreign_key_columns (Any): List of foreign key columns.
+            null_foreign_key_columns (list[str]): The foreign key columns that are null in all the upload tables, those aren't swapped.
             concept_id_columns (list[str]): List of concept columns.
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
         """  # noqa: E501 # pylint: disable=line-too-long
         template = self._template_env.get_template("etl/{omop_table}_merge.sql.jinja")
@@ -486,12 +622,17 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
             required_columns=required_columns,
             primary_key_column=primary_key_column,
             foreign_key_columns=foreign_key_columns,
+            null_foreign_key_columns=null_foreign_key_columns,
             concept_id_columns=concept_id_columns,
+            mapped_concept_id_columns=mapped_concept_id_columns,
             pk_auto_numbering=pk_auto_numbering,
             events=events,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
             upload_tables=upload_tables,
             min_custom_concept_id=Etl._CUSTOM_CONCEPT_IDS_START,
+            incremental=self._get_watermark(omop_table) is not None,
+            key_tables=key_tables,
+            key_columns=self._get_incremental_merge_key_columns(omop_table) if key_tables else [],
         )
         self._gcp.run_query_job(sql)
 
@@ -580,49 +721,42 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
         )
         self._gcp.run_query_job(sql)
 
-    def _check_usagi(self, omop_table: str, concept_id_column: str, domains: list[str] | None) -> None:
-        """Checks the usagi fk domain of the concept id column.
+    def _check_usagi(self, omop_table: str, concept_id_columns: list[str], domains: dict[str, list[str]]) -> None:
+        """Checks the Usagi mappings of all the concept id columns of the table in one query.
+        Non-standard concepts are logged as warning, concepts of a domain that isn't allowed raise an exception.
 
         Args:
             omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-            domains (list[str]): The allowed domains
+            concept_id_columns (list[str]): The concept id columns
+            domains (dict[str, list[str]]): The allowed domains per concept id column
         """
-        template = self._template_env.get_template("etl/{omop_table}__{concept_id_column}_usagi_non_standard.sql.jinja")
+        template = self._template_env.get_template("etl/{omop_table}_usagi_check.sql.jinja")
         sql = template.render(
             dataset_work=self._dataset_work,
             dataset_omop=self._dataset_omop,
             omop_table=omop_table,
-            concept_id_column=concept_id_column,
+            concept_id_columns=concept_id_columns,
+            domains=domains,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
         )
         rows = self._gcp.run_query_job(sql)
         ar_table = rows.to_arrow()
-        if len(ar_table):
-            df = from_arrow(ar_table)
-            logging.warn(
-                f"Non-standard concepts found in the Usagi CSV's for concept column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly standard concepts are allowed!\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df}"
-            )
+        if not len(ar_table):
+            return
+        df = from_arrow(ar_table)
 
-        if domains:
-            template = self._template_env.get_template(
-                "etl/{omop_table}__{concept_id_column}_usagi_fk_domain_check.sql.jinja"
+        df_non_standard = df.filter(col("non_standard"))
+        if len(df_non_standard):
+            logging.warning(
+                f"Non-standard concepts found in the Usagi CSV's of OMOP table '{omop_table}'!\nOnly standard concepts are allowed!\nQuery to get the non-standard concepts:\n{sql}\nNon-standard concepts:\n{df_non_standard}"
             )
-            sql = template.render(
-                dataset_work=self._dataset_work,
-                dataset_omop=self._dataset_omop,
-                omop_table=omop_table,
-                concept_id_column=concept_id_column,
-                domains=domains,
-                process_semi_approved_mappings=self._process_semi_approved_mappings,
+
+        df_invalid_domains = df.filter(col("invalid_domain"))
+        if len(df_invalid_domains):
+            allowed_domains = "\n".join(f"{column}: {', '.join(domains[column])}" for column in domains)
+            raise Exception(
+                f"Invalid concept domains found in the Usagi CSV's of OMOP table '{omop_table}'!\nOnly these concept domains are allowed:\n{allowed_domains}\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df_invalid_domains}"
             )
-            rows = self._gcp.run_query_job(sql)
-            ar_table = rows.to_arrow()
-            if len(ar_table):
-                df = from_arrow(ar_table)
-                raise Exception(
-                    f"Invalid concept domains found in the Usagi CSV's for concept column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly concept domains ({', '.join(domains)}) are allowed!\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df}"
-                )
 
     def _upload_riab_version_in_metadata_table(self) -> None:
         """Upload the riab version in the metadata table."""
@@ -660,3 +794,158 @@ class BigQueryEtl(Etl, BigQueryEtlBase):
 
         # load the results of the query in the tempopary work table
         self._query_into_upload_table("metadata__upload__git_commit_hash", sql, "metadata")
+
+    def _create_run_history_table(self) -> None:
+        """Creates the run history table (holds the durations of the ETL steps of previous runs)"""
+        template = self._template_env.get_template("etl/RUN_HISTORY_create.sql.jinja")
+        ddl = template.render(
+            dataset_work=self._dataset_work,
+        )
+        self._gcp.run_query_job(ddl)
+
+    def _get_historical_step_durations(self, last_runs: int) -> dict[tuple[str, str], float]:
+        """Gets the average duration (in seconds) of every ETL step of every OMOP table over the last runs.
+
+        Args:
+            last_runs (int): The number of previous runs to take into account
+
+        Returns:
+            dict[tuple[str, str], float]: The average duration per OMOP table and step
+        """
+        template = self._template_env.get_template("etl/RUN_HISTORY_get_step_durations.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            last_runs=last_runs,
+        )
+        rows = self._gcp.run_query_job(sql)
+        return {(row["omop_table"], row["step"]): row["duration"] for row in rows}
+
+    def _store_step_durations_in_run_history(
+        self, run_id: str, run_start: datetime, step_durations: list[tuple[str, str, float]]
+    ) -> None:
+        """Stores the durations of the ETL steps of this run in the run history table.
+
+        Args:
+            run_id (str): The id of the run
+            run_start (datetime): The start of the run
+            step_durations (list[tuple[str, str, float]]): The OMOP table, step and duration (in seconds) of every step
+        """
+        template = self._template_env.get_template("etl/RUN_HISTORY_insert.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            step_durations=step_durations,
+        )
+        self._gcp.run_query_job(
+            sql,
+            query_parameters=[
+                ScalarQueryParameter("run_id", "STRING", run_id),
+                ScalarQueryParameter("run_start", "TIMESTAMP", run_start),
+            ],
+        )
+
+    def _create_run_state_table(self) -> None:
+        """Creates the run state table (holds the completed steps of the runs, so that a failed run can be resumed)"""
+        template = self._template_env.get_template("etl/RUN_STATE_create.sql.jinja")
+        ddl = template.render(
+            dataset_work=self._dataset_work,
+        )
+        self._gcp.run_query_job(ddl)
+
+    def _get_completed_steps(self, run_id: str) -> dict[tuple[str, str, str], str]:
+        """Gets the completed steps of a run.
+
+        Args:
+            run_id (str): The id of the run
+
+        Returns:
+            dict[tuple[str, str, str], str]: The input hash per OMOP table, step and item
+        """
+        template = self._template_env.get_template("etl/RUN_STATE_get_completed_steps.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+        )
+        rows = self._gcp.run_query_job(sql, query_parameters=[ScalarQueryParameter("run_id", "STRING", run_id)])
+        return {(row["omop_table"], row["step"], row["item"]): row["input_hash"] for row in rows}
+
+    def _store_completed_steps(self, run_id: str, completed_steps: list[tuple[str, str, str, str]]) -> None:
+        """Stores the completed steps in the run state table.
+
+        Args:
+            run_id (str): The id of the run
+            completed_steps (list[tuple[str, str, str, str]]): The OMOP table, step, item and input hash of every completed step
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/RUN_STATE_insert.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            completed_steps=completed_steps,
+        )
+        self._gcp.run_query_job(sql, query_parameters=[ScalarQueryParameter("run_id", "STRING", run_id)])
+
+    def _create_table_fingerprint_table(self) -> None:
+        """Creates the table fingerprint table (holds the fingerprint of the inputs of every table at its last ETL)"""
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_create.sql.jinja")
+        ddl = template.render(
+            dataset_work=self._dataset_work,
+        )
+        self._gcp.run_query_job(ddl)
+
+    def _get_table_fingerprints(self) -> dict[str, str]:
+        """Gets the fingerprints of the tables at their last ETL.
+
+        Returns:
+            dict[str, str]: The fingerprint per OMOP table
+        """
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_get.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+        )
+        rows = self._gcp.run_query_job(sql)
+        return {row["omop_table"]: row["fingerprint"] for row in rows}
+
+    def _store_table_fingerprints(self, table_fingerprints: dict[str, str]) -> None:
+        """Stores the fingerprints of the processed tables.
+
+        Args:
+            table_fingerprints (dict[str, str]): The fingerprint per OMOP table
+        """
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_merge.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            table_fingerprints=table_fingerprints,
+        )
+        self._gcp.run_query_job(sql)
+
+    def _create_table_watermark_table(self) -> None:
+        """Creates the table watermark table (holds for every table the start of the run that last merged it)"""
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_create.sql.jinja")
+        ddl = template.render(
+            dataset_work=self._dataset_work,
+        )
+        self._gcp.run_query_job(ddl)
+
+    def _get_table_watermarks(self) -> dict[str, datetime]:
+        """Gets the watermarks of the tables.
+
+        Returns:
+            dict[str, datetime]: The start of the run that last merged the OMOP table
+        """
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_get.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+        )
+        rows = self._gcp.run_query_job(sql)
+        return {row["omop_table"]: row["watermark"] for row in rows}
+
+    def _store_table_watermarks(self, omop_tables: list[str], watermark: datetime) -> None:
+        """Stores the watermark of the merged tables.
+
+        Args:
+            omop_tables (list[str]): The merged OMOP tables
+            watermark (datetime): The start of the run
+        """
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_merge.sql.jinja")
+        sql = template.render(
+            dataset_work=self._dataset_work,
+            omop_tables=omop_tables,
+        )
+        self._gcp.run_query_job(sql, query_parameters=[ScalarQueryParameter("watermark", "TIMESTAMP", watermark)])
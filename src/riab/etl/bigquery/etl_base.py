@@ -16,7 +16,7 @@ from google.cloud.bigquery import WriteDisposition
 from polars import DataFrame
 
 from ..etl_base import EtlBase
-from .gcp import Gcp
+from .gcp import Gcp, PlanGcp
 
 
 class BigQueryEtlBase(EtlBase, ABC):
@@ -30,6 +30,7 @@ class BigQueryEtlBase(EtlBase, ABC):
         dataset_dqd: str,
         dataset_achilles: str,
         bucket: str,
+        max_concurrent_jobs: int = 50,
         **kwargs,
     ):
         """This class holds the BigQuery specific methods of the ETL process
@@ -41,18 +42,30 @@ class BigQueryEtlBase(EtlBase, ABC):
             dataset_work (str): The dataset that will hold RiaB's housekeeping tables. Must have the following format: PROJECT_ID.DATASET_ID
             dataset_omop (str): The dataset that will hold the OMOP table. Must have the following format: PROJECT_ID.DATASET_ID
             bucket (str): The Cloud Storage bucket uri, that will hold the uploaded Usagi and custom concept files. (the uri has format 'gs://{bucket_name}/{bucket_path}')
+            max_concurrent_jobs (int): The maximum number of BigQuery jobs that RiaB runs at the same time
         """
         super().__init__(**kwargs)
 
-        import google.auth
-
-        logging.debug("Creating GCP credentials")
-        if credentials_file:
-            credentials, project_id = google.auth.load_credentials_from_file(credentials_file)
+        if self._plan_recorder:
+            self._gcp: Gcp = PlanGcp(
+                self._plan_recorder,
+                max_concurrent_jobs=min(max_concurrent_jobs, self._max_concurrent_db_operations),
+            )
         else:
-            credentials, project_id = google.auth.default()
-
-        self._gcp = Gcp(credentials=credentials, location=location or "EU")
+            import google.auth
+
+            logging.debug("Creating GCP credentials")
+            if credentials_file:
+                credentials, project_id = google.auth.load_credentials_from_file(credentials_file)
+            else:
+                credentials, project_id = google.auth.default()
+
+            self._gcp = Gcp(
+                credentials=credentials,
+                location=location or "EU",
+                max_concurrent_jobs=min(max_concurrent_jobs, self._max_concurrent_db_operations),
+                tracer=self._tracer,
+            )
         self._project_raw = cast(str, project_raw)
         self._dataset_work = dataset_work
         self._dataset_omop = dataset_omop
@@ -22,6 +22,10 @@ from google.cloud.bigquery.table import RowIterator, _EmptyRowIterator
 from google.cloud.exceptions import NotFound
 from requests.adapters import HTTPAdapter
 
+from ..plan import PlanRecorder
+from ..scheduler import ConcurrencyLimiter
+from ..trace import Tracer, sql_fingerprint
+
 
 class Gcp:
     """
@@ -33,12 +37,20 @@ class Gcp:
     _GIGA = 1024**3
     _COST_PER_10_MB = 6 / 1024 / 1024 * 10
 
-    def __init__(self, credentials: Credentials, location: str = "EU"):
+    def __init__(
+        self,
+        credentials: Credentials,
+        location: str = "EU",
+        max_concurrent_jobs: int = 50,
+        tracer: Optional[Tracer] = None,
+    ):
         """Constructor
 
         Args:
             credentials (Credentials): The Google auth credentials (see https://google-auth.readthedocs.io/en/stable/reference/google.auth.credentials.html)
             location (str): The location in GCP (see https://cloud.google.com/about/locations/)
+            max_concurrent_jobs (int): The maximum number of BigQuery query and load jobs that run at the same time
+            tracer (Optional[Tracer]): Records the query and load jobs as spans
         """  # noqa: E501 # pylint: disable=line-too-long
         logging.debug("Creating Google Cloud Storage client")
         self._cs_client = cs.Client(credentials=credentials)
@@ -47,6 +59,8 @@ class Gcp:
         self._location = location
         self._total_cost = 0
         self._lock_total_cost = Lock()
+        self._concurrency_limiter = ConcurrencyLimiter(max_concurrent_jobs)
+        self._tracer = tracer or Tracer()
 
         # increase connection pool size
         adapter = HTTPAdapter(pool_connections=128, pool_maxsize=128, max_retries=3)
@@ -108,10 +122,18 @@ class Gcp:
                 query_parameters=query_parameters or [],
             )
             logging.debug("Running query: %s\nWith parameters: %s", query, str(query_parameters))
-            start = time.time()
-            query_job = self._bq_client.query(query, job_config=job_config, location=self._location)
-            result = query_job.result()
-            end = time.time()
+            with (
+                self._concurrency_limiter.slot(),
+                self._tracer.span("query", "query", sql_fingerprint=sql_fingerprint(query)) as span_args,
+            ):
+                start = time.time()
+                query_job = self._bq_client.query(query, job_config=job_config, location=self._location)
+                result = query_job.result()
+                end = time.time()
+                span_args["job_id"] = query_job.job_id
+                span_args["rows_affected"] = query_job.num_dml_affected_rows
+                span_args["bytes_processed"] = query_job.total_bytes_processed
+                span_args["slot_ms"] = query_job.slot_millis
             # cost berekening $6.00 per TB (afgerond op 10 MB naar boven)
             cost_per_10_mb = 6 / 1024 / 1024 * 10
             total_10_mbs_billed = math.ceil((query_job.total_bytes_billed or 0) / (Gcp._MEGA * 10))
@@ -196,19 +218,21 @@ class Gcp:
 
     def batch_load_from_bucket_into_bigquery_table(
         self,
-        uri: str,
+        uri: Union[str, Sequence[str]],
         dataset: str,
         table_name: str,
         write_disposition: str = bq.WriteDisposition.WRITE_APPEND,
         schema: Optional[Sequence[SchemaField]] = None,
+        clustering_fields: Optional[list[str]] = None,
     ):
         """Batch load parquet files from a Cloud Storage bucket to a Big Query table
         see https://cloud.google.com/bigquery/docs/loading-data-cloud-storage-parquet#python
 
         Args:
-            uri (str): the uri of the bucket blob(s) in the form of 'gs://{bucket_name}/{bucket_path}/{blob_name(s)}.parquet'
+            uri (Union[str, Sequence[str]]): the uri(s) of the bucket blob(s) in the form of 'gs://{bucket_name}/{bucket_path}/{blob_name(s)}.parquet'
             dataset (str): dataset (format: PROJECT_ID.DATASET_ID)
             table_name (str): table name
+            clustering_fields (Optional[list[str]]): the columns the table is clustered by
         """  # noqa: E501 # pylint: disable=line-too-long
         logging.debug(
             "Append bucket files '%s' to BigQuery table '%s.%s'",
@@ -227,9 +251,17 @@ class Gcp:
             source_format=bq.SourceFormat.PARQUET,
             schema=schema,
             autodetect=False if schema else True,
+            clustering_fields=clustering_fields,
         )
-        load_job = self._bq_client.load_table_from_uri(uri, table, job_config=job_config)  # Make an API request.
-        load_job.result()  # Waits for the job to complete.
+        with (
+            self._concurrency_limiter.slot(),
+            self._tracer.span("load", "load", table=f"{dataset}.{table_name}") as span_args,
+        ):
+            load_job = self._bq_client.load_table_from_uri(uri, table, job_config=job_config)  # Make an API request.
+            load_job.result()  # Waits for the job to complete.
+            span_args["job_id"] = load_job.job_id
+            span_args["rows_affected"] = load_job.output_rows
+            span_args["bytes_processed"] = load_job.input_file_bytes
 
         table = self._bq_client.get_table(bq.DatasetReference(dataset_parts[0], dataset_parts[1]).table(table_name))
         logging.debug(
@@ -238,3 +270,83 @@ class Gcp:
             dataset,
             table_name,
         )
+
+
+class PlanGcp(Gcp):
+    """Stand-in for the Google Cloud Provider class in plan mode, that records the jobs instead of running them."""
+
+    def __init__(self, plan_recorder: PlanRecorder, max_concurrent_jobs: int = 50):
+        """Constructor
+
+        Args:
+            plan_recorder (PlanRecorder): Records the jobs
+            max_concurrent_jobs (int): The maximum number of BigQuery query and load jobs in flight at the same time
+        """
+        self._plan_recorder = plan_recorder
+        self._total_cost = 0
+        self._concurrency_limiter = ConcurrencyLimiter(max_concurrent_jobs)
+
+    def run_query_job_with_benchmark(
+        self,
+        query: str,
+        query_parameters: Union[list[bq.ScalarQueryParameter], None] = None,
+    ) -> Tuple[Union[RowIterator, _EmptyRowIterator], float]:
+        """Records the query, without running it.
+
+        Args:
+            query (str): the sql query
+            query_parameters (list[bigquery.ScalarQueryParameter], optional): the query parameters
+
+        Returns:
+            RowIterator: empty row iterator
+            float: zero execution time
+        """
+        self._plan_recorder.record(query, {parameter.name: parameter.value for parameter in query_parameters or []})
+        return _EmptyRowIterator(), 0
+
+    def delete_table(self, dataset: str, table_name: str):
+        """Records the deletion of the table, without deleting it.
+
+        Args:
+            dataset (str): dataset (format: PROJECT_ID.DATASET_ID)
+            table_name (str): table name
+        """
+        self._plan_recorder.record(f"DROP TABLE IF EXISTS `{dataset}.{table_name}`")
+
+    def delete_from_bucket(self, bucket_uri: str):
+        """Records the deletion of the blobs from the bucket, without deleting them.
+
+        Args
+            bucket (str): The bucket uri
+        """
+        self._plan_recorder.record(f"-- delete '{bucket_uri}'", kind="load")
+
+    def upload_file_to_bucket(self, source_file_path: Union[str, Path], bucket_uri: str):
+        """Records the upload of the local file to the bucket, without uploading it.
+
+        Args:
+            source_file_path (Path): Path to the local file
+            bucket_uri (str): Name of the Cloud Storage bucket and the path in the bucket (directory) to store the file (with format: 'gs://{bucket_name}/{bucket_path}')
+        """  # noqa: E501 # pylint: disable=line-too-long
+        self._plan_recorder.record(f"-- upload '{Path(source_file_path).name}' to '{bucket_uri}'", kind="load")
+        return f"{bucket_uri}/{Path(source_file_path).name}"
+
+    def batch_load_from_bucket_into_bigquery_table(
+        self,
+        uri: Union[str, Sequence[str]],
+        dataset: str,
+        table_name: str,
+        write_disposition: str = bq.WriteDisposition.WRITE_APPEND,
+        schema: Optional[Sequence[SchemaField]] = None,
+        clustering_fields: Optional[list[str]] = None,
+    ):
+        """Records the load job, without running it.
+
+        Args:
+            uri (Union[str, Sequence[str]]): the uri(s) of the bucket blob(s) in the form of 'gs://{bucket_name}/{bucket_path}/{blob_name(s)}.parquet'
+            dataset (str): dataset (format: PROJECT_ID.DATASET_ID)
+            table_name (str): table name
+            clustering_fields (Optional[list[str]]): the columns the table is clustered by
+        """  # noqa: E501 # pylint: disable=line-too-long
+        uris = uri if isinstance(uri, str) else ", ".join(uri)
+        self._plan_recorder.record(f"-- load '{uris}' into `{dataset}.{table_name}` ({write_disposition})", kind="load")
@@ -29,19 +29,52 @@ class BigQueryImportVocabularies(ImportVocabularies, BigQueryEtlBase):
         """Stuff to do after the load (ex re-add constraints to omop tables)"""
         pass
 
-    def _load_vocabulary_parquet_in_upload_table(self, vocabulary_table: str, parquet_file: Path) -> None:
-        """Loads the CSV file in the specific standardised vocabulary table
+    def _get_vocabulary_target(self) -> str:
+        """Gets the dataset that holds the standardised vocabulary tables
+
+        Returns:
+            str: The OMOP dataset (format PROJECT_ID.DATASET_ID)
+        """
+        return self._dataset_omop
+
+    def _get_vocabulary_table_row_count(self, vocabulary_table: str) -> int:
+        """Counts the rows of a specific standardised vocabulary table
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            int: The number of rows of the table
+        """
+        template = self._template_env.get_template("vocabulary/vocabulary_table_count.sql.jinja")
+        sql = template.render(
+            dataset_omop=self._dataset_omop,
+            vocabulary_table=vocabulary_table,
+        )
+        rows = self._gcp.run_query_job(sql)
+        return next(iter(rows)).row_count
+
+    def _upload_vocabulary_parquet_part(self, vocabulary_table: str, parquet_part: Path) -> None:
+        """Uploads a Parquet part of the specific standardised vocabulary table to the Cloud Storage Bucket
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            parquet_part (Path): Path to the Parquet part
+        """
+        logging.debug("Uploading '%s' of vocabulary table %s", parquet_part, vocabulary_table)
+        self._gcp.upload_file_to_bucket(parquet_part, self._bucket_uri)
+
+    def _load_vocabulary_parquet_in_upload_table(self, vocabulary_table: str, parquet_parts: list[Path]) -> None:
+        """Loads the uploaded Parquet parts in the specific standardised vocabulary table, with one load job
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            parquet_file (Path): Path to the CSV file
+            parquet_parts (list[Path]): The uploaded Parquet parts
         """
-        logging.debug("Loading '%s' into vocabulary table %s", parquet_file, vocabulary_table)
-        # upload the Parquet file to the Cloud Storage Bucket
-        uri = self._gcp.upload_file_to_bucket(parquet_file, self._bucket_uri)
-        # load the uploaded Parquet file from the bucket into the specific standardised vocabulary table
+        logging.debug("Loading %i parts into vocabulary table %s", len(parquet_parts), vocabulary_table)
+        # load the uploaded Parquet parts from the bucket into the specific standardised vocabulary table
         self._gcp.batch_load_from_bucket_into_bigquery_table(
-            uri,
+            [f"{self._bucket_uri}/{parquet_part.name}" for parquet_part in parquet_parts],
             self._dataset_work,
             vocabulary_table,
             write_disposition=bq.WriteDisposition.WRITE_EMPTY,
@@ -69,3 +102,38 @@ class BigQueryImportVocabularies(ImportVocabularies, BigQueryEtlBase):
             vocabulary_table=vocabulary_table,
         )
         self._gcp.run_query_job(sql)
+
+    def _apply_vocabulary_changes(
+        self, vocabulary_table: str, key_columns: list[str], upserts_parquet: Path, deletes_parquet: Path
+    ) -> None:
+        """Loads the new and changed rows and the keys of the removed rows in work tables and applies them to
+        the specific standardised vocabulary table, in one transaction
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            key_columns (list[str]): The columns that identify a row of the vocabulary table
+            upserts_parquet (Path): Path to the Parquet file with the new and changed rows
+            deletes_parquet (Path): Path to the Parquet file with the key columns of the removed rows
+        """
+        for parquet_file, work_table in [
+            (upserts_parquet, vocabulary_table),
+            (deletes_parquet, f"{vocabulary_table}__deletes"),
+        ]:
+            logging.debug("Loading '%s' into work table %s", parquet_file, work_table)
+            self._gcp.upload_file_to_bucket(parquet_file, self._bucket_uri)
+            self._gcp.batch_load_from_bucket_into_bigquery_table(
+                f"{self._bucket_uri}/{parquet_file.name}",
+                self._dataset_work,
+                work_table,
+                write_disposition=bq.WriteDisposition.WRITE_TRUNCATE,
+            )
+
+        logging.info("Apply the changes to vocabulary table '%s'", vocabulary_table)
+        template = self._template_env.get_template("vocabulary/vocabulary_table_apply_changes.sql.jinja")
+        sql = template.render(
+            dataset_omop=self._dataset_omop,
+            dataset_work=self._dataset_work,
+            vocabulary_table=vocabulary_table,
+            key_columns=key_columns,
+        )
+        self._gcp.run_query_job(sql)
@@ -60,6 +60,10 @@ class Cleanup(EtlBase, ABC):
             )
             self._remove_omop_ids_from_map_table(omop_tables=tables)
 
+            if "table_fingerprint" in work_tables:
+                logging.info("Removing the fingerprints of OMOP tables %s and their uploads", ",".join(tables))
+                self._remove_table_fingerprints(omop_tables=tables)
+
             usagi_tables = [
                 table_name
                 for table_name in work_tables
@@ -145,6 +149,8 @@ class Cleanup(EtlBase, ABC):
             tables_to_delete = [table_name for table_name in work_tables]
             if not self.clear_auto_generated_custom_concept_ids and "concept_id_swap" in tables_to_delete:
                 tables_to_delete.remove("concept_id_swap")
+            if "run_history" in tables_to_delete:  # keep the step durations of previous runs for the ETL scheduling
+                tables_to_delete.remove("run_history")
             futures = [
                 executor.submit(
                     self._delete_work_table,
@@ -265,6 +271,15 @@ class Cleanup(EtlBase, ABC):
         """
         pass
 
+    @abstractmethod
+    def _remove_table_fingerprints(self, omop_tables: list[str]) -> None:
+        """Remove the fingerprints of specific OMOP tables and of their Usagi and custom concept uploads from the TABLE_FINGERPRINT work table.
+
+        Args:
+            omop_tables (list[str]): The omop tables
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
     @abstractmethod
     def _remove_source_to_concept_map_using_usagi_table(self, omop_table: str, concept_id_column: str) -> None:
         """Remove the concepts of a specific concept column of a specific OMOP table from the OMOP source_to_concept_map table
@@ -0,0 +1,131 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the local cache of the CSV's converted to Parquet"""
+
+import hashlib
+import logging
+import os
+from importlib import metadata
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Any, Callable
+
+
+class CsvCache:
+    """
+    Local content addressed cache of the Usagi and custom concept CSV's, converted to Parquet.
+    A cached Parquet file is keyed by the hash of the CSV content, the schema it was converted with and the RiaB version,
+    so an unchanged CSV is never parsed again.
+    The least recently used Parquet files are evicted when the cache grows above its maximum size.
+    """
+
+    def __init__(self, cache_path: Path, max_size: int):
+        """Constructor
+
+        Args:
+            cache_path (Path): The folder that holds the cached Parquet files
+            max_size (int): The maximum size of the cache in bytes
+        """
+        self._cache_path = cache_path
+        self._max_size = max_size
+        try:
+            self._riab_version = metadata.version("Rabbit-in-a-Blender")
+        except metadata.PackageNotFoundError:
+            self._riab_version = "unknown"
+        self._file_hashes: dict[tuple[Path, int, int], str] = {}
+        self._used_parquet_files: set[Path] = set()
+        self._lock = Lock()
+
+    def get_parquet_file(self, csv_file: Path, schema: dict[str, Any], convert: Callable[[Path], None]) -> Path:
+        """Gets the cached Parquet file of the CSV file, the CSV is only converted when it isn't in the cache yet.
+
+        Args:
+            csv_file (Path): The CSV file
+            schema (dict[str, Any]): The schema the CSV is converted with
+            convert (Callable[[Path], None]): Converts the CSV file and writes it to the given Parquet file
+
+        Returns:
+            Path: The cached Parquet file
+        """
+        parquet_file = self._cache_path / f"{self.get_key(csv_file, schema)}.parquet"
+        with self._lock:
+            self._used_parquet_files.add(parquet_file)
+        if parquet_file.exists():
+            logging.debug("Loading '%s' from the CSV cache", csv_file)
+            os.utime(parquet_file)  # the modification time is the last use of the cached file
+            return parquet_file
+
+        logging.debug("Converting '%s' to parquet in the CSV cache", csv_file)
+        self._cache_path.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, so parallel conversions and interrupted runs never leave a half written file
+        temp_parquet_file = parquet_file.with_suffix(f".{os.getpid()}_{get_ident()}.tmp")
+        convert(temp_parquet_file)
+        temp_parquet_file.replace(parquet_file)
+        self._evict()
+        return parquet_file
+
+    def get_key(self, csv_file: Path, schema: dict[str, Any]) -> str:
+        """Gets the cache key of the CSV file.
+
+        Args:
+            csv_file (Path): The CSV file
+            schema (dict[str, Any]): The schema the CSV is converted with
+
+        Returns:
+            str: The SHA-256 hash of the CSV content, the schema and the RiaB version
+        """
+        sha = hashlib.sha256()
+        for key_input in [self._get_file_hash(csv_file), repr(list(schema.items())), self._riab_version]:
+            sha.update(key_input.encode("UTF8"))
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+    def get_fingerprint(self, csv_files: list[Path], schema: dict[str, Any], *extras: str) -> str:
+        """Gets the fingerprint of the combination of CSV files (ex. all the Usagi CSV's of a concept column).
+
+        Args:
+            csv_files (list[Path]): The CSV files
+            schema (dict[str, Any]): The schema the CSV's are converted with
+            extras (str): Extra inputs of the fingerprint
+
+        Returns:
+            str: The SHA-256 hash of the cache keys of the CSV files and the extras
+        """
+        sha = hashlib.sha256()
+        for fingerprint_input in [*sorted(self.get_key(csv_file, schema) for csv_file in csv_files), *extras]:
+            sha.update(fingerprint_input.encode("UTF8"))
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+    def _get_file_hash(self, csv_file: Path) -> str:
+        stat = csv_file.stat()
+        file_key = (csv_file.resolve(), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            file_hash = self._file_hashes.get(file_key)
+        if file_hash is None:
+            file_hash = hashlib.sha256(csv_file.read_bytes()).hexdigest()
+            with self._lock:
+                self._file_hashes[file_key] = file_hash
+        return file_hash
+
+    def _evict(self) -> None:
+        """Removes the least recently used Parquet files, until the cache is below its maximum size.
+        The Parquet files that were used in this run are never evicted."""
+        with self._lock:
+            parquet_files = []
+            for parquet_file in self._cache_path.glob("*.parquet"):
+                try:
+                    stat = parquet_file.stat()
+                except FileNotFoundError:  # evicted by another run
+                    continue
+                parquet_files.append((stat.st_mtime, stat.st_size, parquet_file))
+            cache_size = sum(size for _, size, _ in parquet_files)
+            for _, size, parquet_file in sorted(parquet_files):
+                if cache_size <= self._max_size:
+                    break
+                if parquet_file in self._used_parquet_files:
+                    continue
+                logging.debug("Evicting '%s' from the CSV cache", parquet_file)
+                parquet_file.unlink(missing_ok=True)
+                cache_size -= size
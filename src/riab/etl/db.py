@@ -5,16 +5,41 @@ from typing import Optional
 import backoff
 from sqlalchemy import CursorResult, create_engine, engine, text
 
+from .plan import PlanRecorder
+from .scheduler import ConcurrencyLimiter
+from .trace import Tracer, sql_fingerprint
+
 
 class Db:
     """SQLAlchemy database connection."""
 
-    def __init__(self, url: engine.URL):
+    def __init__(self, url: engine.URL, max_connections: int = 15, tracer: Optional[Tracer] = None):
+        """Constructor
+
+        Args:
+            url (engine.URL): The database url
+            max_connections (int): The maximum number of connections (and thus queries) in use at the same time.
+            tracer (Optional[Tracer]): Records the queries as spans
+        """
         logging.debug("Creating SQL Alchemy engine to database: %s", url)
         self._engine = create_engine(
             url,
             use_insertmanyvalues=True,
+            pool_size=max_connections,
+            max_overflow=0,
         )
+        self._concurrency_limiter = ConcurrencyLimiter(max_connections)
+        self._tracer = tracer or Tracer()
+
+    @property
+    def concurrency_limiter(self) -> ConcurrencyLimiter:
+        """Limits the number of database operations in flight.
+        Operations that don't go through SQLAlchemy (ex. BCP) can also use it.
+
+        Returns:
+            ConcurrencyLimiter: The concurrency limiter
+        """
+        return self._concurrency_limiter
 
     @backoff.on_exception(backoff.expo, (Exception), max_time=10, max_tries=3)
     def run_query(self, sql: str, parameters: Optional[dict] = None) -> list[dict] | None:
@@ -30,11 +55,14 @@ class Db:
         logging.debug("Running query: %s", sql)
         try:
             rows = None
-            with self._engine.begin() as conn:
-                with conn.execute(text(sql), parameters) as result:
-                    if isinstance(result, CursorResult) and not result._soft_closed:
-                        rows = [u._asdict() for u in result.all()]
-                    return rows
+            with self._concurrency_limiter.slot(), self._engine.begin() as conn:
+                with self._tracer.span("query", "query", sql_fingerprint=sql_fingerprint(sql)) as span_args:
+                    with conn.execute(text(sql), parameters) as result:
+                        if isinstance(result, CursorResult) and not result._soft_closed:
+                            rows = [u._asdict() for u in result.all()]
+                        if result.rowcount >= 0:
+                            span_args["rows_affected"] = result.rowcount
+                        return rows
         except Exception as ex:
             logging.debug("FAILED QUERY: %s", sql)
             raise ex
@@ -57,3 +85,30 @@ class Db:
         end = time.time()
         execution_time = end - start
         return rows, execution_time
+
+
+class PlanDb(Db):
+    """Stand-in for the database connection in plan mode, that records the queries instead of running them."""
+
+    def __init__(self, plan_recorder: PlanRecorder, max_connections: int = 15):
+        """Constructor
+
+        Args:
+            plan_recorder (PlanRecorder): Records the queries
+            max_connections (int): The maximum number of queries in flight at the same time.
+        """
+        self._plan_recorder = plan_recorder
+        self._concurrency_limiter = ConcurrencyLimiter(max_connections)
+
+    def run_query(self, sql: str, parameters: Optional[dict] = None) -> list[dict] | None:
+        """Records the SQL query, without running it.
+
+        Args:
+            sql (str): The SQL query.
+            parameters (Optional[dict]): The parameters of the query.
+
+        Returns:
+            list[dict]: No results
+        """
+        self._plan_recorder.record(sql, parameters)
+        return []
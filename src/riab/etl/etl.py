@@ -4,21 +4,27 @@
 # pylint: disable=unsubscriptable-object
 """Holds the ETL abstract class"""
 
+import hashlib
 import logging
 import os
 import platform
 import tempfile
+import time
 from abc import abstractmethod
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import date
+from concurrent.futures import Future
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from datetime import date, datetime, timezone
 from pathlib import Path
 from threading import Lock
-from typing import Any, Optional, cast
+from typing import Any, Callable, Iterator, Optional, cast
 
 import polars as pl
 
 from .etl_base import EtlBase
+from .plan import PlanRecorder
+from .scheduler import DagScheduler, WorkScheduler, longest_remaining_paths
+from .vocabulary_index import VocabularyIndex
 
 
 class Etl(EtlBase):
@@ -26,6 +32,16 @@ class Etl(EtlBase):
     ETL class that automates the extract-transfer-load process from source data to the OMOP common data model.
     """
 
+    # the tables without a primary key, with the key columns to merge the changed rows incrementally
+    _INCREMENTAL_MERGE_KEYS = {
+        "cdm_source": ["cdm_source_name"],
+        "death": ["person_id"],
+        "episode_event": ["episode_id"],
+        "fact_relationship": ["fact_id_1", "fact_id_2"],
+    }
+    _RUN_ID_FORMAT = "%Y%m%d%H%M%S"  # the run id is the start of the run (in UTC)
+    _RUN_HISTORY_LAST_RUNS = 5  # the number of previous runs used to estimate the duration of the ETL steps
+
     def __init__(
         self,
         only_omop_table: Optional[list[str]] = None,
@@ -33,6 +49,11 @@ class Etl(EtlBase):
         skip_usagi_and_custom_concept_upload: Optional[bool] = None,
         process_semi_approved_mappings: Optional[bool] = None,
         skip_event_fks_step: Optional[bool] = None,
+        pipeline_upload_queries: Optional[bool] = None,
+        resume: Optional[str] = None,
+        skip_unchanged_tables: Optional[bool] = None,
+        incremental: Optional[bool] = None,
+        combined_mapping_load: Optional[bool] = None,
         **kwargs,
     ):
         """Constructor
@@ -43,6 +64,11 @@ class Etl(EtlBase):
             only_omop_table (str): Only do specific ETL on this OMOP CDM table(s).
             only_query (str): Only do ETL for the specified sql file(s) in the CDM folder structure. (ex: measurement/lab_measurements.sql)
             skip_usagi_and_custom_concept_upload (bool): If no changes have been made to the Usagi and custom concept CSV's, then you can speed up the ETL process by setting this flag to True. The ETL process will skip the upload and processing of the Usagi and custom concept CSV's.
+            pipeline_upload_queries (bool): Start the upload queries of all the tables right away (limited by max_parallel_upload_queries). Only the swap and merge steps wait on the foreign key order.
+            resume (str): The id of a previous run to resume. The steps that completed in that run, and whose inputs haven't changed, are skipped.
+            skip_unchanged_tables (bool): Skip the tables whose fingerprint (rendered queries, Usagi and custom concept CSV's and the fingerprints of the tables it depends on) didn't change since their last ETL.
+            incremental (bool): Incremental merge, the upload queries only return the changed rows (with the 'watermark' Jinja variable). Only the rows of the uploaded keys are replaced in the OMOP tables, the rows of the keys that are no longer in the source are removed.
+            combined_mapping_load (bool): Load the Usagi and custom concept CSV's of all the concept id columns in one combined mapping table each, with one load per run instead of one per column. The upload tables of the columns become views on the combined mapping tables.
         """  # noqa: E501 # pylint: disable=line-too-long
         super().__init__(**kwargs)
 
@@ -51,9 +77,33 @@ class Etl(EtlBase):
         self._skip_usagi_and_custom_concept_upload = skip_usagi_and_custom_concept_upload
         self._process_semi_approved_mappings = process_semi_approved_mappings
         self._skip_event_fks_step = skip_event_fks_step
-
-        self._lock_custom_concepts = Lock()
-        self._lock_source_value_to_concept_id_mapping = Lock()
+        self._pipeline_upload_queries = pipeline_upload_queries
+        self._resume_run_id = resume
+        self._skip_unchanged_tables = skip_unchanged_tables
+        self._incremental = incremental
+        self._combined_mapping_load = combined_mapping_load
+
+        self._step_durations: dict[tuple[str, str], float] = {}
+        self._historical_step_durations: dict[tuple[str, str], float] = {}
+        self._lock_step_durations = Lock()
+
+        self._run_id = ""
+        self._completed_steps: dict[tuple[str, str, str], str] = {}
+        self._pending_completed_steps: list[tuple[str, str, str, str]] = []
+        self._lock_completed_steps = Lock()
+        self._table_input_hashes: dict[str, dict[tuple[str, str], str]] = {}
+        self._work_skipped = False
+
+        self._stored_table_fingerprints: dict[str, str] = {}
+        self._processed_table_fingerprints: dict[str, str] = {}
+        self._lock_table_fingerprints = Lock()
+
+        self._upload_table_non_null_counts: dict[tuple[str, str], dict[str, int]] = {}
+        self._lock_upload_table_non_null_counts = Lock()
+
+        self._table_watermarks: dict[str, datetime] = {}
+        self._merged_tables: list[str] = []
+        self._lock_merged_tables = Lock()
 
         self._usagi_polars_schema: dict[str, pl.DataType] = {  # type: ignore
             "sourceCode": pl.Utf8,  # type: ignore
@@ -79,13 +129,20 @@ class Etl(EtlBase):
 
         self._git_cdm_folder_commit_hash = None
 
+        if self._vocabulary_index and not self._vocabulary_index.exists():
+            logging.warning(
+                "Vocabulary index '%s' not found (it is written when the vocabularies are imported), the custom concepts and Usagi mappings will be validated in the database",  # noqa: E501 # pylint: disable=line-too-long
+                self._vocabulary_index.index_path,
+            )
+            self._vocabulary_index = None
+
     def run(self):
         """
         Start the ETL process.\n
-        The ETL loops all the OMOP tables.\n
+        First the ETL merges the vocabulary table, because the custom concepts are validated against it.\n
+        Then the ETL uploads and processes the custom concepts and the usagi mappings of all the other OMOP tables in parallel.\n
+        Then the ETL loops all the OMOP tables.\n
         For each table it:
-            - uploads and processes the custom concepts
-            - uploads and processes the usagi mappings
             - merges the 'raw data' with the 'custom concepts CSV's' and 'Usagi mappings CSV's' (that are located in the omop folder) into the corresponding OMOP table. This is a one-shot operation, it either fails or succeeds as a whole.
         The omop folder has for each table a subfolder.\n
         In the table subfolder you place all the SQL queries that transforms the data from the source tables into the format of the destination OMOP table. The ETL process will automatically renumber/replace the 'primary', 'foreign keys' and 'concept id's', so you keep the source values in your query.\n
@@ -105,28 +162,136 @@ class Etl(EtlBase):
 
         """  # noqa: E501 # pylint: disable=line-too-long
         etl_start = date.today()
+        # in UTC, because the watermark is stored as a timestamp (BigQuery) or a datetime2 in UTC (SQL Server)
+        run_start = datetime.now(timezone.utc)
+        self._run_id = self._resume_run_id or run_start.strftime(self._RUN_ID_FORMAT)
+        # the upload tables of the steps that the resumed run completed hold the data of the start of that run
+        watermark = self._get_resumed_run_start() if self._resume_run_id else run_start
+        if self._is_hashing_step_inputs():
+            logging.info("ETL run id: %s (a failed run can be resumed with --resume %s)", self._run_id, self._run_id)
+        else:
+            logging.info("ETL run id: %s", self._run_id)
+
+        with self._plan_step("run_history", "read"):
+            self._create_run_history_table()
+            self._historical_step_durations = self._get_historical_step_durations(self._RUN_HISTORY_LAST_RUNS)
+
+        with self._plan_step("run_state", "read"):
+            self._create_run_state_table()
+            if self._resume_run_id:
+                self._completed_steps = self._get_completed_steps(self._resume_run_id)
+        if self._resume_run_id:
+            logging.info("Resuming run '%s', %i steps were already completed", self._run_id, len(self._completed_steps))
+
+        with self._plan_step("table_fingerprint", "read"):
+            self._create_table_fingerprint_table()
+            if self._skip_unchanged_tables or self._csv_cache:
+                self._stored_table_fingerprints = self._get_table_fingerprints()
+
+        with self._plan_step("table_watermark", "read"):
+            self._create_table_watermark_table()
+            if self._incremental:
+                self._table_watermarks = self._get_table_watermarks()
+        if self._incremental:
+            rebuilt_tables = [
+                omop_table
+                for omop_table in self._get_run_omop_tables()
+                if omop_table != "vocabulary" and not self._is_incremental_merge(omop_table)
+            ]
+            if rebuilt_tables:
+                logging.warning(
+                    "Tables %s have no key to merge the changed rows incrementally, they are rebuilt",
+                    ", ".join(rebuilt_tables),
+                )
+
+        with WorkScheduler(
+            max_workers=self._max_concurrent_db_operations,
+            lane_limits={
+                "upload_queries": self._max_parallel_upload_queries,
+                "mappings": self._max_parallel_mappings,
+            },
+        ) as self._work_scheduler:
+            try:
+                with self._tracer.span("etl", "run", run_id=self._run_id):
+                    self._run(etl_start)
+            finally:
+                self._save_completed_steps()
+                self._save_table_fingerprints()
+                self._save_table_watermarks(watermark)
+                if not self._only_query:  # the durations of a subset of the queries are no estimate for the next run
+                    self._store_run_history(run_start)
+                if self._plan_recorder:
+                    self._write_plan()
+                if self._trace_file:
+                    self._tracer.write(self._trace_file)
+
+    def _run(self, etl_start: date):
+        """Runs the ETL on the shared work scheduler
+
+        Args:
+            etl_start (date): The start date of the ETL
+        """
+        if self._combined_mapping_load and not self._skip_usagi_and_custom_concept_upload:
+            with self._timed_step("", "combined_mappings"):
+                self._upload_combined_mappings()
+
+        # the custom concepts are validated against the vocabulary table (and the ETL can add vocabularies to it),
+        # so the vocabulary table is merged, with its own mappings, before the mappings of the other tables
+        run_omop_tables = self._get_run_omop_tables()
+        process_vocabulary_first = "vocabulary" in run_omop_tables
+
+        if not self._skip_usagi_and_custom_concept_upload:
+            with self._timed_step("", "custom_concept_ids"):
+                self._give_new_custom_concepts_an_unique_id_above_2bilj()
+            # a resumed run keeps the mappings that were staged by the completed steps of the failed run
+            self._create_source_to_concept_map_staging_table(replace=not self._resume_run_id)
+            if process_vocabulary_first:
+                self._process_all_mappings(["vocabulary"])
+
+        d: dict[str, list[Path]] = defaultdict(list[Path])
+        for k, v in [(path.parts[0], cast(Path, self._cdm_folder_path) / path) for path in self._only_query or []]:
+            d[k].append(v)
+
+        if process_vocabulary_first:
+            self._process_omop_table_and_save_completed_steps("vocabulary", only_queries=d.pop("vocabulary", None))
+            if self._only_query or self._only_omop_table:
+                self._fill_in_event_columns_for_omop_table("vocabulary")
+
+        if not self._skip_usagi_and_custom_concept_upload:
+            with self._timed_step("", "mappings"):
+                self._process_all_mappings([omop_table for omop_table in run_omop_tables if omop_table != "vocabulary"])
 
         if self._only_query:
-            d: dict[str, list[Path]] = defaultdict(list[Path])
-            for k, v in [(path.parts[0], cast(Path, self._cdm_folder_path) / path) for path in self._only_query]:
-                d[k].append(v)
             for omop_table, queries in d.items():
                 self._process_omop_table(omop_table, queries)
                 self._fill_in_event_columns_for_omop_table(omop_table)
         elif self._only_omop_table:
             for omop_table in self._only_omop_table:
+                if omop_table == "vocabulary":
+                    continue
                 self._process_omop_table(omop_table)
                 self._fill_in_event_columns_for_omop_table(omop_table)
         else:
-            etl_flow = self._cdm_tables_fks_dependencies_resolved.copy()
-            self._process_all_omop_tables(etl_flow)
+            self._process_all_omop_tables()
 
             self._fill_in_event_columns_for_all_omop_tables()
 
-            # cleanup old source to concept maps by setting the invalid_reason to deleted
-            # (we only do this when running a full ETL = all OMOP tables)
-            self._source_to_concept_map_update_invalid_reason(etl_start)
-            self._source_id_to_omop_id_map_update_invalid_reason(etl_start)
+        if not self._skip_usagi_and_custom_concept_upload:
+            with self._timed_step("", "source_to_concept_map"):
+                self._merge_staged_source_value_to_concept_id_mappings()
+
+        if self._only_query or self._only_omop_table:
+            return
+
+        if self._work_skipped:
+            # the maps of the skipped steps weren't refreshed, so they would be wrongly marked as deleted
+            logging.info("Steps or tables were skipped, so the invalid_reason of old maps isn't updated")
+            return
+
+        # cleanup old source to concept maps by setting the invalid_reason to deleted
+        # (we only do this when running a full ETL = all OMOP tables)
+        self._source_to_concept_map_update_invalid_reason(etl_start)
+        self._source_id_to_omop_id_map_update_invalid_reason(etl_start)
 
     @abstractmethod
     def _pre_etl(self, etl_tables: list[str]):
@@ -147,42 +312,659 @@ class Etl(EtlBase):
         """
         pass
 
+    def _write_plan(self) -> None:
+        """Writes the statements that were recorded in plan mode to the plan file."""
+        dependency_levels = {
+            omop_table.lower(): level
+            for level, omop_tables in enumerate(self._cdm_tables_fks_dependencies_resolved)
+            for omop_table in omop_tables
+        }
+        cast(PlanRecorder, self._plan_recorder).write(
+            cast(Path, self._plan_file), dependency_levels, self._step_durations
+        )
+
+    def _plan_step(self, table: str, step: str) -> AbstractContextManager:
+        """Assigns the statements that are recorded in plan mode to a step of a table, for the statements that aren't
+        part of a timed ETL step (ex. the statements on the work tables that hold the state of the runs).
+
+        Args:
+            table (str): The OMOP or work table
+            step (str): The step
+
+        Returns:
+            AbstractContextManager: The context of the step
+        """
+        return self._plan_recorder.step(table, step) if self._plan_recorder else nullcontext()
+
+    @contextmanager
+    def _timed_step(self, omop_table: str, step: str) -> Iterator[None]:
+        """Measures the duration of an ETL step of an OMOP table, and records it as a span in the trace.
+        When a step is measured multiple times (ex. parallel upload queries), the longest duration is kept.
+
+        Args:
+            omop_table (str): The OMOP table
+            step (str): The ETL step
+        """
+        start = time.time()
+        with (
+            self._tracer.span(step, "step", omop_table=omop_table),
+            self._plan_recorder.step(omop_table, step) if self._plan_recorder else nullcontext(),
+        ):
+            yield
+        duration = time.time() - start
+        with self._lock_step_durations:
+            self._step_durations[(omop_table, step)] = max(duration, self._step_durations.get((omop_table, step), 0))
+
+    def _store_run_history(self, run_start: datetime) -> None:
+        """Stores the measured step durations of this run in the run history table.
+
+        Args:
+            run_start (datetime): The start of the run
+        """
+        if not self._step_durations:
+            return
+        try:
+            with self._plan_step("run_history", "store"):
+                self._store_step_durations_in_run_history(
+                    self._run_id,
+                    run_start,
+                    [(omop_table, step, duration) for (omop_table, step), duration in self._step_durations.items()],
+                )
+        except Exception as ex:
+            logging.warning("Failed to store the step durations in the run history table: %s", ex)
+
+    def _hash_inputs(self, *inputs: Path | str) -> str:
+        """Hashes the inputs (file contents or texts) of an ETL step.
+
+        Returns:
+            str: The SHA-256 hash
+        """
+        sha = hashlib.sha256()
+        for step_input in inputs:
+            sha.update(step_input.read_bytes() if isinstance(step_input, Path) else step_input.encode("UTF8"))
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+    def _get_step_input_hashes(self, omop_table: str) -> dict[tuple[str, str], str]:
+        """Hashes the inputs of every step of the OMOP table.
+        The hash of the primary key swap and merge steps also includes the hashes of the tables it depends on,
+        so a changed table also invalidates the completed steps of the tables that come after it.
+
+        Args:
+            omop_table (str): The OMOP table
+
+        Returns:
+            dict[tuple[str, str], str]: The input hash per step and item (concept id column or sql file)
+        """
+        if omop_table in self._table_input_hashes:
+            return self._table_input_hashes[omop_table]
+
+        omop_table_path = cast(Path, self._cdm_folder_path) / omop_table
+        input_hashes: dict[tuple[str, str], str] = {}
+        table_concept_csv_files: list[Path] = []
+        for column in self._get_omop_column_names(omop_table):
+            if "concept_id" not in column:
+                continue
+            concept_id_column = column.lower()
+            concept_csv_files = sorted((omop_table_path / concept_id_column / "custom").glob("*_concept.csv"))
+            usagi_csv_files = sorted((omop_table_path / concept_id_column).glob("*_usagi.csv"))
+            input_hashes[("custom_concepts", concept_id_column)] = self._hash_inputs(*concept_csv_files)
+            table_concept_csv_files.extend(concept_csv_files)
+            input_hashes[("usagi", concept_id_column)] = self._hash_inputs(
+                *concept_csv_files, *usagi_csv_files, str(self._process_semi_approved_mappings)
+            )
+        input_hashes[("custom_concepts_merge", "")] = self._hash_inputs(*table_concept_csv_files)
+        for sql_file in self._get_sql_files(omop_table):
+            for shard_index in self._get_upload_query_shard_indexes(sql_file):
+                input_hashes[("upload_query", self._get_upload_query_item(sql_file, shard_index))] = self._hash_inputs(
+                    self._get_query_from_sql_file(sql_file, omop_table, shard_index)
+                )
+
+        table_hash = self._hash_inputs(
+            *[input_hash for _, input_hash in sorted(input_hashes.items())],
+            *[
+                self._get_step_input_hashes(parent)[("merge", "")]
+                for parent in sorted(self._cdm_tables_fks_dependencies_graph.get(omop_table, set()))
+                if parent in self._cdm_tables_fks_dependencies_graph
+            ],
+            # the metadata table holds the git commit hash of the CDM folder
+            *([str(self._get_git_commmit_hash(cast(Path, self._cdm_folder_path)))] if omop_table == "metadata" else []),
+        )
+        input_hashes[("primary_key_swap", "")] = table_hash
+        input_hashes[("merge", "")] = table_hash
+
+        self._table_input_hashes[omop_table] = input_hashes
+        return input_hashes
+
+    def _get_resumed_run_start(self) -> datetime:
+        """Gets the start of the resumed run (in UTC), from its run id.
+
+        Returns:
+            datetime: The start of the resumed run
+        """
+        try:
+            return datetime.strptime(cast(str, self._resume_run_id), self._RUN_ID_FORMAT).replace(tzinfo=timezone.utc)
+        except ValueError as ex:
+            raise Exception(
+                f"Invalid run id '{self._resume_run_id}' to resume, expected format {self._RUN_ID_FORMAT}"
+            ) from ex
+
+    def _is_hashing_step_inputs(self) -> bool:
+        """Checks if the inputs of the steps are hashed, to record the completed steps and the fingerprints of the tables.
+        Hashing renders every query and reads every Usagi and custom concept CSV, so it is only done when a later or this run uses them.
+
+        Returns:
+            bool: True with --resume, --skip-unchanged-tables or --incremental
+        """  # noqa: E501 # pylint: disable=line-too-long
+        return bool(self._resume_run_id or self._skip_unchanged_tables or self._incremental)
+
+    def _run_step(self, omop_table: str, step: str, item: str, fn: Callable[..., None], *args) -> bool:
+        """Runs an ETL step, unless it was already completed (with the same inputs) in the resumed run.
+
+        Args:
+            omop_table (str): The OMOP table
+            step (str): The ETL step
+            item (str): The item of the step (ex. the concept id column or sql file), empty for table wide steps
+            fn (Callable[..., None]): The step
+
+        Returns:
+            bool: True if the step was run, False if it was skipped
+        """
+        input_hash: Optional[str] = None
+        # a subset of the queries can't be checkpointed
+        if not self._only_query and self._is_hashing_step_inputs():
+            if step == "event_columns":  # the event columns can refer to any table
+                input_hash = self._hash_inputs(
+                    *[self._get_step_input_hashes(table)[("merge", "")] for table in sorted(self._omop_etl_tables)]
+                )
+            elif step == "custom_concepts_merge":  # the custom concepts of the tables (the item) are merged at once
+                input_hash = self._hash_inputs(
+                    *[self._get_step_input_hashes(table)[(step, "")] for table in item.split(",")]
+                )
+            else:
+                input_hash = self._get_step_input_hashes(omop_table)[(step, item)]
+            if self._completed_steps.get((omop_table, step, item)) == input_hash:
+                logging.info("Skipping step '%s' %s of table '%s', it was already completed", step, item, omop_table)
+                self._work_skipped = True
+                return False
+        with self._tracer.span(f"{step} {item}".strip(), "step", omop_table=omop_table, item=item or None):
+            fn(*args)
+        if input_hash is None:
+            return True
+        with self._lock_completed_steps:
+            self._pending_completed_steps.append((omop_table, step, item, input_hash))
+        return True
+
+    def _save_completed_steps(self) -> None:
+        """Saves the steps that completed since the last save in the run state table."""
+        with self._lock_completed_steps:
+            completed_steps, self._pending_completed_steps = self._pending_completed_steps, []
+        if not completed_steps:
+            return
+        try:
+            with self._plan_step("run_state", "store"):
+                self._store_completed_steps(self._run_id, completed_steps)
+        except Exception as ex:
+            logging.warning("Failed to store the completed steps in the run state table: %s", ex)
+            with self._lock_completed_steps:
+                self._pending_completed_steps.extend(completed_steps)
+
+    def _is_table_unchanged(self, omop_table: str) -> bool:
+        """Checks if the fingerprint of the table is the same as the one stored at its last ETL.
+
+        Args:
+            omop_table (str): The OMOP table
+
+        Returns:
+            bool: True if the table can be skipped
+        """
+        if not self._skip_unchanged_tables or self._only_query:
+            return False
+        return self._stored_table_fingerprints.get(omop_table) == self._get_step_input_hashes(omop_table)[("merge", "")]
+
+    def _save_table_fingerprints(self) -> None:
+        """Saves the fingerprints of the tables (and of the uploaded Usagi and custom concept CSV's) that were processed in this run in the table fingerprint table."""  # noqa: E501 # pylint: disable=line-too-long
+        if self._only_query:  # a subset of the queries doesn't match the fingerprint of the table
+            return
+        with self._lock_table_fingerprints:
+            table_fingerprints, self._processed_table_fingerprints = self._processed_table_fingerprints, {}
+        if not table_fingerprints:
+            return
+        try:
+            with self._plan_step("table_fingerprint", "store"):
+                self._store_table_fingerprints(table_fingerprints)
+        except Exception as ex:
+            logging.warning("Failed to store the table fingerprints: %s", ex)
+
+    def _is_upload_unchanged(self, upload_table: str, upload_fingerprint: Optional[str]) -> bool:
+        """Checks if the CSV's of an upload table are the same as the ones of its last upload (with a CSV cache).
+
+        Args:
+            upload_table (str): The Usagi or custom concept upload table
+            upload_fingerprint (Optional[str]): The fingerprint of the CSV's of the upload table
+
+        Returns:
+            bool: True if the upload can be skipped
+        """
+        if upload_fingerprint is None:
+            return False
+        return self._stored_table_fingerprints.get(upload_table) == upload_fingerprint
+
+    def _save_upload_fingerprint(self, upload_table: str, upload_fingerprint: Optional[str]) -> None:
+        """Remembers the fingerprint of the uploaded CSV's, it is stored with the table fingerprints at the end of the run.
+
+        Args:
+            upload_table (str): The Usagi or custom concept upload table
+            upload_fingerprint (Optional[str]): The fingerprint of the CSV's of the upload table
+        """
+        if upload_fingerprint is None:
+            return
+        with self._lock_table_fingerprints:
+            self._processed_table_fingerprints[upload_table] = upload_fingerprint
+
+    def _is_incremental_merge(self, omop_table: str) -> bool:
+        """Checks if the uploaded rows are merged incrementally in the OMOP table.
+        The vocabulary table is always rebuilt, because it combines the uploaded and the existing vocabularies.
+        The tables without a key to replace the uploaded rows are also rebuilt.
+
+        Args:
+            omop_table (str): The OMOP table
+
+        Returns:
+            bool: True if only the rows of the uploaded keys are replaced
+        """
+        return (
+            bool(self._incremental)
+            and omop_table != "vocabulary"
+            and (omop_table in self._INCREMENTAL_MERGE_KEYS or self._get_pk(omop_table) is not None)
+        )
+
+    def _get_incremental_merge_key_columns(self, omop_table: str) -> list[str]:
+        """Gets the key columns that identify the rows of the OMOP table in an incremental merge.
+
+        Args:
+            omop_table (str): The OMOP table
+
+        Returns:
+            list[str]: The key columns (the primary key, or the key of the tables without a primary key)
+        """
+        return self._INCREMENTAL_MERGE_KEYS.get(omop_table) or [cast(str, self._get_pk(omop_table))]
+
+    def _is_watermark_query(self, sql_file: Path) -> bool:
+        """Checks if the upload query only returns the changed rows, because it uses the 'watermark' Jinja variable.
+
+        Args:
+            sql_file (Path): The sql file holding the query on the raw data.
+
+        Returns:
+            bool: True if the query is a Jinja template that uses the watermark
+        """
+        if Path(sql_file).suffix != ".jinja":
+            return False
+        from jinja2 import meta
+
+        with open(sql_file, encoding="UTF8") as file:
+            parsed_template = self._template_env.parse(file.read())
+        return "watermark" in meta.find_undeclared_variables(parsed_template)
+
+    def _get_watermark(self, omop_table: str) -> Optional[datetime]:
+        """Gets the watermark of the table, for the upload queries that only return the changed rows.
+
+        Args:
+            omop_table (str): The OMOP table
+
+        Returns:
+            Optional[datetime]: The start of the run that last merged the table (None if not incremental or never merged)
+        """
+        if not self._is_incremental_merge(omop_table):
+            return None
+        return self._table_watermarks.get(omop_table)
+
+    def _save_table_watermarks(self, watermark: datetime) -> None:
+        """Saves the start of this run (or of the resumed run) as watermark of the tables that were merged in this run.
+
+        Args:
+            watermark (datetime): The start of the run, or of the resumed run
+        """
+        if self._only_query:  # a subset of the queries doesn't cover all the changes of the table
+            return
+        with self._lock_merged_tables:
+            merged_tables, self._merged_tables = self._merged_tables, []
+        if not merged_tables:
+            return
+        try:
+            with self._plan_step("table_watermark", "store"):
+                self._store_table_watermarks(merged_tables, watermark)
+        except Exception as ex:
+            logging.warning("Failed to store the table watermarks: %s", ex)
+
+    def _get_historical_table_durations(self) -> dict[str, float]:
+        """Estimates the duration of processing each OMOP table, based on the step durations of previous runs.
+        Tables without history get the average estimate of the other tables.
+
+        Returns:
+            dict[str, float]: The estimated duration (in seconds) per OMOP table
+        """
+        table_durations: dict[str, float] = defaultdict(float)
+        for (omop_table, step), duration in self._historical_step_durations.items():
+            if step != "event_columns":
+                table_durations[omop_table] += duration
+        default_duration = sum(table_durations.values()) / len(table_durations) if table_durations else 1
+        return {
+            omop_table: table_durations.get(omop_table, default_duration)
+            for omop_table in self._cdm_tables_fks_dependencies_graph
+        }
+
     def _fill_in_event_columns_for_all_omop_tables(self):
-        """Parallelize the mapping of the event columns to the correct foreign keys and fills up the final OMOP tables"""  # noqa: E501 # pylint: disable=line-too-long
-        with ThreadPoolExecutor(max_workers=self._max_parallel_tables) as executor:
-            futures = [
-                executor.submit(self._fill_in_event_columns_for_omop_table, omop_table)
-                for omop_table in self._omop_etl_tables
+        """Parallelize the mapping of the event columns to the correct foreign keys and fills up the final OMOP tables.
+        The tables that took the longest in previous runs are started first.
+        When no table changed, the event columns are already filled in."""
+        if all(self._is_table_unchanged(omop_table) for omop_table in self._omop_etl_tables):
+            logging.info("No table changed, skipping the event columns step")
+            return
+        futures = [
+            self._work_scheduler.submit(
+                self._run_step,
+                omop_table,
+                "event_columns",
+                "",
+                self._fill_in_event_columns_for_omop_table,
+                omop_table,
+                priority=self._historical_step_durations.get((omop_table, "event_columns"), 0),
+            )
+            for omop_table in self._omop_etl_tables
+        ]
+        self._work_scheduler.wait_all(futures)
+
+    def _get_run_omop_tables(self) -> list[str]:
+        """Get the OMOP tables of this run (the tables of the queries to run, the tables to run or all the ETL tables)
+
+        Returns:
+            list[str]: The OMOP tables
+        """
+        if self._only_query:
+            return list(dict.fromkeys(Path(query).parts[0] for query in self._only_query))
+        return self._only_omop_table or self._omop_etl_tables
+
+    def _process_all_mappings(self, omop_tables: list[str]) -> None:
+        """Uploads and applies the custom concept and Usagi CSV's of the tables, as the first phase of the ETL (right after the vocabulary table).
+        The mappings only need the vocabularies, not the foreign key order of the tables. So the concept columns of all the tables are processed in parallel (limited by max_parallel_mappings), and the tables start with their mappings already in place.
+
+        Args:
+            omop_tables (list[str]): The OMOP tables
+        """  # noqa: E501 # pylint: disable=line-too-long
+        omop_tables = [omop_table for omop_table in omop_tables if not self._is_table_unchanged(omop_table)]
+        concept_id_columns = {
+            omop_table: [column.lower() for column in self._get_omop_column_names(omop_table) if "concept_id" in column]
+            for omop_table in omop_tables
+        }
+        # the custom concepts and Usagi mappings of every concept column of every table
+        self._work_scheduler.run_all(
+            self._process_concept_id_column_mappings,
+            [
+                (omop_table, concept_id_column)
+                for omop_table in omop_tables
+                for concept_id_column in concept_id_columns[omop_table]
+            ],
+            lane="mappings",
+        )
+        # the custom concepts of all the tables are merged in the OMOP concept table at once
+        custom_concept_columns = [
+            (omop_table, concept_id_column)
+            for omop_table in omop_tables
+            for concept_id_column in concept_id_columns[omop_table]
+            if any(
+                (cast(Path, self._cdm_folder_path) / omop_table / concept_id_column / "custom").glob("*_concept.csv")
+            )
+        ]
+        if len(custom_concept_columns):
+            with self._timed_step("", "custom_concepts_merge"):
+                self._run_step(
+                    "",
+                    "custom_concepts_merge",
+                    ",".join(dict.fromkeys(omop_table for omop_table, _ in custom_concept_columns)),
+                    self._merge_custom_concepts_with_the_omop_concepts,
+                    custom_concept_columns,
+                )
+        # the table wide steps, that need all the concept columns of the table
+        self._work_scheduler.run_all(
+            self._process_omop_table_mappings,
+            [(omop_table, concept_id_columns[omop_table]) for omop_table in omop_tables],
+            lane="mappings",
+        )
+
+    def _process_concept_id_column_mappings(self, omop_table: str, concept_id_column: str) -> None:
+        """Uploads the custom concept CSV's of a concept column, and uploads and applies its Usagi CSV's.
+
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_column (str): Concept_id column.
+        """
+        with self._timed_step(omop_table, "custom_concepts"):
+            self._run_step(
+                omop_table,
+                "custom_concepts",
+                concept_id_column,
+                self._upload_custom_concepts,
+                omop_table,
+                concept_id_column,
+            )
+        # the Usagi mappings are updated with the custom concepts of the column
+        with self._timed_step(omop_table, "usagi"):
+            self._run_step(
+                omop_table,
+                "usagi",
+                concept_id_column,
+                self._apply_usagi_mapping,
+                omop_table,
+                concept_id_column,
+            )
+
+    def _process_omop_table_mappings(self, omop_table: str, concept_id_columns: list[str]) -> None:
+        """Checks the mapped concepts of all the concept columns of the table at once.
+
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_columns (list[str]): The concept id columns of the table
+        """
+        omop_table_path = cast(Path, self._cdm_folder_path) / f"{omop_table}/"
+        # with a combined mapping load, only the columns with Usagi CSV's have a Usagi view to check
+        usagi_columns = [column for column in concept_id_columns if any((omop_table_path / column).glob("*_usagi.csv"))]
+        if len(usagi_columns):
+            # the mapped concepts are checked after the custom concepts are merged in the OMOP concept table
+            # (also with a vocabulary index, the index isn't guaranteed to hold the vocabularies of the target)
+            with self._timed_step(omop_table, "usagi_check"):
+                fk_domains = self._get_fk_domains(omop_table)
+                self._check_usagi(
+                    omop_table,
+                    usagi_columns,
+                    {column: fk_domains[column] for column in usagi_columns if fk_domains.get(column)},
+                )
+
+    def _process_all_omop_tables(self):
+        """Parallelizes the processing of the ETL tables.
+        Each table is started as soon as the tables it has foreign keys to are processed.
+        In pipeline mode, the upload queries of all tables are started up front, because they only read the raw tables.
+        Tables on the longest chain of dependent tables (estimated with the durations of previous runs) get the highest
+        priority, for the tables and for their queries.
+        The vocabulary table was already processed, before the mapping phase.
+        """
+        dependencies_graph = {
+            omop_table: parents - {"vocabulary"}
+            for omop_table, parents in self._cdm_tables_fks_dependencies_graph.items()
+            if omop_table != "vocabulary"
+        }
+        dag_scheduler = DagScheduler(max_workers=self._max_parallel_tables)
+        priorities = longest_remaining_paths(dependencies_graph, self._get_historical_table_durations())
+        if not self._pipeline_upload_queries:
+            dag_scheduler.run(dependencies_graph, self._process_omop_table_and_save_completed_steps, priorities)
+            return
+
+        upload_query_futures = {
+            omop_table: [
+                self._work_scheduler.submit(
+                    self._run_upload_query_step,
+                    sql_file,
+                    omop_table,
+                    shard_index,
+                    priority=priorities[omop_table],
+                    lane="upload_queries",
+                )
+                for sql_file in self._get_sql_files(omop_table)
+                for shard_index in self._get_upload_query_shard_indexes(sql_file)
             ]
-            # wait(futures, return_when=ALL_COMPLETED)
-            for result in as_completed(futures):
-                result.result()
+            for omop_table in dependencies_graph
+            if not self._is_table_unchanged(omop_table)
+        }
+        try:
+            dag_scheduler.run(
+                dependencies_graph,
+                lambda omop_table: self._process_omop_table_and_save_completed_steps(
+                    omop_table, upload_query_futures=upload_query_futures.get(omop_table, [])
+                ),
+                priorities,
+            )
+        except Exception as ex:
+            for futures in upload_query_futures.values():
+                for future in futures:
+                    future.cancel()
+            raise ex
 
-    def _process_all_omop_tables(self, elt_flow: list[list[str]]):
-        """Recursive function that parallelizes the processing of ETL tables
+    def _process_omop_table_and_save_completed_steps(
+        self,
+        omop_table: str,
+        upload_query_futures: Optional[list[Future]] = None,
+        only_queries: Optional[list[Path]] = None,
+    ):
+        """ETL method for one OMOP table, that saves the completed steps afterwards (also when the table fails)
 
         Args:
-            elt_flow (Any): The tree structure of the tabbel to tun in parallel and the dependent tables
+            omop_table_name (str): Name of the OMOP table
+            upload_query_futures (list[Future]): The upload queries of the table, that were already started (pipeline mode)
+            only_queries (list[Path]): Only run these upload queries
+        """  # noqa: E501 # pylint: disable=line-too-long
+        try:
+            with self._tracer.span(omop_table, "table", omop_table=omop_table):
+                self._process_omop_table(omop_table, only_queries, upload_query_futures)
+        finally:
+            self._save_completed_steps()
+
+    def _get_sql_files(self, omop_table: str) -> list[Path]:
+        """Get the upload queries (.sql and .sql.jinja files) in the folder of the OMOP table
+
+        Args:
+            omop_table (str): OMOP table
+
+        Returns:
+            list[Path]: list of the sql files
+        """
+        omop_table_path = cast(Path, self._cdm_folder_path) / f"{omop_table}/"
+        return [sql_file for suffix in ["*.sql", "*.sql.jinja"] for sql_file in omop_table_path.glob(suffix)]
+
+    def _get_upload_query_shard_indexes(self, sql_file: Path) -> list[Optional[int]]:
+        """Get the shards of the upload query.
+        A Jinja upload query that uses the shard() function (ex. WHERE {{ shard('person_id') }}) is split in upload_query_shards shards, that run in parallel, each into its own upload table.
+
+        Args:
+            sql_file (Path): The sql file holding the query on the raw data.
+
+        Returns:
+            list[Optional[int]]: The shard indexes, or [None] if the query isn't sharded
+        """  # noqa: E501 # pylint: disable=line-too-long
+        if Path(sql_file).suffix != ".jinja" or self._upload_query_shards <= 1:
+            return [None]
+        from jinja2 import meta
+
+        with open(sql_file, encoding="UTF8") as file:
+            parsed_template = self._template_env.parse(file.read())
+        if "shard" not in meta.find_undeclared_variables(parsed_template):
+            return [None]
+        return list(range(self._upload_query_shards))
+
+    def _get_upload_table(self, sql_file: Path | str, shard_index: Optional[int] = None) -> str:
+        """Get the name of the upload table of the (shard of the) upload query, without the '{omop_table}__upload__' prefix.
+
+        Args:
+            sql_file (Path | str): The sql file holding the query on the raw data.
+            shard_index (Optional[int]): The shard of the query
+
+        Returns:
+            str: The name of the upload table
+        """  # noqa: E501 # pylint: disable=line-too-long
+        upload_table = Path(Path(sql_file).stem).stem  # remove file extensions
+        return upload_table if shard_index is None else f"{upload_table}__shard{shard_index}"
+
+    def _get_upload_query_item(self, sql_file: Path | str, shard_index: Optional[int] = None) -> str:
+        """Get the item of the (shard of the) upload query in the run state.
+
+        Args:
+            sql_file (Path | str): The sql file holding the query on the raw data.
+            shard_index (Optional[int]): The shard of the query
+
+        Returns:
+            str: The item
+        """
+        return Path(sql_file).name if shard_index is None else f"{Path(sql_file).name}#shard{shard_index}"
+
+    def _get_shard_function(self, shard_index: Optional[int]) -> Callable[[str], Any]:
+        """Get the shard() function for the Jinja upload queries.
+        The function renders the predicate that only selects the rows of the shard, based on a hash of the column.
+
+        Args:
+            shard_index (Optional[int]): The shard of the query
+
+        Returns:
+            Callable[[str], Any]: The shard() function
         """
-        tables = elt_flow.pop(0)
-        with ThreadPoolExecutor(max_workers=self._max_parallel_tables) as executor:
-            futures = [executor.submit(self._process_omop_table, omop_table) for omop_table in tables]
-            # wait(futures, return_when=ALL_COMPLETED)
-            for result in as_completed(futures):
-                result.result()
+        from markupsafe import Markup
+
+        def shard(column: str) -> Markup:
+            if shard_index is None:
+                return Markup("1 = 1")
+            return Markup(self._get_shard_predicate(column, self._upload_query_shards, shard_index))
+
+        return shard
+
+    def _get_mapped_concept_id_columns(self, omop_table: str, concept_id_columns: list[str]) -> list[str]:
+        """Get the concept id columns that have Usagi mappings (Usagi CSV's or the mappings RiaB adds for its own rows in the metadata table).
+        The other concept id columns have an empty Usagi table, so the swap and merge queries don't join them.
+
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_columns (list[str]): List of concept columns.
 
-        if len(elt_flow):
-            self._process_all_omop_tables(elt_flow)
+        Returns:
+            list[str]: The concept columns with Usagi mappings
+        """  # noqa: E501 # pylint: disable=line-too-long
+        omop_table_path = cast(Path, self._cdm_folder_path) / f"{omop_table}/"
+        builtin_usagi_mappings = self._get_builtin_usagi_mappings()
+        return [
+            column
+            for column in concept_id_columns
+            if (omop_table, column.lower()) in builtin_usagi_mappings
+            or any((omop_table_path / column.lower()).glob("*_usagi.csv"))
+        ]
 
-    def _process_omop_table(self, omop_table: str, only_queries: Optional[list[Path]] = None):
+    def _process_omop_table(
+        self,
+        omop_table: str,
+        only_queries: Optional[list[Path]] = None,
+        upload_query_futures: Optional[list[Future]] = None,
+    ):
         """ETL method for one OMOP table
 
         Args:
             omop_table_name (str): Name of the OMOP table
-            omop_table_props (Any): Object that holds, the pk (primary key), fks (foreign keys) and events of the the OMOP table.
+            only_queries (list[Path]): Only run these upload queries
+            upload_query_futures (list[Future]): The upload queries of the table, that were already started (pipeline mode)
         """  # noqa: E501 # pylint: disable=line-too-long
         omop_table_path = cast(Path, self._cdm_folder_path) / f"{omop_table}/"
-        sql_files = [sql_file for suffix in ["*.sql", "*.sql.jinja"] for sql_file in omop_table_path.glob(suffix)]
+        if self._is_table_unchanged(omop_table):
+            logging.info("Skipping table '%s', its fingerprint didn't change since its last ETL", omop_table)
+            self._work_skipped = True
+            return
+
+        sql_files = self._get_sql_files(omop_table)
         if not len(sql_files):
             logging.info(
                 "No SQL files found in ETL folder '%s'",
@@ -194,7 +976,8 @@ class Etl(EtlBase):
         events = self._omop_event_fields[omop_table] if omop_table in self._omop_event_fields else {}
 
         # create the OMOP work table (only if the table has event columns) based on the DDL, but with the event_id columns of type STRING
-        self._create_omop_work_table(omop_table, events)
+        with self._timed_step(omop_table, "work_table"):
+            self._create_omop_work_table(omop_table, events)
 
         # get all the columns from the destination OMOP table
         columns = self._get_omop_column_names(omop_table)
@@ -203,40 +986,13 @@ class Etl(EtlBase):
             for column in columns
             if "concept_id" in column  # and "source_concept_id" not in column
         ]
+        # only the concept columns with Usagi mappings are joined with their Usagi table in the swap and merge queries
+        mapped_concept_columns = self._get_mapped_concept_id_columns(omop_table, concept_columns)
         required_columns = self._get_required_omop_column_names(omop_table)
 
         # is the primary key an auto numbering column?
         pk_auto_numbering = self._is_pk_auto_numbering(omop_table)
 
-        if not self._skip_usagi_and_custom_concept_upload:
-            with ThreadPoolExecutor(max_workers=self._max_worker_threads_per_table) as executor:
-                # upload an apply the custom concept CSV's
-                futures = [
-                    executor.submit(
-                        self._upload_custom_concepts,
-                        omop_table,
-                        concept_id_column.lower(),
-                    )
-                    for concept_id_column in concept_columns
-                ]
-                # wait(futures, return_when=ALL_COMPLETED)
-                for result in as_completed(futures):
-                    result.result()
-
-            with ThreadPoolExecutor(max_workers=self._max_worker_threads_per_table) as executor:
-                # upload and apply the Usagi CSV's
-                futures = [
-                    executor.submit(
-                        self._apply_usagi_mapping,
-                        omop_table,
-                        concept_id_column.lower(),
-                    )
-                    for concept_id_column in concept_columns
-                ]
-                # wait(futures, return_when=ALL_COMPLETED)
-                for result in as_completed(futures):
-                    result.result()
-
         foreign_key_columns = self._get_fks(omop_table)
         primary_key_column = self._get_pk(omop_table)
 
@@ -244,88 +1000,135 @@ class Etl(EtlBase):
             sql_files = only_queries
 
         if omop_table == "metadata":
-            self._upload_riab_version_in_metadata_table()
-            self._upload_cdm_folder_git_commit_hash_in_metadata_table()
-
-        with ThreadPoolExecutor(max_workers=self._max_worker_threads_per_table) as executor:
-            # upload an apply the custom concept CSV's
-            futures = [
-                executor.submit(
-                    self._run_upload_query,
-                    sql_file,
-                    omop_table,
+            with self._plan_step(omop_table, "metadata_upload"):
+                self._upload_riab_version_in_metadata_table()
+                self._upload_cdm_folder_git_commit_hash_in_metadata_table()
+
+        # the shards of the sharded upload queries each have their own upload table
+        upload_queries = [
+            (sql_file, shard_index)
+            for sql_file in sql_files
+            for shard_index in self._get_upload_query_shard_indexes(sql_file)
+        ]
+
+        if upload_query_futures is not None:
+            # the upload queries were already started at the beginning of the ETL
+            self._work_scheduler.wait_all(upload_query_futures)
+        else:
+            # run the upload queries
+            with self._timed_step(omop_table, "upload_queries"):
+                self._work_scheduler.run_all(
+                    self._run_upload_query_step,
+                    [(sql_file, omop_table, shard_index) for sql_file, shard_index in upload_queries],
                 )
-                for sql_file in sql_files
-            ]
-            # wait(futures, return_when=ALL_COMPLETED)
-            for result in as_completed(futures):
-                result.result()
 
-        upload_tables = [Path(Path(sql_file).stem).stem for sql_file in sql_files]  # remove file extensions
+        upload_tables = [self._get_upload_table(sql_file, shard_index) for sql_file, shard_index in upload_queries]
         if omop_table == "metadata":
             upload_tables.append("riab_version")
             if self._git_cdm_folder_commit_hash:
                 upload_tables.append("git_commit_hash")
 
+        # the tables holding all the keys of the source, the rows of the other keys are removed in an incremental merge
+        # (a subset of the queries doesn't hold all the keys of the table)
+        key_tables = []
+        if not only_queries:
+            key_tables = [
+                f"{omop_table}__keys__{self._get_upload_table(sql_file, shard_index)}"
+                if self._is_watermark_query(sql_file)
+                else f"{omop_table}__upload__{self._get_upload_table(sql_file, shard_index)}"
+                for sql_file, shard_index in upload_queries
+            ]
+            # the metadata rows of RiaB itself are always uploaded completely
+            key_tables += [
+                f"{omop_table}__upload__{upload_table}" for upload_table in upload_tables[len(upload_queries) :]
+            ]
+
         if pk_auto_numbering:
-            sql_files = [Path(sql_file).name for sql_file in sql_files]
+            sql_files = [Path(sql_file).name for sql_file, _ in upload_queries]
             if omop_table == "metadata":
                 sql_files.append("cdm_metadata_riab_version")
                 if self._git_cdm_folder_commit_hash:
                     sql_files.append("cdm_metadata_git_commit_hash")
 
-            # swap the primary key with an auto number
-            self._swap_primary_key_auto_numbering_column(
-                omop_table=omop_table,
-                primary_key_column=cast(str, primary_key_column),
-                concept_id_columns=concept_columns,
-                events=events,
-                sql_files=sql_files,
-                upload_tables=upload_tables,
-            )
-            # store the ID swap in our 'source_id_to_omop_id_swap' table
-            self._store_usagi_source_id_to_omop_id_mapping(
-                omop_table=omop_table,
-                primary_key_column=cast(str, primary_key_column),
-            )
+            def swap_primary_key():
+                with self._timed_step(omop_table, "primary_key_swap"):
+                    # swap the primary key with an auto number
+                    self._swap_primary_key_auto_numbering_column(
+                        omop_table=omop_table,
+                        primary_key_column=cast(str, primary_key_column),
+                        concept_id_columns=concept_columns,
+                        mapped_concept_id_columns=mapped_concept_columns,
+                        events=events,
+                        sql_files=sql_files,
+                        upload_tables=upload_tables,
+                    )
+                    # store the ID swap in our 'source_id_to_omop_id_swap' table
+                    self._store_usagi_source_id_to_omop_id_mapping(
+                        omop_table=omop_table,
+                        primary_key_column=cast(str, primary_key_column),
+                    )
+
+            self._run_step(omop_table, "primary_key_swap", "", swap_primary_key)
 
         if not len(sql_files):
             return
 
-        # merge everything in the destination OMOP work table
-        logging.info(
-            "Check for duplicate rows in uploaded data for table '%s'",
-            omop_table,
-        )
-        self._check_for_duplicate_rows(
-            omop_table=omop_table,
-            columns=columns,
-            upload_tables=upload_tables,
-            primary_key_column=primary_key_column,
-            concept_id_columns=concept_columns,
-            events=events,
-        )
+        def merge():
+            # merge everything in the destination OMOP work table
+            logging.info(
+                "Check for duplicate rows in uploaded data for table '%s'",
+                omop_table,
+            )
+            with self._timed_step(omop_table, "duplicate_check"):
+                self._check_for_duplicate_rows(
+                    omop_table=omop_table,
+                    columns=columns,
+                    upload_tables=upload_tables,
+                    primary_key_column=primary_key_column,
+                    concept_id_columns=concept_columns,
+                    events=events,
+                )
 
-        logging.info(
-            "Merging the upload queries into the omop table '%s'",
-            omop_table,
-        )
-        self._merge_into_omop_table(
-            omop_table=omop_table,
-            columns=columns,
-            upload_tables=upload_tables,
-            required_columns=required_columns,
-            primary_key_column=primary_key_column,
-            pk_auto_numbering=pk_auto_numbering,
-            foreign_key_columns=foreign_key_columns,
-            concept_id_columns=concept_columns,
-            events=events,
-        )
+            logging.info(
+                "Merging the upload queries into the omop table '%s'",
+                omop_table,
+            )
+            with self._timed_step(omop_table, "merge"):
+                null_foreign_key_columns = self._get_null_foreign_key_columns(
+                    omop_table, upload_tables, list(foreign_key_columns)
+                )
+                self._merge_into_omop_table(
+                    omop_table=omop_table,
+                    columns=columns,
+                    upload_tables=upload_tables,
+                    key_tables=key_tables,
+                    required_columns=required_columns,
+                    primary_key_column=primary_key_column,
+                    pk_auto_numbering=pk_auto_numbering,
+                    foreign_key_columns=foreign_key_columns,
+                    null_foreign_key_columns=null_foreign_key_columns,
+                    concept_id_columns=concept_columns,
+                    mapped_concept_id_columns=mapped_concept_columns,
+                    events=events,
+                )
+
+        merged = self._run_step(omop_table, "merge", "", merge)
+
+        if not only_queries:
+            with self._lock_table_fingerprints:
+                # without hashing, the stored fingerprint is cleared, so a later run doesn't skip the changed table
+                self._processed_table_fingerprints[omop_table] = (
+                    self._get_step_input_hashes(omop_table)[("merge", "")] if self._is_hashing_step_inputs() else ""
+                )
+            if merged:  # the watermark of a merge of the resumed run was already saved by that run
+                with self._lock_merged_tables:
+                    self._merged_tables.append(omop_table)
 
     def _run_upload_query(
         self,
         sql_file: Path,
         omop_table: str,
+        shard_index: Optional[int] = None,
     ):
         """Executes the query from the .sql file.
         The results are loaded in a temporary work table (which name will have the format {omop_table}_{sql_file_name}).
@@ -337,24 +1140,238 @@ class Etl(EtlBase):
         Args:
             sql_file (str): The sql file holding the query on the raw data.
             omop_table (str): OMOP table.
+            shard_index (Optional[int]): The shard of the query (for sharded queries), the shard gets its own upload table (with the format {omop_table}_{sql_file_name}__shard{shard_index}).
         """  # noqa: E501 # pylint: disable=line-too-long
-        upload_table = f"{omop_table}__upload__{Path(Path(sql_file).stem).stem}"  # remove file extension
+        upload_table = f"{omop_table}__upload__{self._get_upload_table(sql_file, shard_index)}"
         logging.debug(
             "Running query '%s' from raw tables into table '%s'",
             str(sql_file),
             upload_table,
         )
-        select_query = self._get_query_from_sql_file(sql_file, omop_table)
+        select_query = self._get_query_from_sql_file(sql_file, omop_table, shard_index)
 
         # load the results of the query in the tempopary work table
         self._query_into_upload_table(upload_table, select_query, omop_table)
 
+        # a query that only returns the changed rows, also loads all the keys of the source (without the watermark),
+        # so the incremental merge can remove the rows that were deleted or filtered out in the source
+        if self._get_watermark(omop_table) is not None and self._is_watermark_query(sql_file):
+            keys_table = f"{omop_table}__keys__{self._get_upload_table(sql_file, shard_index)}"
+            select_query = self._get_query_from_sql_file(sql_file, omop_table, shard_index, all_rows=True)
+            self._query_into_keys_table(
+                keys_table, select_query, omop_table, self._get_incremental_merge_key_columns(omop_table)
+            )
+
+        # collect the non-null counts of the foreign key columns, the merge doesn't swap the columns that are always null
+        foreign_key_columns = list(self._get_fks(omop_table))
+        if len(foreign_key_columns):
+            non_null_counts = self._get_non_null_counts(upload_table, foreign_key_columns)
+            with self._lock_upload_table_non_null_counts:
+                self._upload_table_non_null_counts[(omop_table, self._get_upload_table(sql_file, shard_index))] = (
+                    non_null_counts
+                )
+
+    def _get_null_foreign_key_columns(
+        self, omop_table: str, upload_tables: list[str], foreign_key_columns: list[str]
+    ) -> list[str]:
+        """Get the foreign key columns that are null in all the upload tables of the OMOP table.
+        Upload tables without non-null counts (ex. because their upload query was completed in the resumed run) count as non-null.
+
+        Args:
+            omop_table (str): OMOP table.
+            upload_tables (list[str]): List of the upload tables.
+            foreign_key_columns (list[str]): List of foreign key columns.
+
+        Returns:
+            list[str]: The foreign key columns that are always null
+        """  # noqa: E501 # pylint: disable=line-too-long
+        with self._lock_upload_table_non_null_counts:
+            non_null_counts = [
+                self._upload_table_non_null_counts.get((omop_table, upload_table)) for upload_table in upload_tables
+            ]
+        return [
+            column
+            for column in foreign_key_columns
+            if all(counts is not None and counts.get(column) == 0 for counts in non_null_counts)
+        ]
+
+    def _run_upload_query_step(self, sql_file: Path, omop_table: str, shard_index: Optional[int] = None):
+        """Executes the query from the .sql file (unless it was already completed in the resumed run) and measures its duration.
+
+        Args:
+            sql_file (str): The sql file holding the query on the raw data.
+            omop_table (str): OMOP table.
+            shard_index (Optional[int]): The shard of the query (for sharded queries)
+        """  # noqa: E501 # pylint: disable=line-too-long
+
+        def run_upload_query():
+            with self._timed_step(omop_table, "upload_queries"):
+                self._run_upload_query(sql_file, omop_table, shard_index)
+
+        self._run_step(omop_table, "upload_query", self._get_upload_query_item(sql_file, shard_index), run_upload_query)
+
+    def _give_new_custom_concepts_an_unique_id_above_2bilj(self) -> None:
+        """Gives the new custom concepts of the tables of this run an unique id (above 2.000.000.000), in one batch at the start of the run.
+        The id's are stored in the concept id swap table, the custom concepts that are already in the swap table keep their id.
+        Because all the id's are given up front, the concept columns don't have to take turns to give out id's.
+        The custom concept codes are staged, and the database gives out the new id's in one statement, following the highest id in the swap table.
+        """  # noqa: E501 # pylint: disable=line-too-long
+        omop_tables = self._get_run_omop_tables()
+
+        self._create_custom_concept_id_swap_table()
+
+        custom_concepts: set[str] = set()
+        for omop_table in omop_tables:
+            for concept_id_column in [
+                column.lower() for column in self._get_omop_column_names(omop_table) if "concept_id" in column
+            ]:
+                for concept_csv_file in (
+                    cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}/custom/"
+                ).glob("*_concept.csv"):
+                    # the swap table is keyed by the concept id column and the concept code
+                    custom_concepts.update(
+                        f"{concept_id_column}__{concept_code}"
+                        for concept_code in self._convert_concept_csv_to_polars_dataframe(concept_csv_file)[
+                            "concept_code"
+                        ]
+                        .drop_nulls()
+                        .unique()
+                    )
+        if not custom_concepts:
+            return
+
+        logging.info("Staging %i custom concepts, to give the new ones an unique id", len(custom_concepts))
+        df = pl.DataFrame({"x": sorted(custom_concepts)}, schema={"x": pl.Utf8})
+        with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
+            if platform.system() == "Windows":
+                import win32api
+
+                temp_dir_path = win32api.GetLongPathName(temp_dir_path)
+
+            parquet_file = Path(temp_dir_path) / "concept_id_swap_staging.parquet"
+            df.write_parquet(str(parquet_file))
+
+            # stage the custom concept codes, in one load
+            self._load_custom_concept_codes_parquet_in_staging_table(parquet_file)
+
+        # the database gives out the new id's, so they are based on the current content of the swap table
+        self._give_the_staged_custom_concepts_an_unique_id()
+
+    def _upload_combined_mappings(self) -> None:
+        """Loads the Usagi and custom concept CSV's of all the concept id columns in two combined mapping tables (usagi_mappings and custom_concept_mappings), with one load per table instead of one per column.
+        Only the tables of this run are loaded, and only the columns with Usagi mappings (CSV's or the mappings RiaB adds for its own rows in the metadata table) get a Usagi view.
+        The Usagi and custom concept upload tables of the columns become views on the combined mapping tables.
+        The Usagi views swap the custom concept codes with their generated concept ids (above 2.000.000.000).
+        """  # noqa: E501 # pylint: disable=line-too-long
+        builtin_usagi_mappings = self._get_builtin_usagi_mappings()
+        usagi_lazy_frames: list[pl.LazyFrame] = []
+        usagi_csv_files: list[Path] = []
+        usagi_columns: list[tuple[str, str]] = []
+        concept_lazy_frames: list[pl.LazyFrame] = []
+        concept_csv_files: list[Path] = []
+        custom_concept_columns: list[tuple[str, str]] = []
+        for omop_table in self._get_run_omop_tables():
+            for concept_id_column in [
+                column.lower() for column in self._get_omop_column_names(omop_table) if "concept_id" in column
+            ]:
+                column_folder = cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}"
+                column_usagi_csv_files = list(column_folder.glob("*_usagi.csv"))
+                column_concept_csv_files = list((column_folder / "custom").glob("*_concept.csv"))
+                key_columns = [
+                    pl.lit(omop_table).alias("omop_table"),
+                    pl.lit(concept_id_column).alias("concept_id_column"),
+                ]
+
+                if len(column_usagi_csv_files) or (omop_table, concept_id_column) in builtin_usagi_mappings:
+                    usagi_columns.append((omop_table, concept_id_column))
+                    usagi_csv_files.extend(column_usagi_csv_files)
+                    usagi_lazy_frames.extend(
+                        lf.select(*key_columns, pl.all())
+                        for lf in self._get_usagi_lazy_frames(omop_table, concept_id_column, column_usagi_csv_files)
+                    )
+                if len(column_concept_csv_files):
+                    custom_concept_columns.append((omop_table, concept_id_column))
+                    concept_csv_files.extend(column_concept_csv_files)
+                    concept_lazy_frames.extend(
+                        self._convert_concept_csv_to_polars_dataframe(concept_csv_file)
+                        .lazy()
+                        .select(*key_columns, pl.all())
+                        for concept_csv_file in column_concept_csv_files
+                    )
+
+        logging.info(
+            "Uploading %i Usagi CSV's and %i custom concept CSV's in the combined mapping tables",
+            len(usagi_csv_files),
+            len(concept_csv_files),
+        )
+        self._upload_combined_mapping("usagi_mappings", usagi_lazy_frames, usagi_csv_files, self._usagi_polars_schema)
+        self._upload_combined_mapping(
+            "custom_concept_mappings", concept_lazy_frames, concept_csv_files, self._custom_concepts_polars_schema
+        )
+
+        # the Usagi views join the swap table
+        self._create_custom_concept_id_swap_table()
+        self._create_mapping_views(usagi_columns, custom_concept_columns)
+
+        # the upload tables of the columns are views now, a run without a combined mapping load has to upload them again
+        for omop_table, concept_id_column in usagi_columns:
+            self._save_upload_fingerprint(f"{omop_table}__{concept_id_column}_usagi", "combined")
+        for omop_table, concept_id_column in custom_concept_columns:
+            self._save_upload_fingerprint(f"{omop_table}__{concept_id_column}_concept", "combined")
+
+    def _upload_combined_mapping(
+        self,
+        mapping_table: str,
+        lazy_frames: list[pl.LazyFrame],
+        csv_files: list[Path],
+        schema: dict[str, pl.DataType],
+    ) -> None:
+        """Streams the CSV's of all the concept id columns into one Parquet file, and loads it in the combined mapping table.
+
+        Args:
+            mapping_table (str): The combined mapping table
+            lazy_frames (list[pl.LazyFrame]): The CSV's, with their omop_table and concept_id_column
+            csv_files (list[Path]): The CSV files
+            schema (dict[str, pl.DataType]): The schema the CSV's are converted with
+        """  # noqa: E501 # pylint: disable=line-too-long
+        upload_fingerprint = (
+            self._csv_cache.get_fingerprint(
+                csv_files,
+                schema,
+                # the rows are keyed by the folder of their CSV and the metadata table gets extra mappings
+                *sorted(str(csv_file.relative_to(cast(Path, self._cdm_folder_path))) for csv_file in csv_files),
+                self._omop_cdm_version,
+            )
+            if self._csv_cache
+            else None
+        )
+        if self._is_upload_unchanged(mapping_table, upload_fingerprint):
+            logging.info("The CSV's of '%s' didn't change since their last upload, skipping the upload", mapping_table)
+            return
+
+        if not len(lazy_frames):
+            lazy_frames = [
+                pl.LazyFrame(schema={"omop_table": pl.Utf8, "concept_id_column": pl.Utf8, **schema})  # type: ignore
+            ]
+        with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
+            if platform.system() == "Windows":
+                import win32api
+
+                temp_dir_path = win32api.GetLongPathName(temp_dir_path)
+
+            parquet_file = Path(temp_dir_path) / f"{mapping_table}.parquet"
+            # stream the CSV's in one Parquet file in a temporary directory, without loading them all in memory
+            pl.concat(lazy_frames).sink_parquet(parquet_file)
+
+            self._load_combined_mapping_parquet(mapping_table, parquet_file)
+        self._save_upload_fingerprint(mapping_table, upload_fingerprint)
+
     def _upload_custom_concepts(self, omop_table: str, concept_id_column: str):
         """Processes all the CSV files (ending with _concept.csv) under the 'custom' subfolder of the '{concept_id_column}' folder.
         The custom concept CSV's are loaded into one large Arrow table.
         The Arrow table is then saved to a Parquet file in a temp folder.
         The Parquet file is then loaded in a database upload table (in the work zone).
-        The custom concepts are given an unique id (above 2.000.000.000), and are merged in the OMOP concept table.
+        The unique id's (above 2.000.000.000) of the custom concepts were already given at the start of the run.
 
         Args:
             omop_table (str): OMOP table.
@@ -377,15 +1394,6 @@ class Etl(EtlBase):
             concept_id_column,
             omop_table,
         )
-        # clean up the custom concept upload table
-        self._clear_custom_concept_upload_table(omop_table, concept_id_column)
-
-        # create the Usagi table
-        self._create_custom_concept_upload_table(omop_table, concept_id_column)
-
-        # create the swap table
-        self._create_custom_concept_id_swap_table()
-
         # ar_table = None
         df = pl.DataFrame()
         for concept_csv_file in concept_csv_files:  # loop the custom concept CSV's
@@ -399,59 +1407,130 @@ class Etl(EtlBase):
             # concat the DataFrame into one large DataFrame
             df = df_temp if df.is_empty() else pl.concat([df, df_temp])
 
+        validate_in_db = True
+        if self._vocabulary_index and not df.is_empty():
+            # validate the custom concepts against the local vocabulary index, before anything is uploaded
+            validate_in_db = self._validate_custom_concepts_with_vocabulary_index(omop_table, concept_id_column, df)
+
+        upload_table = f"{omop_table}__{concept_id_column}_concept"
+        upload_fingerprint = (
+            self._csv_cache.get_fingerprint(concept_csv_files, self._custom_concepts_polars_schema)
+            if self._csv_cache and not self._combined_mapping_load
+            else None
+        )
+        upload_unchanged = self._is_upload_unchanged(upload_table, upload_fingerprint)
+
+        if not self._combined_mapping_load:  # with a combined mapping load, the upload table is a view
+            if not upload_unchanged:
+                # clean up the custom concept upload table
+                self._clear_custom_concept_upload_table(omop_table, concept_id_column)
+
+            # create the Usagi table
+            self._create_custom_concept_upload_table(omop_table, concept_id_column)
+
+        # create the swap table
+        self._create_custom_concept_id_swap_table()
+
         # = ar_temp_table if not ar_table else pa.concat_tables([ar_table, ar_temp_table])
         if df.is_empty():
             return
-        with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
-            if platform.system() == "Windows":
-                import win32api
+        if upload_unchanged:
+            logging.info(
+                "Custom concept CSV's for column '%s' of table '%s' didn't change since their last upload, skipping the upload",  # noqa: E501 # pylint: disable=line-too-long
+                concept_id_column,
+                omop_table,
+            )
+        elif not self._combined_mapping_load:
+            with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
+                if platform.system() == "Windows":
+                    import win32api
 
-                temp_dir_path = win32api.GetLongPathName(temp_dir_path)
+                    temp_dir_path = win32api.GetLongPathName(temp_dir_path)
 
-            parquet_file = Path(temp_dir_path) / f"{omop_table}__{concept_id_column}_concept.parquet"
-            # save the one large DataFrame in a Parquet file in a temporary directory
-            df.write_parquet(str(parquet_file))
+                parquet_file = Path(temp_dir_path) / f"{omop_table}__{concept_id_column}_concept.parquet"
+                # save the one large DataFrame in a Parquet file in a temporary directory
+                df.write_parquet(str(parquet_file))
+
+                # load the Parquet file into the specific custom concept upload table
+                self._load_custom_concepts_parquet_in_upload_table(parquet_file, omop_table, concept_id_column)
+            self._save_upload_fingerprint(upload_table, upload_fingerprint)
+
+        if validate_in_db:
+            # Check that the domain_id,vocabulary_id,concept_class_id of the custom concept exisits in our uploaded vocabulary
+            self._validate_custom_concepts(omop_table, concept_id_column)
+
+    @abstractmethod
+    def _validate_custom_concepts(self, omop_table: str, concept_id_column: str) -> None:
+        """Checks that the domain_id, vocabulary_id and concept_class_id columns of the custom concept contain valid values, that exists in our uploaded vocabulary."""
+        pass
 
-            # load the Parquet file into the specific custom concept upload table
-            self._load_custom_concepts_parquet_in_upload_table(parquet_file, omop_table, concept_id_column)
+    def _validate_custom_concepts_with_vocabulary_index(
+        self, omop_table: str, concept_id_column: str, df_concepts: pl.DataFrame
+    ) -> bool:
+        """Checks the custom concepts against the local vocabulary index, before they are uploaded.
+        Duplicate custom concepts raise an exception.
+        Custom concepts with a domain_id, vocabulary_id or concept_class_id that isn't in the index are left to the validation in the database, because the ETL can add vocabularies to the vocabulary table.
 
-            # Check that the domain_id,vocabulary_id,concept_class_id of the custom concept exisits in our uploaded vocabulary
-            self._validate_custom_concepts(omop_table, concept_id_column)
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_column (str): Custom concept_id column.
+            df_concepts (pl.DataFrame): The custom concepts of the column.
 
-        logging.info(
-            "Swapping the custom concept id's for for column '%s' of table '%s'",
-            concept_id_column,
-            omop_table,
+        Returns:
+            bool: True if the custom concepts still need to be validated in the database
+        """  # noqa: E501 # pylint: disable=line-too-long
+        vocabulary_index = cast(VocabularyIndex, self._vocabulary_index)
+
+        df_duplicates = (
+            df_concepts.drop("concept_id")
+            .unique()
+            .group_by("concept_code")
+            .agg(amount=pl.len())
+            .filter(pl.col("amount") > 1)
         )
+        if not df_duplicates.is_empty():
+            with pl.Config(fmt_str_lengths=1000, tbl_cols=len(df_duplicates.columns)):
+                raise Exception(
+                    f"Duplicate custom concepts supplied in the custom concept CSV's for column '{concept_id_column}' of table '{omop_table}'\n{df_duplicates}"  # noqa: E501 # pylint: disable=line-too-long
+                )
 
-        self._lock_custom_concepts.acquire()
-        try:
-            # give the custom concepts an unique id (above 2.000.000.000) and store those id's in the swap table
-            self._give_custom_concepts_an_unique_id_above_2bilj(omop_table, concept_id_column)
+        df_existing = vocabulary_index.lookup_concept_codes(
+            df_concepts.lazy(), "vocabulary_id", "concept_code"
+        ).collect()
+        if not df_existing.is_empty():
+            logging.warning(
+                "Custom concepts for column '%s' of table '%s' have the vocabulary_id and concept_code of an existing concept!\n%s",  # noqa: E501 # pylint: disable=line-too-long
+                concept_id_column,
+                omop_table,
+                df_existing,
+            )
 
+        known_ids = {
+            column: vocabulary_index.scan(vocabulary_table).collect()[column]
+            for vocabulary_table, column in [
+                ("domain", "domain_id"),
+                ("vocabulary", "vocabulary_id"),
+                ("concept_class", "concept_class_id"),
+            ]
+        }
+        df_unknown = df_concepts.filter(
+            pl.any_horizontal([~pl.col(column).is_in(known_ids[column]).fill_null(False) for column in known_ids])
+        )
+        if not df_unknown.is_empty():
             logging.info(
-                "Merging custom concept into CONCEPT table for column '%s' of table '%s'",
+                "Custom concepts for column '%s' of table '%s' have a domain_id, vocabulary_id or concept_class_id that isn't in the vocabulary index, validating them in the database",  # noqa: E501 # pylint: disable=line-too-long
                 concept_id_column,
                 omop_table,
             )
-            # merge the custom concepts with their uniquely created id's in the OMOP concept table
-            self._merge_custom_concepts_with_the_omop_concepts(omop_table, concept_id_column)
-        except Exception as ex:
-            raise ex
-        finally:
-            self._lock_custom_concepts.release()
-
-    @abstractmethod
-    def _validate_custom_concepts(self, omop_table: str, concept_id_column: str) -> None:
-        """Checks that the domain_id, vocabulary_id and concept_class_id columns of the custom concept contain valid values, that exists in our uploaded vocabulary."""
-        pass
+            return True
+        return False
 
     def _apply_usagi_mapping(self, omop_table: str, concept_id_column: str):
         """Processes all the Usagi CSV files (ending with _usagi.csv) under the '{concept_id_column}' folder.
-        The CSV's will be loaded to one large Arrow table, converted to Parquet, uploaded to an upload table.
+        The CSV's will be lazily scanned and streamed into one Parquet file, that is uploaded to an upload table.
         The source values will be swapped with their corresponding concept id's.
         The custom concepts will automatically recieve mapping status 'APPROVED'.
-        All source values will be loaded in the SOURCE_TO_CONCEPT_MAP table.
+        All source values will be staged for the SOURCE_TO_CONCEPT_MAP table.
 
         Args:
             omop_table (str): OMOP table.
@@ -462,17 +1541,36 @@ class Etl(EtlBase):
             (cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}/").glob("*_usagi.csv")
         )
 
+        concept_csv_files = list(
+            (cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}/custom/").glob("*_concept.csv")
+        )
+
+        upload_table = f"{omop_table}__{concept_id_column}_usagi"
+        upload_fingerprint = (
+            self._csv_cache.get_fingerprint(
+                usagi_csv_files,
+                self._usagi_polars_schema,
+                # the custom concepts are swapped in the Usagi upload table and the metadata table gets extra mappings
+                self._csv_cache.get_fingerprint(concept_csv_files, self._custom_concepts_polars_schema),
+                self._omop_cdm_version,
+            )
+            if self._csv_cache and len(usagi_csv_files) and not self._combined_mapping_load
+            else None
+        )
+        upload_unchanged = self._is_upload_unchanged(upload_table, upload_fingerprint)
+
         logging.info(
             "Creating concept_id swap for column '%s' of table '%s'",
             concept_id_column,
             omop_table,
         )
-        if len(usagi_csv_files):
-            # clean up the usagi upload table
-            self._clear_usagi_upload_table(omop_table, concept_id_column)
+        if not self._combined_mapping_load:  # with a combined mapping load, the upload table is a view
+            if len(usagi_csv_files) and not upload_unchanged:
+                # clean up the usagi upload table
+                self._clear_usagi_upload_table(omop_table, concept_id_column)
 
-        # create the Usagi upload table
-        self._create_usagi_upload_table(omop_table, concept_id_column)
+            # create the Usagi upload table
+            self._create_usagi_upload_table(omop_table, concept_id_column)
 
         if not len(usagi_csv_files):
             logging.info(
@@ -482,127 +1580,61 @@ class Etl(EtlBase):
             )
             return
 
-        df = pl.DataFrame()
-        for usagi_csv_file in usagi_csv_files:  # loop all the Usagi CSV's
-            logging.info("Creating concept_id swap from Usagi file '%s'", str(usagi_csv_file))
-            # convert the CSV to an Arrow table
-            df_temp = self._convert_usagi_csv_to_polars_dataframe(usagi_csv_file)
-            # only get the APPOVED concepts
-
-            df_duplicates = (
-                df_temp.filter(
-                    pl.col("mappingStatus").is_in(
-                        ["APPROVED", "SEMI-APPROVED"] if self._process_semi_approved_mappings else ["APPROVED"]
-                    )
-                )
-                .group_by("sourceCode", "conceptId")
-                .agg(count=pl.col("sourceCode").len())
-                .filter(pl.col("count") > 1)
-                .sort("count", descending=True)
-            )
-            if not df_duplicates.is_empty():
-                logging.warning(
-                    "Duplicates (combination of sourceCode and conceptId) in the Usagi CSV '%s'!\n%s",
-                    usagi_csv_file,
-                    df_duplicates,
-                )
+        # one lazy scan over all the Usagi CSV's, that only reads the relevant columns
+        lazy_frames = self._get_usagi_lazy_frames(omop_table, concept_id_column, usagi_csv_files)
 
-            # concat the Arrow tables into one large Arrow table
-            df = df_temp if df.is_empty() else pl.concat([df, df_temp])
+        with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
+            if platform.system() == "Windows":
+                import win32api
 
-        if omop_table == "metadata" and concept_id_column == "metadata_concept_id":
-            df_temp = pl.from_dicts(
-                [
-                    {
-                        "sourceCode": f"RIAB_OMOPCDM{self._omop_cdm_version}",
-                        "sourceName": f"OMOPCDM{self._omop_cdm_version}",
-                        "mappingStatus": "APPROVED",
-                        "conceptId": "756265",
-                        "conceptName": "OMOP CDM Version 5.4.0",
-                        "domainId": "Metadata",
-                    },
-                    {
-                        "sourceCode": f"GIT_OMOPCDM{self._omop_cdm_version}",
-                        "sourceName": f"OMOPCDM{self._omop_cdm_version}",
-                        "mappingStatus": "APPROVED",
-                        "conceptId": "756265",
-                        "conceptName": "OMOP CDM Version 5.4.0",
-                        "domainId": "Metadata",
-                    },
-                ],
-                schema=self._usagi_polars_schema,
-            )
-            df = df_temp if df.is_empty() else pl.concat([df, df_temp])
-        if omop_table == "metadata" and concept_id_column == "metadata_type_concept_id":
-            df_temp = pl.from_dicts(
-                [
-                    {
-                        "sourceCode": "RIAB_EHR",
-                        "sourceName": "EHR",
-                        "mappingStatus": "APPROVED",
-                        "conceptId": "32817",
-                        "conceptName": "EHR",
-                        "domainId": "Type Concept",
-                    },
-                    {
-                        "sourceCode": "GIT_EHR",
-                        "sourceName": "EHR",
-                        "mappingStatus": "APPROVED",
-                        "conceptId": "32817",
-                        "conceptName": "EHR",
-                        "domainId": "Type Concept",
-                    },
-                ],
-                schema=self._usagi_polars_schema,
-            )
-            df = df_temp if df.is_empty() else pl.concat([df, df_temp])
+                temp_dir_path = win32api.GetLongPathName(temp_dir_path)
 
-        if not df.is_empty():
-            df_duplicates = (
-                df.filter(
-                    pl.col("mappingStatus").is_in(
-                        ["APPROVED", "SEMI-APPROVED"] if self._process_semi_approved_mappings else ["APPROVED"]
+            parquet_file = os.path.join(temp_dir_path, f"{omop_table}__{concept_id_column}_usagi.parquet")
+            if self._combined_mapping_load:
+                # the Usagi CSV's were already loaded in the combined mapping table, here they are only checked
+                lf_usagi = pl.concat(lazy_frames)
+            else:
+                # stream the Usagi CSV's in one Parquet file in a temporary directory, without loading them all in memory
+                pl.concat(lazy_frames).sink_parquet(parquet_file)
+                lf_usagi = pl.scan_parquet(parquet_file)
+            if lf_usagi.select(pl.len()).collect().item():
+                df_duplicates = (
+                    lf_usagi.filter(
+                        pl.col("mappingStatus").is_in(
+                            ["APPROVED", "SEMI-APPROVED"] if self._process_semi_approved_mappings else ["APPROVED"]
+                        )
                     )
+                    .group_by("sourceCode", "conceptId")
+                    .agg(count=pl.len())
+                    .filter(pl.col("count") > 1)
+                    .sort("count", descending=True)
+                    .collect()
                 )
-                .group_by("sourceCode", "conceptId")
-                .agg(count=pl.col("sourceCode").len())
-                .filter(pl.col("count") > 1)
-                .sort("count", descending=True)
-            )
-            if not df_duplicates.is_empty():
-                logging.warning(
-                    "Duplicates (combination of sourceCode and conceptId) in the Usagi CSV's for concept column '%s' of OMOP table '%s'!",  # noqa: E501 # pylint: disable=line-too-long
-                    concept_id_column,
-                    omop_table,
-                )
-
-            with tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path:
-                if platform.system() == "Windows":
-                    import win32api
+                if not df_duplicates.is_empty():
+                    logging.warning(
+                        "Duplicates (combination of sourceCode and conceptId) in the Usagi CSV's for concept column '%s' of OMOP table '%s'!\n%s",  # noqa: E501 # pylint: disable=line-too-long
+                        concept_id_column,
+                        omop_table,
+                        df_duplicates,
+                    )
 
-                    temp_dir_path = win32api.GetLongPathName(temp_dir_path)
+                if self._vocabulary_index:
+                    # check the mapped concepts against the local vocabulary index, before they are uploaded
+                    self._check_usagi_with_vocabulary_index(omop_table, concept_id_column, lf_usagi)
 
-                parquet_file = os.path.join(temp_dir_path, f"{omop_table}__{concept_id_column}_usagi.parquet")
-                # save the one large Arrow table in a Parquet file in a temporary directory
-                df.write_parquet(parquet_file)
-                # load the Parquet file into the specific usagi upload table
-                self._load_usagi_parquet_in_upload_table(parquet_file, omop_table, concept_id_column)
-
-            fk_domains = self._get_fk_domains(omop_table)
-            columns = self._get_omop_column_names(omop_table)
-            concept_columns = [
-                column
-                for column in columns
-                if "concept_id" in column  # and "source_concept_id" not in column
-            ]
-            # for column, domains in fk_domains.items():
-            for concept_column in concept_columns:
-                self._check_usagi(omop_table, concept_column, fk_domains.get(concept_column))
+                if upload_unchanged:
+                    logging.info(
+                        "Usagi CSV's for column '%s' of table '%s' didn't change since their last upload, skipping the upload",  # noqa: E501 # pylint: disable=line-too-long
+                        concept_id_column,
+                        omop_table,
+                    )
+                elif not self._combined_mapping_load:
+                    # load the Parquet file into the specific usagi upload table
+                    self._load_usagi_parquet_in_upload_table(parquet_file, omop_table, concept_id_column)
+            if not upload_unchanged:
+                self._save_upload_fingerprint(upload_table, upload_fingerprint)
 
-        concept_csv_files = list(
-            (cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}/custom/").glob("*_concept.csv")
-        )
-        if len(concept_csv_files):
+        if len(concept_csv_files) and not self._combined_mapping_load:  # the views on the combined table swap them
             logging.info(
                 "Updating the custom concepts from code to assigned id in the usagi table for column '%s' of table '%s'",  # noqa: E501 # pylint: disable=line-too-long
                 concept_id_column,
@@ -611,18 +1643,169 @@ class Etl(EtlBase):
             self._update_custom_concepts_in_usagi(omop_table, concept_id_column)
 
         logging.info(
-            "Merging mapped concepts into SOURCE_TO_CONCEPT_MAP table for column '%s' of table '%s'",
+            "Staging mapped concepts for the SOURCE_TO_CONCEPT_MAP table for column '%s' of table '%s'",
             concept_id_column,
             omop_table,
         )
-        # fill up the SOURCE_TO_CONCEPT_MAP table with all approved mappings from the Usagi CSV's
-        self._lock_source_value_to_concept_id_mapping.acquire()
-        try:
-            self._store_usagi_source_value_to_concept_id_mapping(omop_table, concept_id_column)
-        except Exception as ex:
-            raise ex
-        finally:
-            self._lock_source_value_to_concept_id_mapping.release()
+        # append the approved mappings from the Usagi CSV's to the staging table, they are merged at the end of the run
+        self._stage_usagi_source_value_to_concept_id_mapping(omop_table, concept_id_column)
+
+    def _get_usagi_lazy_frames(
+        self, omop_table: str, concept_id_column: str, usagi_csv_files: list[Path]
+    ) -> list[pl.LazyFrame]:
+        """Lazily scans the Usagi CSV's of a concept id column, the metadata table gets extra mappings for the RiaB rows.
+
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_column (str): Concept_id column.
+            usagi_csv_files (list[Path]): The Usagi CSV's of the column.
+
+        Returns:
+            list[pl.LazyFrame]: Lazy frames with the relevant columns.
+        """
+        lazy_frames = [self._scan_usagi_csv(usagi_csv_file) for usagi_csv_file in usagi_csv_files]
+        builtin_usagi_mappings = self._get_builtin_usagi_mappings().get((omop_table, concept_id_column))
+        if builtin_usagi_mappings:
+            lazy_frames.append(pl.LazyFrame(builtin_usagi_mappings, schema=self._usagi_polars_schema))
+        return lazy_frames
+
+    def _get_builtin_usagi_mappings(self) -> dict[tuple[str, str], list[dict[str, Any]]]:
+        """Get the Usagi mappings that RiaB adds for its own rows in the metadata table (the RiaB version and the git commit hash of the CDM folder).
+
+        Returns:
+            dict[tuple[str, str], list[dict[str, Any]]]: The Usagi rows per OMOP table and concept id column
+        """  # noqa: E501 # pylint: disable=line-too-long
+        return {
+            ("metadata", "metadata_concept_id"): [
+                {
+                    "sourceCode": f"RIAB_OMOPCDM{self._omop_cdm_version}",
+                    "sourceName": f"OMOPCDM{self._omop_cdm_version}",
+                    "mappingStatus": "APPROVED",
+                    "conceptId": 756265,
+                    "conceptName": "OMOP CDM Version 5.4.0",
+                    "domainId": "Metadata",
+                },
+                {
+                    "sourceCode": f"GIT_OMOPCDM{self._omop_cdm_version}",
+                    "sourceName": f"OMOPCDM{self._omop_cdm_version}",
+                    "mappingStatus": "APPROVED",
+                    "conceptId": 756265,
+                    "conceptName": "OMOP CDM Version 5.4.0",
+                    "domainId": "Metadata",
+                },
+            ],
+            ("metadata", "metadata_type_concept_id"): [
+                {
+                    "sourceCode": "RIAB_EHR",
+                    "sourceName": "EHR",
+                    "mappingStatus": "APPROVED",
+                    "conceptId": 32817,
+                    "conceptName": "EHR",
+                    "domainId": "Type Concept",
+                },
+                {
+                    "sourceCode": "GIT_EHR",
+                    "sourceName": "EHR",
+                    "mappingStatus": "APPROVED",
+                    "conceptId": 32817,
+                    "conceptName": "EHR",
+                    "domainId": "Type Concept",
+                },
+            ],
+        }
+
+    def _check_usagi_with_vocabulary_index(
+        self, omop_table: str, concept_id_column: str, lf_usagi: pl.LazyFrame
+    ) -> None:
+        """Checks the Usagi mappings of a concept id column against the local vocabulary index, before they are uploaded.
+        Non-standard concepts are logged as warning, concepts of a domain that isn't allowed raise an exception.
+        The custom concepts are looked up in the custom concept CSV's of the column.
+
+        Args:
+            omop_table (str): OMOP table.
+            concept_id_column (str): Concept_id column.
+            lf_usagi (pl.LazyFrame): The Usagi mappings of the column.
+        """  # noqa: E501 # pylint: disable=line-too-long
+        vocabulary_index = cast(VocabularyIndex, self._vocabulary_index)
+        domains = self._get_fk_domains(omop_table).get(concept_id_column, [])
+
+        lf_checks = vocabulary_index.lookup_concept_ids(
+            lf_usagi.filter(
+                pl.col("mappingStatus").is_in(
+                    ["APPROVED", "SEMI-APPROVED"] if self._process_semi_approved_mappings else ["APPROVED"]
+                )
+            ),
+            "conceptId",
+        )
+        # the custom concepts don't have a concept id yet (0 or empty), they are mapped by their concept_code
+        is_unmapped = pl.col("conceptId").fill_null(0) == 0
+        concept_csv_files = list(
+            (cast(Path, self._cdm_folder_path) / f"{omop_table}/{concept_id_column}/custom/").glob("*_concept.csv")
+        )
+        if not len(concept_csv_files):
+            lf_checks = lf_checks.filter(~is_unmapped)
+        else:
+            lf_custom_concepts = (
+                pl.concat(
+                    [
+                        self._convert_concept_csv_to_polars_dataframe(concept_csv_file)
+                        for concept_csv_file in concept_csv_files
+                    ]
+                )
+                .lazy()
+                .select(
+                    pl.col("concept_code").alias("sourceCode"),
+                    pl.col("domain_id").alias("custom_domain_id"),
+                    pl.col("standard_concept").alias("custom_standard_concept"),
+                )
+                .unique("sourceCode")
+            )
+            lf_checks = lf_checks.join(lf_custom_concepts, on="sourceCode", how="left").with_columns(
+                concept_domain_id=pl.when(is_unmapped)
+                .then(pl.col("custom_domain_id"))
+                .otherwise(pl.col("concept_domain_id")),
+                concept_standard_concept=pl.when(is_unmapped)
+                .then(pl.col("custom_standard_concept"))
+                .otherwise(pl.col("concept_standard_concept")),
+            )
+
+        df = (
+            lf_checks.filter(pl.col("concept_domain_id").is_not_null())
+            .with_columns(
+                non_standard=(pl.col("concept_standard_concept") != "S").fill_null(False),
+                invalid_domain=(~pl.col("concept_domain_id").str.to_lowercase().is_in(domains)).fill_null(False)
+                if domains
+                else pl.lit(False),
+            )
+            .filter(pl.col("non_standard") | pl.col("invalid_domain"))
+            .select(
+                "sourceCode",
+                "sourceName",
+                "mappingStatus",
+                "conceptId",
+                "conceptName",
+                "domainId",
+                pl.col("concept_standard_concept").alias("standard_concept"),
+                pl.col("concept_domain_id").alias("domain_id"),
+                "non_standard",
+                "invalid_domain",
+            )
+            .sort("invalid_domain", descending=True)
+            .head(1000)
+            .collect()
+        )
+
+        df_non_standard = df.filter(pl.col("non_standard"))
+        if len(df_non_standard):
+            logging.warning(
+                f"Non-standard concepts found in the Usagi CSV's for column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly standard concepts are allowed!\nNon-standard concepts:\n{df_non_standard}"  # noqa: E501 # pylint: disable=line-too-long
+            )
+
+        df_invalid_domains = df.filter(pl.col("invalid_domain"))
+        if len(df_invalid_domains):
+            raise Exception(
+                f"Invalid concept domains found in the Usagi CSV's for column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly these concept domains are allowed: {', '.join(domains)}\nInvalid domains:\n{df_invalid_domains}"  # noqa: E501 # pylint: disable=line-too-long
+            )
 
     def _fill_in_event_columns_for_omop_table(self, omop_table: str):
         """Maps the event columns to the correct foreign keys and fills up the final OMOP tables
@@ -631,8 +1814,7 @@ class Etl(EtlBase):
             omop_table_name (str): OMOP table
             omop_table_props (Any): Primary key, foreign key(s) and event(s) of the OMOP table
         """
-        omop_table_path = cast(Path, self._cdm_folder_path) / f"{omop_table}/"
-        sql_files = [sql_file for suffix in ["*.sql", "*.sql.jinja"] for sql_file in omop_table_path.glob(suffix)]
+        sql_files = self._get_sql_files(omop_table)
         if not len(sql_files):
             return
 
@@ -643,18 +1825,20 @@ class Etl(EtlBase):
 
         primary_key_column = self._get_pk(omop_table)
 
-        self._merge_event_columns(
-            omop_table=omop_table,
-            columns=columns,
-            primary_key_column=primary_key_column,
-            events=events,
-        )
+        with self._timed_step(omop_table, "event_columns"):
+            self._merge_event_columns(
+                omop_table=omop_table,
+                columns=columns,
+                primary_key_column=primary_key_column,
+                events=events,
+            )
 
     def _swap_primary_key_auto_numbering_column(
         self,
         omop_table: str,
         primary_key_column: str,
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
         sql_files: list[str],
         upload_tables: list[str],
@@ -665,6 +1849,7 @@ class Etl(EtlBase):
             omop_table (str): OMOP table.
             primary_key_column (str): The name of the primary key column.
             concept_id_columns (list[str]): List of the columns that hold concepts
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
             sql_files (list[str]): List of the SQL files to execute.
             upload_tables (list[str]): List of the upload tables to execute.
@@ -685,6 +1870,7 @@ class Etl(EtlBase):
             omop_table=omop_table,
             primary_key_column=primary_key_column,
             concept_id_columns=concept_id_columns,
+            mapped_concept_id_columns=mapped_concept_id_columns,
             events=events,
             sql_files=sql_files,
             upload_tables=upload_tables,
@@ -718,11 +1904,14 @@ class Etl(EtlBase):
         omop_table: str,
         columns: list[str],
         upload_tables: list[str],
+        key_tables: list[str],
         required_columns: list[str],
         primary_key_column: Optional[str],
         pk_auto_numbering: bool,
         foreign_key_columns: Any,
+        null_foreign_key_columns: list[str],
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
     ):
         """The one shot merge of the uploaded query result from the omop table, with the swapped primary and foreign keys, the mapped Usagi concept and custom concepts in the destination OMOP table.
@@ -732,17 +1921,41 @@ class Etl(EtlBase):
         Args:
             omop_table (str): OMOP table.
             columns (list[str]): List of columns of the OMOP table.
+            upload_tables (list[str]): List of the upload tables.
+            key_tables (list[str]): The work tables holding all the keys of the source, an incremental merge removes the rows of the other keys (empty to keep them).
             required_columns (list[str]): List of required columns of the OMOP table.
             primary_key_column (str): The name of the primary key column.
             pk_auto_numbering (bool): Is the primary key a generated incremental number?
             foreign_key_columns (Any): List of foreign key columns.
+            null_foreign_key_columns (list[str]): The foreign key columns that are null in all the upload tables, those aren't swapped.
             concept_id_columns (list[str]): List of concept columns.
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
         """  # noqa: E501 # pylint: disable=line-too-long
         pass
 
     def _convert_concept_csv_to_polars_dataframe(self, concept_csv_file: Path) -> pl.DataFrame:
         """Converts a custom concept CSV file to a Polars dataframe, containing the relevant columns.
+        With a CSV cache, the dataframe is read from the cached Parquet file of the CSV.
+
+        Args:
+            concept_csv_file (Path): Concept CSV file
+
+        Returns:
+            pl.DataFrame: Polars dataframe
+        """
+        if self._csv_cache:
+            return pl.read_parquet(
+                self._csv_cache.get_parquet_file(
+                    concept_csv_file,
+                    self._custom_concepts_polars_schema,
+                    lambda parquet_file: self._read_concept_csv(concept_csv_file).write_parquet(parquet_file),
+                )
+            )
+        return self._read_concept_csv(concept_csv_file)
+
+    def _read_concept_csv(self, concept_csv_file: Path) -> pl.DataFrame:
+        """Reads a custom concept CSV file, only keeping the relevant columns.
 
         Args:
             concept_csv_file (Path): Concept CSV file
@@ -773,17 +1986,18 @@ class Etl(EtlBase):
             raise Exception(f"Failed converting concept csv '{concept_csv_file}' to parquet") from e
         return df
 
-    def _convert_usagi_csv_to_polars_dataframe(self, usagi_csv_file: Path) -> pl.DataFrame:
-        """Converts a Usagi CSV file to an Arrow table, maintaining the relevant columns.
+    def _scan_usagi_csv(self, usagi_csv_file: Path) -> pl.LazyFrame:
+        """Lazily scans a Usagi CSV file, only reading the relevant columns.
+        With a CSV cache, the CSV is scanned from its cached Parquet file.
 
         Args:
             usagi_csv_file (str): Usagi CSV file
 
         Returns:
-            pa.Table: Arrow table.
+            pl.LazyFrame: Lazy frame with the relevant columns.
         """
-        logging.debug("Converting Usagi csv '%s' to polars DataFrame", str(usagi_csv_file))
-        df = pl.read_csv(str(usagi_csv_file), schema_overrides=self._usagi_polars_schema).select(
+        logging.debug("Scanning Usagi csv '%s'", str(usagi_csv_file))
+        lf = pl.scan_csv(str(usagi_csv_file), schema_overrides=self._usagi_polars_schema).select(
             "sourceCode",
             "sourceName",
             "mappingStatus",
@@ -791,7 +2005,12 @@ class Etl(EtlBase):
             "conceptName",
             "domainId",
         )
-        return df
+        if not self._csv_cache:
+            return lf
+        # an unchanged Usagi CSV is scanned from its cached Parquet file, instead of being parsed again
+        return pl.scan_parquet(
+            self._csv_cache.get_parquet_file(usagi_csv_file, self._usagi_polars_schema, lf.sink_parquet)
+        )
 
     @abstractmethod
     def _source_to_concept_map_update_invalid_reason(self, etl_start: date) -> None:
@@ -853,24 +2072,52 @@ class Etl(EtlBase):
         pass
 
     @abstractmethod
-    def _give_custom_concepts_an_unique_id_above_2bilj(self, omop_table: str, concept_id_column: str) -> None:
-        """Give the custom concepts an unique id (above 2.000.000.000) and store those id's
-        in the concept id swap table.
+    def _load_custom_concept_codes_parquet_in_staging_table(self, parquet_file: Path) -> None:
+        """The custom concept codes of the run are saved in a parquet file.
+        This method replaces the content of the concept id swap staging table with the parquet file.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
+            parquet_file (Path): The path to the parquet file
         """
         pass
 
     @abstractmethod
-    def _merge_custom_concepts_with_the_omop_concepts(self, omop_table: str, concept_id_column: str) -> None:
-        """Merges the uploaded custom concepts in the OMOP concept table.
+    def _give_the_staged_custom_concepts_an_unique_id(self) -> None:
+        """Gives the staged custom concepts that aren't in the concept id swap table yet an unique id (above 2.000.000.000), in one statement on the database.
+        The new id's follow the highest id in the concept id swap table.
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
+    @abstractmethod
+    def _merge_custom_concepts_with_the_omop_concepts(self, custom_concept_columns: list[tuple[str, str]]) -> None:
+        """Merges the uploaded custom concepts of the concept id columns in the OMOP concept table, in one statement.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-        """
+            custom_concept_columns (list[tuple[str, str]]): The omop tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
+    @abstractmethod
+    def _load_combined_mapping_parquet(self, mapping_table: str, parquet_file: Path) -> None:
+        """Replaces the content of a combined mapping table (usagi_mappings or custom_concept_mappings) with the parquet file.
+
+        Args:
+            mapping_table (str): The combined mapping table
+            parquet_file (Path): The path to the parquet file
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
+    @abstractmethod
+    def _create_mapping_views(
+        self, usagi_columns: list[tuple[str, str]], custom_concept_columns: list[tuple[str, str]]
+    ) -> None:
+        """Creates the Usagi and custom concept upload tables of the concept id columns as views on the combined mapping tables.
+        The Usagi views swap the custom concept codes with their generated concept ids (above 2.000.000.000).
+
+        Args:
+            usagi_columns (list[tuple[str, str]]): The OMOP tables and concept id columns of the Usagi views
+            custom_concept_columns (list[tuple[str, str]]): The OMOP tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
         pass
 
     @abstractmethod
@@ -917,8 +2164,18 @@ class Etl(EtlBase):
         pass
 
     @abstractmethod
-    def _store_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
-        """Fill up the SOURCE_TO_CONCEPT_MAP table with all approved mappings from the uploaded Usagi CSV's
+    def _create_source_to_concept_map_staging_table(self, replace: bool) -> None:
+        """Creates the SOURCE_TO_CONCEPT_MAP staging table (holds the approved mappings of the Usagi CSV's of all the concept id columns)
+
+        Args:
+            replace (bool): Replace the staging table, to remove the mappings of a previous run
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
+    @abstractmethod
+    def _stage_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
+        """Appends all approved mappings from the uploaded Usagi CSV's to the SOURCE_TO_CONCEPT_MAP staging table.
+        The concept id columns append to the staging table in parallel, they are merged in one go at the end of the run.
 
         Args:
             omop_table (str): The omop table
@@ -927,18 +2184,55 @@ class Etl(EtlBase):
         pass
 
     @abstractmethod
-    def _get_query_from_sql_file(self, sql_file: Path, omop_table: str) -> str:
+    def _merge_staged_source_value_to_concept_id_mappings(self) -> None:
+        """Fill up the SOURCE_TO_CONCEPT_MAP table with all the staged mappings, with one duplicate check and one merge."""
+        pass
+
+    @abstractmethod
+    def _get_query_from_sql_file(
+        self, sql_file: Path, omop_table: str, shard_index: Optional[int] = None, all_rows: bool = False
+    ) -> str:
         """Reads the query from file. If it is a Jinja template, it renders the template.
 
         Args:
             sql_file (Path): Path to the sql or jinja file
             omop_table (str): _description_
+            shard_index (Optional[int]): The shard of the query, for the Jinja shard() function
+            all_rows (bool): Render the template without the watermark, so the query returns all the rows
 
         Returns:
             str: The query (if it is a Jinja template, the rendered query)
         """
         pass
 
+    @abstractmethod
+    def _get_shard_predicate(self, column: str, shards: int, shard_index: int) -> str:
+        """Get the predicate that only selects the rows of the shard, based on a hash of the column.
+        Rows with a NULL value in the column belong to the first shard.
+
+        Args:
+            column (str): The column (or expression) to shard on
+            shards (int): The number of shards
+            shard_index (int): The shard
+
+        Returns:
+            str: The predicate
+        """
+        pass
+
+    @abstractmethod
+    def _get_non_null_counts(self, upload_table: str, columns: list[str]) -> dict[str, int]:
+        """Counts the non-null values of the columns of the upload table.
+
+        Args:
+            upload_table (str): The work upload table
+            columns (list[str]): The columns to count
+
+        Returns:
+            dict[str, int]: The non-null count per column
+        """
+        pass
+
     @abstractmethod
     def _query_into_upload_table(self, upload_table: str, select_query: str, omop_table: str) -> None:
         """This method inserts the results from our custom SQL queries the the work OMOP upload table.
@@ -950,6 +2244,20 @@ class Etl(EtlBase):
         """
         pass
 
+    @abstractmethod
+    def _query_into_keys_table(
+        self, keys_table: str, select_query: str, omop_table: str, key_columns: list[str]
+    ) -> None:
+        """Loads the distinct keys of the results of our custom SQL query in a work keys table.
+
+        Args:
+            keys_table (str): The work keys table
+            select_query (str): The query
+            omop_table (str): The omop table
+            key_columns (list[str]): The key columns of the omop table
+        """
+        pass
+
     @abstractmethod
     def _create_pk_auto_numbering_swap_table(
         self, primary_key_column: str, concept_id_columns: list[str], events: Any
@@ -969,6 +2277,7 @@ class Etl(EtlBase):
         omop_table: str,
         primary_key_column: str,
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
         sql_files: list[str],
         upload_tables: list[str],
@@ -980,6 +2289,7 @@ class Etl(EtlBase):
             omop_table (str): The OMOP table
             primary_key_column (str): Primary key column
             concept_id_columns (list[str]): List of concept_id columns
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
             sql_files (list[str]): List of upload SQL files
             upload_tables (list[str]): List of upload tables
@@ -1026,13 +2336,14 @@ class Etl(EtlBase):
         pass
 
     @abstractmethod
-    def _check_usagi(self, omop_table: str, concept_id_column: str, domains: list[str] | None) -> bool:
-        """Checks the usagi fk domain of the concept id column.
+    def _check_usagi(self, omop_table: str, concept_id_columns: list[str], domains: dict[str, list[str]]) -> None:
+        """Checks the Usagi mappings of all the concept id columns of the table in one query.
+        Non-standard concepts are logged as warning, concepts of a domain that isn't allowed raise an exception.
 
         Args:
             omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-            domains (list[str]): The allowed domains
+            concept_id_columns (list[str]): The concept id columns
+            domains (dict[str, list[str]]): The allowed domains per concept id column
         """
         pass
 
@@ -1045,3 +2356,107 @@ class Etl(EtlBase):
     def _upload_cdm_folder_git_commit_hash_in_metadata_table(self) -> None:
         """Upload the cdm folder git commit hash in the metadata table."""
         pass
+
+    @abstractmethod
+    def _create_run_history_table(self) -> None:
+        """Creates the run history table (holds the durations of the ETL steps of previous runs)"""
+        pass
+
+    @abstractmethod
+    def _get_historical_step_durations(self, last_runs: int) -> dict[tuple[str, str], float]:
+        """Gets the average duration (in seconds) of every ETL step of every OMOP table over the last runs.
+
+        Args:
+            last_runs (int): The number of previous runs to take into account
+
+        Returns:
+            dict[tuple[str, str], float]: The average duration per OMOP table and step
+        """
+        pass
+
+    @abstractmethod
+    def _store_step_durations_in_run_history(
+        self, run_id: str, run_start: datetime, step_durations: list[tuple[str, str, float]]
+    ) -> None:
+        """Stores the durations of the ETL steps of this run in the run history table.
+
+        Args:
+            run_id (str): The id of the run
+            run_start (datetime): The start of the run
+            step_durations (list[tuple[str, str, float]]): The OMOP table, step and duration (in seconds) of every step
+        """
+        pass
+
+    @abstractmethod
+    def _create_run_state_table(self) -> None:
+        """Creates the run state table (holds the completed steps of the runs, so that a failed run can be resumed)"""
+        pass
+
+    @abstractmethod
+    def _get_completed_steps(self, run_id: str) -> dict[tuple[str, str, str], str]:
+        """Gets the completed steps of a run.
+
+        Args:
+            run_id (str): The id of the run
+
+        Returns:
+            dict[tuple[str, str, str], str]: The input hash per OMOP table, step and item
+        """
+        pass
+
+    @abstractmethod
+    def _store_completed_steps(self, run_id: str, completed_steps: list[tuple[str, str, str, str]]) -> None:
+        """Stores the completed steps in the run state table.
+
+        Args:
+            run_id (str): The id of the run
+            completed_steps (list[tuple[str, str, str, str]]): The OMOP table, step, item and input hash of every completed step
+        """  # noqa: E501 # pylint: disable=line-too-long
+        pass
+
+    @abstractmethod
+    def _create_table_fingerprint_table(self) -> None:
+        """Creates the table fingerprint table (holds the fingerprint of the inputs of every table at its last ETL)"""
+        pass
+
+    @abstractmethod
+    def _get_table_fingerprints(self) -> dict[str, str]:
+        """Gets the fingerprints of the tables at their last ETL.
+
+        Returns:
+            dict[str, str]: The fingerprint per OMOP table
+        """
+        pass
+
+    @abstractmethod
+    def _store_table_fingerprints(self, table_fingerprints: dict[str, str]) -> None:
+        """Stores the fingerprints of the processed tables.
+
+        Args:
+            table_fingerprints (dict[str, str]): The fingerprint per OMOP table
+        """
+        pass
+
+    @abstractmethod
+    def _create_table_watermark_table(self) -> None:
+        """Creates the table watermark table (holds for every table the start of the run that last merged it)"""
+        pass
+
+    @abstractmethod
+    def _get_table_watermarks(self) -> dict[str, datetime]:
+        """Gets the watermarks of the tables.
+
+        Returns:
+            dict[str, datetime]: The start of the run that last merged the OMOP table
+        """
+        pass
+
+    @abstractmethod
+    def _store_table_watermarks(self, omop_tables: list[str], watermark: datetime) -> None:
+        """Stores the watermark of the merged tables.
+
+        Args:
+            omop_tables (list[str]): The merged OMOP tables
+            watermark (datetime): The start of the run
+        """
+        pass
@@ -11,6 +11,12 @@ from pathlib import Path
 
 from polars import DataFrame, DataType, Datetime, Float64, Int64, Utf8, col, element, lit, read_csv, when
 
+from .csv_cache import CsvCache
+from .plan import PlanRecorder
+from .trace import Tracer
+from .vocabulary_index import VocabularyIndex
+from .vocabulary_snapshots import VocabularySnapshots
+
 
 class EtlBase(ABC):
     """
@@ -28,12 +34,34 @@ class EtlBase(ABC):
         omop_cdm_version: str = "5.4",
         max_parallel_tables: int = 9,
         max_worker_threads_per_table: int = 16,
+        max_parallel_upload_queries: int = 16,
+        max_parallel_mappings: int = 16,
+        max_concurrent_db_operations: int = 16,
+        upload_query_shards: int = 4,
+        plan: str | None = None,
+        trace: str | None = None,
+        vocabulary_index: str | None = None,
+        vocabulary_manifest: str | None = None,
+        vocabulary_snapshots: str | None = None,
+        csv_cache: str | None = None,
+        csv_cache_max_size: int = 1024,
     ):
         """Constructor
         Base class constructor for the ETL commands
 
         Args:
             cdm_folder_path (str): The path to the OMOP folder structure that holds for each OMOP CDM table (folder) the ETL queries, Usagi CSV's and custom concept CSV's0
+            max_parallel_upload_queries (int): The number of upload queries that run in parallel when the upload queries are pipelined
+            max_parallel_mappings (int): The number of concept columns whose custom concept and Usagi CSV's are processed in parallel, in the mapping phase at the start of the ETL
+            max_concurrent_db_operations (int): The global budget of database operations (queries, uploads) that run at the same time during the ETL
+            upload_query_shards (int): The number of shards (run in parallel) of the upload queries that use the Jinja shard() function
+            plan (str): Plan mode, the statements are written to this plan file instead of being run, no database connection is made
+            trace (str): The ETL steps and database operations are recorded as spans in this trace file (Chrome trace format)
+            vocabulary_index (str): The folder of the local vocabulary index, written when the vocabularies are imported and used by the ETL to validate the custom concept and Usagi CSV's before they are uploaded
+            vocabulary_manifest (str): The folder of the local vocabulary manifest, the key columns and row hashes of the loaded vocabulary tables, written when the vocabularies are imported and diffed against a new release by an incremental import
+            vocabulary_snapshots (str): The folder of the local vocabulary snapshots, the vocabulary releases converted to Parquet and keyed by the hash of their zip file, so a release is only converted once
+            csv_cache (str): The folder of the local cache of the Usagi and custom concept CSV's converted to Parquet, unchanged CSV's are loaded from the cache and unchanged uploads are skipped
+            csv_cache_max_size (int): The maximum size of the CSV cache in MB, the least recently used files are evicted
         """  # noqa: E501 # pylint: disable=line-too-long
 
         self._cdm_folder_path = Path(cdm_folder_path).resolve() if cdm_folder_path else None
@@ -41,8 +69,29 @@ class EtlBase(ABC):
         self._omop_cdm_version = omop_cdm_version
         self._max_parallel_tables = max_parallel_tables
         self._max_worker_threads_per_table = max_worker_threads_per_table
+        self._max_parallel_upload_queries = max_parallel_upload_queries
+        self._max_parallel_mappings = max_parallel_mappings
+        self._max_concurrent_db_operations = max_concurrent_db_operations
+        self._upload_query_shards = upload_query_shards
+        self._plan_file = Path(plan).resolve() if plan else None
+        self._plan_recorder = PlanRecorder() if plan else None
+        self._trace_file = Path(trace).resolve() if trace else None
+        self._tracer = Tracer(enabled=bool(trace))
+        self._vocabulary_index = (
+            VocabularyIndex(Path(vocabulary_index).expanduser().resolve()) if vocabulary_index else None
+        )
+        self._vocabulary_manifest_path = (
+            Path(vocabulary_manifest).expanduser().resolve() if vocabulary_manifest else None
+        )
+        self._vocabulary_snapshots = (
+            VocabularySnapshots(Path(vocabulary_snapshots).expanduser().resolve()) if vocabulary_snapshots else None
+        )
+        self._csv_cache = (
+            CsvCache(Path(csv_cache).expanduser().resolve(), csv_cache_max_size * 1024 * 1024) if csv_cache else None
+        )
 
         self._cdm_tables_fks_dependencies_resolved: list[list[str]] = []
+        self._cdm_tables_fks_dependencies_graph: dict[str, set[str]] = {}
 
         logging.debug("Loading Jinja environment")
         import jinja2 as jj
@@ -163,16 +212,22 @@ class EtlBase(ABC):
         )
 
         self._cdm_tables_fks_dependencies_resolved = self._build_fk_dependency_tree_of_tables(tables)
+        self._cdm_tables_fks_dependencies_graph = self._build_fk_dependency_graph_of_tables(tables)
 
         logging.debug(
             "Resolved ETL tables foreign keys dependency graph: \n%s",
             self.print_cdm_tables_fks_dependencies_tree(),
         )
 
-    def _build_fk_dependency_tree_of_tables(self, tables: list[str]):
-        """Builds the foreign key dependency tree of the tables"""
-        fk_dependency_tree: list[list[str]] = []
+    def _build_fk_dependency_graph_of_tables(self, tables: list[str]) -> dict[str, set[str]]:
+        """Builds the foreign key dependency graph of the tables
 
+        Args:
+            tables (list[str]): The tables to include in the graph
+
+        Returns:
+            dict[str, set[str]]: For every table, the set of tables it holds foreign keys to
+        """
         tables_with_fks = dict(
             self._df_omop_fields.filter(
                 (col("cdmTableName").is_in(tables))
@@ -194,6 +249,23 @@ class EtlBase(ABC):
         tables_with_fks["drug_era"].add("drug_exposure")
         tables_with_fks["dose_era"].add("drug_exposure")
 
+        # the vocabulary table is always processed first
+        for table, fks in tables_with_fks.items():
+            if table != "vocabulary":
+                fks.add("vocabulary")
+        if "vocabulary" not in tables_with_fks:
+            tables_with_fks["vocabulary"] = set()
+
+        return tables_with_fks
+
+    def _build_fk_dependency_tree_of_tables(self, tables: list[str]):
+        """Builds the foreign key dependency tree of the tables"""
+        fk_dependency_tree: list[list[str]] = []
+
+        tables_with_fks = dict(
+            (k, v - set(["vocabulary"])) for k, v in self._build_fk_dependency_graph_of_tables(tables).items()
+        )
+
         tables_with_no_fks = set(k for k, v in tables_with_fks.items() if not v)
 
         fk_dependency_tree.append(["vocabulary"])
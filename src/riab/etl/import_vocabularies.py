@@ -6,12 +6,19 @@ import platform
 import tempfile
 import zipfile
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Callable, Optional, cast
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 from .etl_base import EtlBase
+from .vocabulary_manifest import VocabularyManifest
+from .vocabulary_snapshots import VocabularySnapshots
+from .vocabulary_subset import VocabularySubset
 
 
 class ImportVocabularies(EtlBase, ABC):
@@ -19,12 +26,36 @@ class ImportVocabularies(EtlBase, ABC):
     Class that creates the CDM folder structure that holds the raw queries, Usagi CSV's and custom concept CSV's.
     """
 
+    _CSV_BLOCK_SIZE = 64 * 1024 * 1024  # the vocabulary CSV's are parsed in batches of 64MB
+
     def __init__(
         self,
+        incremental: Optional[bool] = None,
+        vocabulary_subset: Optional[str] = None,
         **kwargs,
     ):
+        """Constructor
+
+        Args:
+            incremental (bool): Diff the new release against the local vocabulary manifest and only delete and insert the changed rows, instead of truncating and refilling the vocabulary tables
+            vocabulary_subset (str): The CDM folder whose Usagi CSV's define the subset of the concept tables that is imported (for development and test environments)
+        """  # noqa: E501 # pylint: disable=line-too-long
         super().__init__(**kwargs)
 
+        self._incremental = incremental
+        self._vocabulary_manifest = (
+            VocabularyManifest(self._vocabulary_manifest_path, self._get_vocabulary_target())
+            if self._vocabulary_manifest_path
+            else None
+        )
+        self._vocabulary_subset = (
+            VocabularySubset(Path(vocabulary_subset).expanduser().resolve()) if vocabulary_subset else None
+        )
+        self._snapshot_id: Optional[str] = None  # the vocabulary snapshot the Parquet parts are read from
+        self._snapshot_staging_path: Optional[Path] = None  # the folder the CSV's are converted in, for a new snapshot
+        # with a vocabulary subset, the Parquet parts of the whole release are converted before the tables are imported
+        self._release_parquet_parts: Optional[dict[str, list[Path]]] = None
+
         self._vocabulary_tables = [
             "concept",
             "concept_ancestor",
@@ -37,86 +68,89 @@ class ImportVocabularies(EtlBase, ABC):
             "vocabulary",
         ]
 
-    def run(self, path_to_zip_file: str):
-        """import vocabularies, as zip-file downloaded from athena.ohdsi.org, into"""
-
-
+    def run(self, zip_file_or_snapshot_id: str):
+        """import vocabularies, as zip-file downloaded from athena.ohdsi.org or as id of a local vocabulary snapshot, into"""
+        path_to_zip_file: Optional[str] = None
+        new_snapshot_id: Optional[str] = None
+        if Path(zip_file_or_snapshot_id).is_file():
+            path_to_zip_file = zip_file_or_snapshot_id
+            if self._vocabulary_snapshots:
+                snapshot_id = self._vocabulary_snapshots.get_snapshot_id(Path(path_to_zip_file))
+                if self._vocabulary_snapshots.exists(snapshot_id):
+                    self._snapshot_id = snapshot_id
+                else:
+                    new_snapshot_id = snapshot_id
+                    self._snapshot_staging_path = self._vocabulary_snapshots.create_staging_path(snapshot_id)
+        elif self._vocabulary_snapshots and self._vocabulary_snapshots.exists(zip_file_or_snapshot_id):
+            self._snapshot_id = zip_file_or_snapshot_id
+        else:
+            raise Exception(f"'{zip_file_or_snapshot_id}' is no vocabularies zip file, nor a vocabulary snapshot id")
 
         self._pre_load()
 
-        with ThreadPoolExecutor(max_workers=self._max_parallel_tables) as executor:
-            logging.info("Deleting vocabulary upload tables.")
-            futures = [
-                executor.submit(
-                    self._clear_vocabulary_upload_table,
-                    vocabulary_table,
-                )
-                for vocabulary_table in self._vocabulary_tables
-            ]
-            # wait(futures, return_when=ALL_COMPLETED)
-            for result in as_completed(futures):
-                result.result()
-
+        try:
             with (
-                zipfile.ZipFile(path_to_zip_file, "r") as zip_ref,
+                ThreadPoolExecutor(max_workers=self._max_parallel_tables) as executor,
+                ThreadPoolExecutor(max_workers=self._max_concurrent_db_operations) as upload_executor,
                 tempfile.TemporaryDirectory(prefix="riab_") as temp_dir_path,
             ):
-                logging.info(
-                    "Extracting vocabularies zip file '%s' to temporary dir '%s'",
-                    path_to_zip_file,
-                    temp_dir_path,
-                )
                 if platform.system() == "Windows":
                     import win32api
 
                     temp_dir_path = win32api.GetLongPathName(temp_dir_path)
 
-                # unzip each file from the archive in parallel
-                # futures = [
-                #     executor.submit(zip_ref.extract, file, temp_dir_path)
-                #     for file in zip_ref.namelist()
-                #     if file.endswith(".csv")
-                # ]
-                # # wait(futures, return_when=ALL_COMPLETED)
-                # for result in as_completed(futures):
-                #     result.result()
-                zip_ref.extractall(temp_dir_path)
-
-                for csv_file in Path(temp_dir_path).glob("*.csv"):
-                    def blocks(files, size=65536):
-                        while True:
-                            b = files.read(size)
-                            if not b: break
-                            yield b
-                    with open(csv_file, "r",encoding="utf-8",errors='ignore') as f:
-                        number_of_lines = sum(bl.count("\n") for bl in blocks(f))
-                    logging.info(f"Vocabulary '{csv_file.name}' holds {number_of_lines} records")
-
-                logging.info("Uploading vocabulary CSV's")
-                futures = [
+                if self._snapshot_id:
+                    logging.info("Importing the vocabularies from vocabulary snapshot '%s'", self._snapshot_id)
+                else:
+                    logging.info("Importing the vocabularies from zip file '%s'", path_to_zip_file)
+
+                if self._vocabulary_subset:
+                    # the subset is the closure over several vocabulary tables, so the whole release is converted first
+                    release_futures = {
+                        executor.submit(
+                            self._get_release_parquet_parts,
+                            vocabulary_table,
+                            path_to_zip_file,
+                            Path(temp_dir_path),
+                            lambda parquet_part: None,
+                        ): vocabulary_table
+                        for vocabulary_table in self._vocabulary_tables
+                    }
+                    self._release_parquet_parts = {}
+                    for result in as_completed(release_futures):
+                        self._release_parquet_parts[release_futures[result]] = result.result()
+                    self._vocabulary_subset.compute(self._release_parquet_parts)
+
+                # every vocabulary table flows through its own pipeline
+                # (the uploads of the Parquet parts of all the tables share the upload executor)
+                futures = {
                     executor.submit(
-                        self._convert_csv_to_parquet_and_upload,
+                        self._import_vocabulary_table,
                         vocabulary_table,
-                        Path(temp_dir_path)
-                        / f"{vocabulary_table.upper()}.csv",  # Uppercase because files in zip-file are still in uppercase, against the CDM 5.4 convention
-                    )
+                        path_to_zip_file,
+                        Path(temp_dir_path),
+                        upload_executor,
+                    ): vocabulary_table
                     for vocabulary_table in self._vocabulary_tables
-                ]
+                }
                 # wait(futures, return_when=ALL_COMPLETED)
+                parquet_parts: dict[str, list[Path]] = {}
                 for result in as_completed(futures):
-                    result.result()
-
-            logging.info("Refill vocabulary tables.")
-            futures = [
-                executor.submit(
-                    self._refill_vocabulary_table,
-                    vocabulary_table,
-                )
-                for vocabulary_table in self._vocabulary_tables
-            ]
-            # wait(futures, return_when=ALL_COMPLETED)
-            for result in as_completed(futures):
-                result.result()
+                    parquet_parts[futures[result]] = result.result()
+        except Exception as ex:
+            if self._snapshot_staging_path:
+                cast(VocabularySnapshots, self._vocabulary_snapshots).discard(self._snapshot_staging_path)
+            raise ex
+
+        if new_snapshot_id:
+            # the converted release is only stored once all the vocabulary tables are imported
+            # (with a vocabulary subset, the snapshot still holds the whole release)
+            cast(VocabularySnapshots, self._vocabulary_snapshots).commit(
+                new_snapshot_id,
+                cast(Path, self._snapshot_staging_path),
+                Path(cast(str, path_to_zip_file)).name,
+                self._release_parquet_parts or parquet_parts,
+            )
 
         self._post_load()
 
@@ -130,66 +164,356 @@ class ImportVocabularies(EtlBase, ABC):
         """Stuff to do after the load (ex re-add constraints to omop tables)"""
         pass
 
-    def _convert_csv_to_parquet_and_upload(self, vocabulary_table: str, csv_file: Path):
+    def _import_vocabulary_table(
+        self,
+        vocabulary_table: str,
+        path_to_zip_file: Optional[str],
+        temp_dir_path: Path,
+        upload_executor: ThreadPoolExecutor,
+    ) -> list[Path]:
+        """Imports a vocabulary table: clears its upload table, converts and uploads its CSV and refills the table.
+        The tables don't wait on each other, so a small table is refilled while the large tables are still converting.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            path_to_zip_file (str): Path to the vocabularies zip file (None when imported from a vocabulary snapshot)
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+            upload_executor (ThreadPoolExecutor): The executor that uploads the Parquet parts
+
+        Returns:
+            list[Path]: The Parquet parts of the vocabulary table
         """
-        Convert a CSV file to parquet and upload it to the vocabulary upload table.
+        if self._incremental:
+            if self._vocabulary_manifest and self._vocabulary_manifest.exists(vocabulary_table):
+                # the manifest is only trusted when it holds as many rows as the table
+                manifest_row_count = self._vocabulary_manifest.get_row_count(vocabulary_table)
+                table_row_count = self._get_vocabulary_table_row_count(vocabulary_table)
+                if manifest_row_count == table_row_count:
+                    return self._import_vocabulary_table_incrementally(
+                        vocabulary_table, path_to_zip_file, temp_dir_path
+                    )
+                logging.warning(
+                    "The vocabulary manifest of vocabulary table '%s' holds %s rows, but the table holds %i rows, "
+                    "falling back to a full import",
+                    vocabulary_table,
+                    manifest_row_count,
+                    table_row_count,
+                )
+            else:
+                logging.warning(
+                    "No vocabulary manifest of vocabulary table '%s' to diff against, falling back to a full import",
+                    vocabulary_table,
+                )
+
+        self._clear_vocabulary_upload_table(vocabulary_table)
+        parquet_parts = self._convert_csv_to_parquet_and_upload(
+            vocabulary_table, path_to_zip_file, temp_dir_path, upload_executor
+        )
+        logging.info("Refill vocabulary table '%s'", vocabulary_table)
+        self._refill_vocabulary_table(vocabulary_table)
+
+        if self._vocabulary_manifest:
+            # the manifest is only written once the table holds the release
+            self._vocabulary_manifest.write(vocabulary_table, pl.scan_parquet(parquet_parts))
+            self._remove_parquet_parts(parquet_parts)
+        return parquet_parts
+
+    def _import_vocabulary_table_incrementally(
+        self, vocabulary_table: str, path_to_zip_file: Optional[str], temp_dir_path: Path
+    ) -> list[Path]:
+        """Imports a vocabulary table incrementally: diffs its CSV against the manifest of the loaded release and
+        only deletes and inserts the changed rows. The table is never empty during the import.
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            csv_file (Path): Path to the CSV file
+            path_to_zip_file (str): Path to the vocabularies zip file (None when imported from a vocabulary snapshot)
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+
+        Returns:
+            list[Path]: The Parquet parts of the vocabulary table
         """
-        parquet_file = self._convert_csv_to_parquet(vocabulary_table, csv_file)
-        self._load_vocabulary_parquet_in_upload_table(vocabulary_table, parquet_file)
+        vocabulary_manifest = cast(VocabularyManifest, self._vocabulary_manifest)
+        parquet_parts = self._get_parquet_parts(
+            vocabulary_table, path_to_zip_file, temp_dir_path, lambda parquet_part: None
+        )
+        if self._vocabulary_index and self._vocabulary_index.is_indexed(vocabulary_table):
+            self._vocabulary_index.write(vocabulary_table, pl.scan_parquet(parquet_parts))
 
-    def _convert_csv_to_parquet(self, vocabulary_table: str, csv_file: Path) -> Path:
-        """Converts a dictionary CSV file to a parquet file
+        upserts_parquet = temp_dir_path / f"{vocabulary_table}__upserts.parquet"
+        deletes_parquet = temp_dir_path / f"{vocabulary_table}__deletes.parquet"
+        number_of_upserts, number_of_deletes = vocabulary_manifest.diff(
+            vocabulary_table, pl.scan_parquet(parquet_parts), upserts_parquet, deletes_parquet
+        )
+        logging.info(
+            "Vocabulary '%s' has %i new or changed and %i removed records",
+            vocabulary_table,
+            number_of_upserts,
+            number_of_deletes,
+        )
+        if number_of_upserts or number_of_deletes:
+            self._apply_vocabulary_changes(
+                vocabulary_table,
+                vocabulary_manifest.get_key_columns(vocabulary_table),
+                upserts_parquet,
+                deletes_parquet,
+            )
+
+        vocabulary_manifest.write(vocabulary_table, pl.scan_parquet(parquet_parts))
+        self._remove_parquet_parts(parquet_parts)
+        upserts_parquet.unlink()
+        deletes_parquet.unlink()
+        return parquet_parts
+
+    def _convert_csv_to_parquet_and_upload(
+        self,
+        vocabulary_table: str,
+        path_to_zip_file: Optional[str],
+        temp_dir_path: Path,
+        upload_executor: ThreadPoolExecutor,
+    ) -> list[Path]:
+        """
+        Convert a CSV file from the zip file to Parquet parts and upload them to the vocabulary upload table.
+        The parts are uploaded while the rest of the CSV is still being parsed.
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            csv_file (Path): Path to the CSV file
+            path_to_zip_file (str): Path to the vocabularies zip file (None when imported from a vocabulary snapshot)
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+            upload_executor (ThreadPoolExecutor): The executor that uploads the Parquet parts
 
         Returns:
-            Path: Path to the parquet file
+            list[Path]: The Parquet parts, they are only kept on disk when the vocabulary manifest is written from them
         """
-        logging.debug("Converting '%s.csv' to parquet", vocabulary_table)
-        df_vocabulary_table = self._read_vocabulary_csv(vocabulary_table, csv_file)
+        # the index and the manifest are written from the parts, so those are kept until the table is converted
+        # (the parts of a vocabulary snapshot are always kept)
+        keep_parquet_parts = bool(
+            (self._vocabulary_index and self._vocabulary_index.is_indexed(vocabulary_table))
+            or self._vocabulary_manifest
+            or self._vocabulary_snapshots
+        )
 
-        # sort the dataframe on the first column (the _id column), this will speed up the import
-        df_vocabulary_table = df_vocabulary_table.sort(df_vocabulary_table.columns[0]) 
+        def upload_parquet_part(parquet_part: Path):
+            self._upload_vocabulary_parquet_part(vocabulary_table, parquet_part)
+            if not keep_parquet_parts:
+                parquet_part.unlink()  # free the disk space as soon as possible
+
+        upload_futures: list[Future] = []
+        try:
+            parquet_parts = self._get_parquet_parts(
+                vocabulary_table,
+                path_to_zip_file,
+                temp_dir_path,
+                lambda parquet_part: upload_futures.append(upload_executor.submit(upload_parquet_part, parquet_part)),
+            )
+            for result in as_completed(upload_futures):
+                result.result()
+        except Exception as ex:
+            for future in upload_futures:
+                future.cancel()
+            raise ex
 
-        parquet_file = csv_file.parent / f"{vocabulary_table}.parquet"
-        df_vocabulary_table.write_parquet(parquet_file)
-        return parquet_file
+        if self._vocabulary_index and self._vocabulary_index.is_indexed(vocabulary_table):
+            # keep the columns that the ETL needs to validate the custom concept and Usagi CSV's in the local index
+            self._vocabulary_index.write(vocabulary_table, pl.scan_parquet(parquet_parts))
+        if not self._vocabulary_manifest:
+            self._remove_parquet_parts(parquet_parts)
 
-    def _read_vocabulary_csv(self, vocabulary_table: str, csv_file: Path) -> pl.DataFrame:
-        """Reads a specific standardised vocabulary table CSV file and converts it into an Polars DataFrame
+        self._load_vocabulary_parquet_in_upload_table(vocabulary_table, parquet_parts)
+        return parquet_parts
+
+    def _get_parquet_parts(
+        self,
+        vocabulary_table: str,
+        path_to_zip_file: Optional[str],
+        temp_dir_path: Path,
+        on_parquet_part: Callable[[Path], None],
+    ) -> list[Path]:
+        """Gets the Parquet parts of a vocabulary table that are imported, the release is filtered to the vocabulary
+        subset when there is one.
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            csv_file (Path): Path to the CSV file
+            path_to_zip_file (str): Path to the vocabularies zip file (None when imported from a vocabulary snapshot)
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+            on_parquet_part (Callable[[Path], None]): Called for every Parquet part, as soon as it is available
 
         Returns:
-            pl.DataFrame: The CSV converted in an data frame
+            list[Path]: The Parquet parts
         """
+        if not self._vocabulary_subset:
+            return self._get_release_parquet_parts(vocabulary_table, path_to_zip_file, temp_dir_path, on_parquet_part)
+
+        parquet_parts = cast(dict[str, list[Path]], self._release_parquet_parts)[vocabulary_table]
+        if self._vocabulary_subset.is_filtered(vocabulary_table):
+            subset_parquet = temp_dir_path / f"{vocabulary_table}__subset.parquet"
+            self._vocabulary_subset.filter(vocabulary_table, pl.scan_parquet(parquet_parts)).sink_parquet(
+                subset_parquet
+            )
+            logging.info(
+                "Vocabulary '%s' subset holds %i records",
+                vocabulary_table,
+                pq.read_metadata(subset_parquet).num_rows,
+            )
+            parquet_parts = [subset_parquet]
+        for parquet_part in parquet_parts:
+            on_parquet_part(parquet_part)
+        return parquet_parts
+
+    def _get_release_parquet_parts(
+        self,
+        vocabulary_table: str,
+        path_to_zip_file: Optional[str],
+        temp_dir_path: Path,
+        on_parquet_part: Callable[[Path], None],
+    ) -> list[Path]:
+        """Gets the Parquet parts of a vocabulary table, from the vocabulary snapshot when the release was converted
+        before, else by converting its CSV (in the staging folder of a new snapshot, when the snapshots are stored).
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            path_to_zip_file (str): Path to the vocabularies zip file (None when imported from a vocabulary snapshot)
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+            on_parquet_part (Callable[[Path], None]): Called for every Parquet part, as soon as it is available
+
+        Returns:
+            list[Path]: The Parquet parts
+        """
+        if self._snapshot_id:
+            vocabulary_snapshots = cast(VocabularySnapshots, self._vocabulary_snapshots)
+            logging.info(
+                "Vocabulary '%s' holds %i records (from vocabulary snapshot)",
+                vocabulary_table,
+                vocabulary_snapshots.get_number_of_records(self._snapshot_id, vocabulary_table),
+            )
+            parquet_parts = vocabulary_snapshots.get_parquet_parts(self._snapshot_id, vocabulary_table)
+            for parquet_part in parquet_parts:
+                on_parquet_part(parquet_part)
+            return parquet_parts
+
+        return self._convert_csv_to_parquet(
+            vocabulary_table,
+            cast(str, path_to_zip_file),
+            self._snapshot_staging_path or temp_dir_path,
+            on_parquet_part,
+        )
+
+    def _remove_parquet_parts(self, parquet_parts: list[Path]) -> None:
+        """Removes the temporary Parquet parts of a vocabulary table, the parts of a vocabulary snapshot are kept
+
+        Args:
+            parquet_parts (list[Path]): The Parquet parts
+        """
+        if self._snapshot_id or self._snapshot_staging_path:
+            return
+        for parquet_part in parquet_parts:
+            parquet_part.unlink(missing_ok=True)
+
+    def _convert_csv_to_parquet(
+        self,
+        vocabulary_table: str,
+        path_to_zip_file: str,
+        temp_dir_path: Path,
+        on_parquet_part: Callable[[Path], None],
+    ) -> list[Path]:
+        """Streams a vocabulary CSV file from the zip file to Parquet parts.
+        The CSV is parsed in batches and every batch is written as a Parquet part, the table is never fully in memory.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            path_to_zip_file (str): Path to the vocabularies zip file
+            temp_dir_path (Path): The temporary dir for the Parquet parts
+            on_parquet_part (Callable[[Path], None]): Called for every Parquet part, as soon as it is written
+
+        Returns:
+            list[Path]: The Parquet parts
+        """
+        logging.debug("Converting '%s.csv' to parquet", vocabulary_table)
         polars_schema = self._get_polars_schema_for_cdm_table(vocabulary_table)
-        
-        df_vocabulary_table = pl.read_csv(
-            csv_file, separator="\t",
-            quote_char=None,
-            try_parse_dates=True,
-            schema=polars_schema,
-            encoding="utf-8",
-            ignore_errors=False,
-            infer_schema_length=0
+        date_columns = (
+            self._df_omop_fields.filter(
+                (pl.col("cdmTableName").str.to_lowercase() == vocabulary_table) & (pl.col("cdmDatatype") == "date")
+            )
+            .get_column("cdmFieldName")
+            .to_list()
         )
 
-        date_columns = self._df_omop_fields.filter(
-            (pl.col("cdmTableName").str.to_lowercase() == vocabulary_table) & (pl.col("cdmDatatype") == "date")
-        ).select("cdmFieldName")
-        for date_column in date_columns:
-            df_vocabulary_table = df_vocabulary_table.with_columns(pl.col(date_column).str.to_date(format="%Y%m%d"))
+        def convert_batch(df_batch: pl.DataFrame) -> pa.Table:
+            return df_batch.with_columns(
+                [
+                    (
+                        pl.col(column).str.to_date(format="%Y%m%d")
+                        if column in date_columns
+                        else pl.col(column).cast(data_type)
+                    )
+                    for column, data_type in polars_schema.items()
+                ]
+            ).to_arrow()
+
+        parquet_parts: list[Path] = []
+
+        def write_parquet_part(table: pa.Table):
+            parquet_part = temp_dir_path / f"{vocabulary_table}__part{len(parquet_parts):05}.parquet"
+            pq.write_table(table, parquet_part)
+            parquet_parts.append(parquet_part)
+            on_parquet_part(parquet_part)
+
+        number_of_records = 0
+        # every thread opens its own handle on the zip file
+        with zipfile.ZipFile(path_to_zip_file, "r") as zip_ref:
+            # the file names in the zip-file are still in uppercase, against the CDM 5.4 convention
+            csv_member = next(
+                (
+                    member
+                    for member in zip_ref.namelist()
+                    if Path(member).name.upper() == f"{vocabulary_table.upper()}.CSV"
+                ),
+                None,
+            )
+            if not csv_member:
+                raise Exception(
+                    f"Vocabulary '{vocabulary_table.upper()}.csv' not found in zip file '{path_to_zip_file}'"
+                )
+
+            with zip_ref.open(csv_member) as csv_stream:
+                csv_reader = pa_csv.open_csv(
+                    csv_stream,
+                    read_options=pa_csv.ReadOptions(block_size=self._CSV_BLOCK_SIZE, encoding="utf8"),
+                    parse_options=pa_csv.ParseOptions(delimiter="\t", quote_char=False),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types={column: pa.string() for column in polars_schema}, strings_can_be_null=True
+                    ),
+                )
+                for batch in csv_reader:
+                    write_parquet_part(convert_batch(cast(pl.DataFrame, pl.from_arrow(batch))))
+                    number_of_records += batch.num_rows
+
+        if not len(parquet_parts):
+            # an empty vocabulary table still gets a part, with the schema of the table
+            write_parquet_part(convert_batch(pl.DataFrame(schema={column: pl.Utf8 for column in polars_schema})))
+
+        logging.info("Vocabulary '%s' holds %i records", vocabulary_table, number_of_records)
+        return parquet_parts
+
+    @abstractmethod
+    def _get_vocabulary_target(self) -> str:
+        """Gets the dataset or database schema that holds the standardised vocabulary tables
 
-        return df_vocabulary_table
+        Returns:
+            str: The target of the vocabulary import
+        """
+        pass
+
+    @abstractmethod
+    def _get_vocabulary_table_row_count(self, vocabulary_table: str) -> int:
+        """Counts the rows of a specific standardised vocabulary table
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            int: The number of rows of the table
+        """
+        pass
 
     @abstractmethod
     def _clear_vocabulary_upload_table(self, vocabulary_table: str) -> None:
@@ -201,16 +525,22 @@ class ImportVocabularies(EtlBase, ABC):
         pass
 
     @abstractmethod
-    def _load_vocabulary_parquet_in_upload_table(
-        self,
-        vocabulary_table: str,
-        parquet_file: Path,
-    ) -> None:
-        """Loads the CSV file in the specific standardised vocabulary table
+    def _upload_vocabulary_parquet_part(self, vocabulary_table: str, parquet_part: Path) -> None:
+        """Uploads a Parquet part of the specific standardised vocabulary table, while its CSV is still being parsed
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            parquet_file (Path): Path to the CSV file
+            parquet_part (Path): Path to the Parquet part
+        """
+        pass
+
+    @abstractmethod
+    def _load_vocabulary_parquet_in_upload_table(self, vocabulary_table: str, parquet_parts: list[Path]) -> None:
+        """Loads the uploaded Parquet parts in the specific standardised vocabulary table
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            parquet_parts (list[Path]): The uploaded Parquet parts
         """
         pass
 
@@ -222,3 +552,18 @@ class ImportVocabularies(EtlBase, ABC):
             vocabulary_table (str): The standardised vocabulary table
         """
         pass
+
+    @abstractmethod
+    def _apply_vocabulary_changes(
+        self, vocabulary_table: str, key_columns: list[str], upserts_parquet: Path, deletes_parquet: Path
+    ) -> None:
+        """Applies the diff of a new release to a specific standardised vocabulary table:
+        deletes the removed and changed rows and inserts the new and changed rows
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            key_columns (list[str]): The columns that identify a row of the vocabulary table
+            upserts_parquet (Path): Path to the Parquet file with the new and changed rows
+            deletes_parquet (Path): Path to the Parquet file with the key columns of the removed rows
+        """
+        pass
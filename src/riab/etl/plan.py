@@ -0,0 +1,114 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the recorder of the statements that the ETL would run in plan mode"""
+
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock, current_thread, local
+from typing import Iterator, Optional
+
+
+@dataclass
+class PlannedStatement:
+    """A statement that the ETL would run"""
+
+    sequence: int
+    thread: str
+    omop_table: str
+    step: str
+    kind: str
+    statement: str
+    parameters: Optional[dict] = None
+
+
+class PlanRecorder:
+    """
+    Records the statements that the ETL would run, instead of running them (plan mode).
+    The statements are written to a plan file, in the order they were issued, with the dependency level of their table
+    and the thread they were issued from.
+    """
+
+    def __init__(self):
+        """Constructor"""
+        self._statements: list[PlannedStatement] = []
+        self._lock = Lock()
+        self._context = local()
+
+    @contextmanager
+    def step(self, omop_table: str, step: str) -> Iterator[None]:
+        """Assigns the statements that are recorded from the current thread to the step of the OMOP table.
+
+        Args:
+            omop_table (str): The OMOP table
+            step (str): The ETL step
+        """
+        previous_step = getattr(self._context, "step", None)
+        self._context.step = (omop_table, step)
+        try:
+            yield
+        finally:
+            self._context.step = previous_step
+
+    def record(self, statement: str, parameters: Optional[dict] = None, kind: str = "query") -> None:
+        """Records a statement.
+
+        Args:
+            statement (str): The statement (ex. a rendered SQL query or a description of a load job)
+            parameters (Optional[dict]): The query parameters
+            kind (str): The kind of statement (query or load)
+        """
+        omop_table, step = getattr(self._context, "step", None) or ("", "")
+        with self._lock:
+            self._statements.append(
+                PlannedStatement(
+                    len(self._statements) + 1, current_thread().name, omop_table, step, kind, statement, parameters
+                )
+            )
+
+    def write(self, plan_file: Path, dependency_levels: dict[str, int], step_durations: dict[tuple[str, str], float]):
+        """Writes the recorded statements to the plan file, preceded by a summary per OMOP table.
+
+        Args:
+            plan_file (Path): The plan file
+            dependency_levels (dict[str, int]): The dependency level of every OMOP table (the foreign key order)
+            step_durations (dict[tuple[str, str], float]): The duration of every step, in plan mode this is the time spent rendering the statements
+        """  # noqa: E501 # pylint: disable=line-too-long
+        with self._lock:
+            statements = list(self._statements)
+
+        statement_counts: dict[str, int] = defaultdict(int)
+        statement_sizes: dict[str, int] = defaultdict(int)
+        for statement in statements:
+            statement_counts[statement.omop_table] += 1
+            statement_sizes[statement.omop_table] += len(statement.statement)
+        render_durations: dict[str, float] = defaultdict(float)
+        for (omop_table, _), duration in step_durations.items():
+            render_durations[omop_table] += duration
+
+        logging.info(
+            "Writing %i planned statements (%i characters of SQL) to '%s'",
+            len(statements),
+            sum(statement_sizes.values()),
+            plan_file,
+        )
+        with open(plan_file, "w", encoding="UTF8") as file:
+            file.write("-- RiaB ETL plan\n--\n-- level | table | statements | characters | render time (s)\n")
+            for omop_table in sorted(statement_counts, key=lambda table: (dependency_levels.get(table, -1), table)):
+                file.write(
+                    f"-- {dependency_levels.get(omop_table, '')} | {omop_table or '(run)'} | "
+                    f"{statement_counts[omop_table]} | {statement_sizes[omop_table]} | "
+                    f"{render_durations.get(omop_table, 0):.3f}\n"
+                )
+            for statement in statements:
+                file.write(
+                    f"\n-- #{statement.sequence} | level: {dependency_levels.get(statement.omop_table, '')} | "
+                    f"thread: {statement.thread} | table: {statement.omop_table or '(run)'} | "
+                    f"step: {statement.step or '(run)'} | {statement.kind} | {len(statement.statement)} characters\n"
+                )
+                if statement.parameters:
+                    file.write(f"-- parameters: {statement.parameters}\n")
+                file.write(f"{statement.statement.strip().rstrip(';')};\n")
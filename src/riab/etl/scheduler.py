@@ -0,0 +1,315 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the schedulers that distribute the ETL work over the worker threads"""
+
+import logging
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+from queue import PriorityQueue
+from threading import Condition, Lock, Thread, local
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+_context = local()
+
+
+def get_current_priority() -> float:
+    """Get the priority of the work that is running on the current thread.
+
+    Returns:
+        float: The priority (higher goes first)
+    """
+    return getattr(_context, "priority", 0)
+
+
+@contextmanager
+def current_priority(priority: float) -> Iterator[None]:
+    """Sets the priority of the work that runs on the current thread.
+    Database operations started from this thread will use this priority when they have to wait on a free slot.
+
+    Args:
+        priority (float): The priority (higher goes first)
+    """
+    previous_priority = get_current_priority()
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous_priority
+
+
+def longest_remaining_paths(
+    dependencies: dict[str, set[str]], costs: Optional[dict[str, float]] = None
+) -> dict[str, float]:
+    """Calculates for every node the cost of the longest path from that node to the end of the dependency graph.
+    Nodes on the critical path have the highest value, so they can be used as priorities.
+
+    Args:
+        dependencies (dict[str, set[str]]): For every node, the set of nodes it depends on
+        costs (Optional[dict[str, float]]): The cost of every node (defaults to 1 for every node)
+
+    Returns:
+        dict[str, float]: For every node the cost of the longest remaining path (including the node itself)
+    """
+    dependents: dict[str, set[str]] = defaultdict(set)
+    for node, parents in dependencies.items():
+        for parent in parents:
+            dependents[parent].add(node)
+
+    remaining_paths: dict[str, float] = {}
+
+    def remaining_path(node: str, visiting: frozenset[str]) -> float:
+        if node in remaining_paths:
+            return remaining_paths[node]
+        if node in visiting:
+            raise Exception(f"Circular reference in dependency graph at '{node}'")
+        remaining_paths[node] = (costs or {}).get(node, 1) + max(
+            (remaining_path(child, visiting | {node}) for child in dependents[node]), default=0
+        )
+        return remaining_paths[node]
+
+    for node in dependencies:
+        remaining_path(node, frozenset())
+    return remaining_paths
+
+
+class ConcurrencyLimiter:
+    """
+    Limits the number of operations (ex. database queries) that are in flight at the same time.
+    When all slots are taken, the waiting operation with the highest priority gets the next free slot.
+    """
+
+    def __init__(self, max_concurrent: int):
+        """Constructor
+
+        Args:
+            max_concurrent (int): The maximum number of operations in flight
+        """
+        self._max_concurrent = max(1, max_concurrent)
+        self._in_flight = 0
+        self._waiting: list[tuple[float, int]] = []
+        self._counter = count()
+        self._condition = Condition()
+
+    @contextmanager
+    def slot(self, priority: Optional[float] = None) -> Iterator[None]:
+        """Waits for a free slot and holds it for the duration of the with-block.
+
+        Args:
+            priority (Optional[float]): The priority (higher goes first), defaults to the priority of the current thread
+        """
+        ticket = (-(get_current_priority() if priority is None else priority), next(self._counter))
+        with self._condition:
+            heappush(self._waiting, ticket)
+            while self._in_flight >= self._max_concurrent or self._waiting[0] != ticket:
+                self._condition.wait()
+            heappop(self._waiting)
+            self._in_flight += 1
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+
+@dataclass(order=True)
+class _WorkItem:
+    sort_key: tuple[float, int]
+    priority: float = field(compare=False)
+    future: Future = field(compare=False)
+    fn: Optional[Callable[..., Any]] = field(compare=False)
+    args: tuple = field(compare=False, default=())
+    kwargs: dict = field(compare=False, default_factory=dict)
+    lane: Optional[str] = field(compare=False, default=None)
+
+
+class WorkScheduler:
+    """
+    Shared pool of worker threads for the whole ETL run.
+    Work with the highest priority is started first. Work can be assigned to a lane, that has its own concurrency limit.
+    The work that runs on the pool can't wait on other work of the pool (wait_all raises), because with all the worker
+    threads waiting, the work they wait on never starts. Only threads outside the pool wait (ex. the main thread and
+    the threads of the DagScheduler), so a pipelined table can wait on its upload queries, while they run on the pool.
+    """
+
+    def __init__(self, max_workers: int, lane_limits: Optional[dict[str, int]] = None):
+        """Constructor
+
+        Args:
+            max_workers (int): The number of worker threads
+            lane_limits (Optional[dict[str, int]]): For every lane, the maximum number of running work items
+        """
+        self._queue: PriorityQueue[_WorkItem] = PriorityQueue()
+        self._counter = count()
+        self._lane_limits = lane_limits or {}
+        self._lane_running: dict[str, int] = defaultdict(int)
+        self._lane_parked: dict[str, deque[_WorkItem]] = defaultdict(deque)
+        self._lock_lanes = Lock()
+        self._threads = [
+            Thread(target=self._work, name=f"riab_worker_{idx}", daemon=True) for idx in range(max(1, max_workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self.shutdown()
+
+    def submit(
+        self, fn: Callable[..., Any], *args, priority: Optional[float] = None, lane: Optional[str] = None, **kwargs
+    ) -> Future:
+        """Schedules the work on the pool.
+
+        Args:
+            fn (Callable[..., Any]): The work
+            priority (Optional[float]): The priority (higher goes first), defaults to the priority of the current thread
+            lane (Optional[str]): The lane of the work
+
+        Returns:
+            Future: The future of the work
+        """
+        priority = get_current_priority() if priority is None else priority
+        work_item = _WorkItem((-priority, next(self._counter)), priority, Future(), fn, args, kwargs, lane)
+        self._queue.put(work_item)
+        return work_item.future
+
+    def run_all(
+        self,
+        fn: Callable[..., Any],
+        args_list: Iterable[tuple],
+        priority: Optional[float] = None,
+        lane: Optional[str] = None,
+    ) -> None:
+        """Runs the work for every tuple of arguments on the pool and waits until all of them are done.
+        If one of them fails, the ones that haven't started yet are cancelled.
+
+        Args:
+            fn (Callable[..., Any]): The work
+            args_list (Iterable[tuple]): The arguments for every call of the work
+            priority (Optional[float]): The priority (higher goes first), defaults to the priority of the current thread
+            lane (Optional[str]): The lane of the work
+        """
+        futures = [self.submit(fn, *args, priority=priority, lane=lane) for args in args_list]
+        self.wait_all(futures)
+
+    def wait_all(self, futures: list[Future]) -> None:
+        """Waits until all the futures are done.
+        If one of them fails, the ones that haven't started yet are cancelled.
+
+        Args:
+            futures (list[Future]): The futures to wait on
+        """
+        if getattr(_context, "work_scheduler", None) is self:
+            raise Exception("Work on the pool can't wait on other work of the pool, it could deadlock the pool")
+        try:
+            for result in as_completed(futures):
+                result.result()
+        except BaseException as ex:
+            for future in futures:
+                future.cancel()
+            raise ex
+
+    def shutdown(self) -> None:
+        """Stops the worker threads, after all scheduled work is done."""
+        for _ in self._threads:
+            self._queue.put(_WorkItem((float("inf"), next(self._counter)), 0, Future(), None))
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self) -> None:
+        _context.work_scheduler = self
+        while True:
+            work_item = self._queue.get()
+            if not work_item.fn:  # shutdown
+                return
+
+            if work_item.lane:
+                with self._lock_lanes:
+                    lane_limit = self._lane_limits.get(work_item.lane, len(self._threads))
+                    if self._lane_running[work_item.lane] >= lane_limit:
+                        self._lane_parked[work_item.lane].append(work_item)
+                        continue
+                    self._lane_running[work_item.lane] += 1
+
+            try:
+                if not work_item.future.set_running_or_notify_cancel():
+                    continue
+                with current_priority(work_item.priority):
+                    try:
+                        result = work_item.fn(*work_item.args, **work_item.kwargs)
+                    except BaseException as ex:
+                        work_item.future.set_exception(ex)
+                    else:
+                        work_item.future.set_result(result)
+            finally:
+                if work_item.lane:
+                    with self._lock_lanes:
+                        self._lane_running[work_item.lane] -= 1
+                        if self._lane_parked[work_item.lane]:
+                            self._queue.put(self._lane_parked[work_item.lane].popleft())
+
+
+class DagScheduler:
+    """
+    Runs a task for every node of a dependency graph.
+    A node is started as soon as all the nodes it depends on are done, so it never waits on unrelated nodes.
+    """
+
+    def __init__(self, max_workers: int):
+        """Constructor
+
+        Args:
+            max_workers (int): The maximum number of nodes that are processed in parallel
+        """
+        self._max_workers = max_workers
+
+    def run(
+        self,
+        dependencies: dict[str, set[str]],
+        task: Callable[[str], None],
+        priorities: Optional[dict[str, float]] = None,
+    ) -> None:
+        """Runs the task for every node in the dependency graph.
+
+        Args:
+            dependencies (dict[str, set[str]]): For every node, the set of nodes it depends on
+            task (Callable[[str], None]): The task to run, it receives the node as argument
+            priorities (Optional[dict[str, float]]): The priority of every node (ready nodes with the highest go first)
+        """
+        priorities = priorities or {}
+        # only keep the dependencies on nodes that are part of the graph
+        waiting_on = {node: set(parents) & dependencies.keys() for node, parents in dependencies.items()}
+
+        def run_task(node: str):
+            with current_priority(priorities.get(node, 0)):
+                task(node)
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            running: dict[Future, str] = {}
+            while waiting_on or running:
+                ready = sorted(
+                    (node for node, parents in waiting_on.items() if not parents),
+                    key=lambda node: (-priorities.get(node, 0), node),
+                )
+                if not ready and not running:
+                    raise Exception(f"Circular reference in dependency graph: {', '.join(sorted(waiting_on))}")
+
+                for node in ready:
+                    logging.debug("Starting '%s', all its dependencies are done", node)
+                    del waiting_on[node]
+                    running[executor.submit(run_task, node)] = node
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    future.result()
+                    for parents in waiting_on.values():
+                        parents.discard(node)
@@ -127,6 +127,20 @@ class SqlServerCleanup(Cleanup, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
+    def _remove_table_fingerprints(self, omop_tables: list[str]) -> None:
+        """Remove the fingerprints of specific OMOP tables and of their Usagi and custom concept uploads from the TABLE_FINGERPRINT work table.
+
+        Args:
+            omop_tables (list[str]): The omop tables
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("cleanup/TABLE_FINGERPRINT_remove_by_omop_table.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            omop_tables=omop_tables,
+        )
+        self._db.run_query(sql)
+
     def _remove_source_to_concept_map_using_usagi_table(self, omop_table: str, concept_id_column: str) -> None:
         """Remove the concepts of a specific concept column of a specific OMOP table from the OMOP source_to_concept_map table
 
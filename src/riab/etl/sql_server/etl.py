@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: gpl3+
 
 import logging
-from datetime import date
+from datetime import date, datetime, timezone
 from pathlib import Path
 from threading import Lock
 from typing import Any, Optional
@@ -190,39 +190,51 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
                     f"Duplicate custom concepts supplied in the custom concept CSV's for column '{concept_id_column}' of table '{omop_table}'\n{df}\n\n{sql}"
                 )
 
-    def _give_custom_concepts_an_unique_id_above_2bilj(self, omop_table: str, concept_id_column: str) -> None:
-        """Give the custom concepts an unique id (above 2.000.000.000) and store those id's
-        in the concept id swap table.
+    def _load_custom_concept_codes_parquet_in_staging_table(self, parquet_file: Path) -> None:
+        """The custom concept codes of the run are saved in a parquet file.
+        This method replaces the content of the concept id swap staging table with the parquet file.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
+            parquet_file (Path): The path to the parquet file
         """
-        template = self._template_env.get_template("etl/CONCEPT_ID_swap_merge.sql.jinja")
+        template = self._template_env.get_template("etl/CONCEPT_ID_swap_staging_create.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(sql)
+        self._upload_parquet(
+            self._work_database_catalog,
+            self._work_database_schema,
+            "concept_id_swap_staging",
+            parquet_file,
+        )
+
+    def _give_the_staged_custom_concepts_an_unique_id(self) -> None:
+        """Gives the staged custom concepts that aren't in the concept id swap table yet an unique id (above 2.000.000.000), in one statement on the database.
+        The new id's follow the highest id in the concept id swap table.
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/CONCEPT_ID_swap_insert.sql.jinja")
         sql = template.render(
             work_database_catalog=self._work_database_catalog,
             work_database_schema=self._work_database_schema,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
             min_custom_concept_id=Etl._CUSTOM_CONCEPT_IDS_START,
         )
         self._db.run_query(sql)
 
-    def _merge_custom_concepts_with_the_omop_concepts(self, omop_table: str, concept_id_column: str) -> None:
-        """Merges the uploaded custom concepts in the OMOP concept table.
+    def _merge_custom_concepts_with_the_omop_concepts(self, custom_concept_columns: list[tuple[str, str]]) -> None:
+        """Merges the uploaded custom concepts of the concept id columns in the OMOP concept table, in one statement.
 
         Args:
-            omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-        """
+            custom_concept_columns (list[tuple[str, str]]): The omop tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
         template = self._template_env.get_template("etl/CONCEPT_merge.sql.jinja")
         sql = template.render(
             omop_database_catalog=self._omop_database_catalog,
             omop_database_schema=self._omop_database_schema,
             work_database_catalog=self._work_database_catalog,
             work_database_schema=self._work_database_schema,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
+            custom_concept_columns=custom_concept_columns,
         )
         self._db.run_query(sql)
 
@@ -273,6 +285,46 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
             Path(parquet_file),
         )
 
+    def _load_combined_mapping_parquet(self, mapping_table: str, parquet_file: Path) -> None:
+        """Replaces the content of a combined mapping table (usagi_mappings or custom_concept_mappings) with the parquet file.
+
+        Args:
+            mapping_table (str): The combined mapping table
+            parquet_file (Path): The path to the parquet file
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template(f"etl/{mapping_table.upper()}_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(ddl)
+        self._upload_parquet(
+            self._work_database_catalog,
+            self._work_database_schema,
+            mapping_table,
+            parquet_file,
+        )
+
+    def _create_mapping_views(
+        self, usagi_columns: list[tuple[str, str]], custom_concept_columns: list[tuple[str, str]]
+    ) -> None:
+        """Creates the Usagi and custom concept upload tables of the concept id columns as views on the combined mapping tables.
+        The Usagi views swap the custom concept codes with their generated concept ids (above 2.000.000.000).
+
+        Args:
+            usagi_columns (list[tuple[str, str]]): The OMOP tables and concept id columns of the Usagi views
+            custom_concept_columns (list[tuple[str, str]]): The OMOP tables and concept id columns with custom concepts
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/MAPPING_VIEWS_create.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            usagi_columns=usagi_columns,
+            custom_concept_columns=custom_concept_columns,
+            process_semi_approved_mappings=self._process_semi_approved_mappings,
+        )
+        self._db.run_query(sql)
+
     def _update_custom_concepts_in_usagi(self, omop_table: str, concept_id_column: str) -> None:
         """This method updates the Usagi upload table with with the generated custom concept ids (above 2.000.000.000).
         The concept_id column in the Usagi upload table is swapped by the generated custom concept_id (above 2.000.000.000).
@@ -293,15 +345,30 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
-    def _store_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
-        """Fill up the SOURCE_TO_CONCEPT_MAP table with all approved mappings from the uploaded Usagi CSV's
+    def _create_source_to_concept_map_staging_table(self, replace: bool) -> None:
+        """Creates the SOURCE_TO_CONCEPT_MAP staging table (holds the approved mappings of the Usagi CSV's of all the concept id columns)
+
+        Args:
+            replace (bool): Replace the staging table, to remove the mappings of a previous run
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_STAGING_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            replace=replace,
+        )
+        self._db.run_query(ddl)
+
+    def _stage_usagi_source_value_to_concept_id_mapping(self, omop_table: str, concept_id_column: str) -> None:
+        """Appends all approved mappings from the uploaded Usagi CSV's to the SOURCE_TO_CONCEPT_MAP staging table.
+        The concept id columns append to the staging table in parallel, they are merged in one go at the end of the run.
 
         Args:
             omop_table (str): The omop table
             concept_id_column (str): The conept id column
         """
-        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_check_for_duplicates.sql.jinja")
-        sql_doubles = template.render(
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_STAGING_insert.sql.jinja")
+        sql = template.render(
             work_database_catalog=self._work_database_catalog,
             work_database_schema=self._work_database_schema,
             omop_table=omop_table,
@@ -309,24 +376,31 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
             omop_database_catalog=self._omop_database_catalog,
             omop_database_schema=self._omop_database_schema,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
+            resume=bool(self._resume_run_id),
+        )
+        self._db.run_query(sql)
+
+    def _merge_staged_source_value_to_concept_id_mappings(self) -> None:
+        """Fill up the SOURCE_TO_CONCEPT_MAP table with all the staged mappings, with one duplicate check and one merge."""
+        template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_check_for_duplicates.sql.jinja")
+        sql_doubles = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
         )
         rows = self._db.run_query(sql_doubles)
         if rows:
             df = from_dicts(rows)
             with pl_Config(fmt_str_lengths=1000):
                 raise Exception(
-                    f"Duplicate rows supplied (combination of source_code column and target_concept_id columns must be unique)!\nCheck for duplicate mappings in the Usagi CSV's and custom concept CSV's for column '{concept_id_column}' of table '{omop_table}'\n{df}"
+                    f"Duplicate rows supplied (combination of source_code column and target_concept_id columns must be unique)!\nCheck for duplicate mappings in the Usagi CSV's and custom concept CSV's of these concept columns\n{df}"
                 )
 
         template = self._template_env.get_template("etl/SOURCE_TO_CONCEPT_MAP_merge.sql.jinja")
         sql = template.render(
             work_database_catalog=self._work_database_catalog,
             work_database_schema=self._work_database_schema,
-            omop_table=omop_table,
-            concept_id_column=concept_id_column,
             omop_database_catalog=self._omop_database_catalog,
             omop_database_schema=self._omop_database_schema,
-            process_semi_approved_mappings=self._process_semi_approved_mappings,
         )
         self._db.run_query(sql)
 
@@ -348,12 +422,16 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
-    def _get_query_from_sql_file(self, sql_file: Path, omop_table: str) -> str:
+    def _get_query_from_sql_file(
+        self, sql_file: Path, omop_table: str, shard_index: Optional[int] = None, all_rows: bool = False
+    ) -> str:
         """Reads the query from file. If it is a Jinja template, it renders the template.
 
         Args:
             sql_file (Path): Path to the sql or jinja file
             omop_table (str): _description_
+            shard_index (Optional[int]): The shard of the query, for the Jinja shard() function
+            all_rows (bool): Render the template without the watermark, so the query returns all the rows
 
         Returns:
             str: The query (if it is a Jinja template, the rendered query)
@@ -370,9 +448,25 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
                     omop_database_catalog=self._omop_database_catalog,
                     omop_database_schema=self._omop_database_schema,
                     omop_table=omop_table,
+                    watermark=None if all_rows else self._get_watermark(omop_table),
+                    shard=self._get_shard_function(shard_index),
                 )
         return select_query
 
+    def _get_shard_predicate(self, column: str, shards: int, shard_index: int) -> str:
+        """Get the predicate that only selects the rows of the shard, based on a hash of the column.
+        Rows with a NULL value in the column belong to the first shard.
+
+        Args:
+            column (str): The column (or expression) to shard on
+            shards (int): The number of shards
+            shard_index (int): The shard
+
+        Returns:
+            str: The predicate
+        """
+        return f"COALESCE(ABS(CHECKSUM({column}) % {shards}), 0) = {shard_index}"
+
     def _query_into_upload_table(self, upload_table: str, select_query: str, omop_table: str) -> None:
         """This method inserts the results from our custom SQL queries the the work OMOP upload table.
 
@@ -411,6 +505,54 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
+    def _query_into_keys_table(
+        self, keys_table: str, select_query: str, omop_table: str, key_columns: list[str]
+    ) -> None:
+        """Loads the distinct keys of the results of our custom SQL query in a work keys table.
+
+        Args:
+            keys_table (str): The work keys table
+            select_query (str): The query
+            omop_table (str): The omop table
+            key_columns (list[str]): The key columns of the omop table
+        """
+        self._lock_parse_sql.acquire()
+        try:
+            (ctes, remainder) = extract_ctes(select_query)
+        finally:
+            self._lock_parse_sql.release()
+
+        template = self._template_env.get_template("etl/{omop_table}_{sql_file}_keys_insert.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            keys_table=keys_table,
+            ctes=ctes,
+            select_query=remainder,
+            key_columns=key_columns,
+        )
+        self._db.run_query(sql)
+
+    def _get_non_null_counts(self, upload_table: str, columns: list[str]) -> dict[str, int]:
+        """Counts the non-null values of the columns of the upload table.
+
+        Args:
+            upload_table (str): The work upload table
+            columns (list[str]): The columns to count
+
+        Returns:
+            dict[str, int]: The non-null count per column
+        """
+        template = self._template_env.get_template("etl/{omop_table}_{sql_file}_non_null_counts.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            upload_table=upload_table,
+            columns=columns,
+        )
+        rows = self._db.run_query(sql)
+        return dict(rows[0]) if rows else {}
+
     def _create_pk_auto_numbering_swap_table(
         self, primary_key_column: str, concept_id_columns: list[str], events: Any
     ) -> None:
@@ -437,6 +579,7 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         omop_table: str,
         primary_key_column: str,
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
         sql_files: list[str],
         upload_tables: list[str],
@@ -448,6 +591,7 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
             omop_table (str): The OMOP table
             primary_key_column (str): Primary key column
             concept_id_columns (list[str]): List of concept_id columns
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
             sql_files (list[str]): List of upload SQL files
             upload_tables (list[str]): List of upload tables
@@ -458,6 +602,7 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
             work_database_schema=self._work_database_schema,
             primary_key_column=primary_key_column,
             concept_id_columns=concept_id_columns,
+            mapped_concept_id_columns=mapped_concept_id_columns,
             omop_table=omop_table,
             events=events,
             sql_files=sql_files,
@@ -509,11 +654,14 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         omop_table: str,
         columns: list[str],
         upload_tables: list[str],
+        key_tables: list[str],
         required_columns: list[str],
         primary_key_column: Optional[str],
         pk_auto_numbering: bool,
         foreign_key_columns: Any,
+        null_foreign_key_columns: list[str],
         concept_id_columns: list[str],
+        mapped_concept_id_columns: list[str],
         events: Any,
     ):
         """The one shot merge of the uploaded query result from the omop table, with the swapped primary and foreign keys, the mapped Usagi concept and custom concepts in the destination OMOP table.
@@ -523,11 +671,15 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         Args:
             omop_table (str): OMOP table.
             columns (list[str]): List of columns of the OMOP table.
+            upload_tables (list[str]): List of the upload tables.
+            key_tables (list[str]): The work tables holding all the keys of the source, an incremental merge removes the rows of the other keys (empty to keep them).
             required_columns (list[str]): List of required columns of the OMOP table.
             primary_key_column (str): The name of the primary key column.
             pk_auto_numbering (bool): Is the primary key a generated incremental number?
             foreign_key_columns (Any): List of foreign key columns.
+            null_foreign_key_columns (list[str]): The foreign key columns that are null in all the upload tables, those aren't swapped.
             concept_id_columns (list[str]): List of concept columns.
+            mapped_concept_id_columns (list[str]): List of the concept columns with Usagi mappings
             events (Any): Object that holds the events of the the OMOP table.
         """  # noqa: E501 # pylint: disable=line-too-long
         if not events:
@@ -544,12 +696,17 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
             required_columns=required_columns,
             primary_key_column=primary_key_column,
             foreign_key_columns=foreign_key_columns,
+            null_foreign_key_columns=null_foreign_key_columns,
             concept_id_columns=concept_id_columns,
+            mapped_concept_id_columns=mapped_concept_id_columns,
             pk_auto_numbering=pk_auto_numbering,
             events=events,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
             upload_tables=upload_tables,
             min_custom_concept_id=Etl._CUSTOM_CONCEPT_IDS_START,
+            incremental=self._get_watermark(omop_table) is not None,
+            key_tables=key_tables,
+            key_columns=self._get_incremental_merge_key_columns(omop_table) if key_tables else [],
         )
         self._db.run_query(sql)
 
@@ -642,51 +799,43 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
-    def _check_usagi(self, omop_table: str, concept_id_column: str, domains: list[str] | None) -> None:
-        """Checks the usagi fk domain of the concept id column.
+    def _check_usagi(self, omop_table: str, concept_id_columns: list[str], domains: dict[str, list[str]]) -> None:
+        """Checks the Usagi mappings of all the concept id columns of the table in one query.
+        Non-standard concepts are logged as warning, concepts of a domain that isn't allowed raise an exception.
 
         Args:
             omop_table (str): The omop table
-            concept_id_column (str): The conept id column
-            domains (list[str]): The allowed domains
+            concept_id_columns (list[str]): The concept id columns
+            domains (dict[str, list[str]]): The allowed domains per concept id column
         """
-        template = self._template_env.get_template("etl/{omop_table}__{concept_id_column}_usagi_non_standard.sql.jinja")
+        template = self._template_env.get_template("etl/{omop_table}_usagi_check.sql.jinja")
         sql = template.render(
             work_database_catalog=self._work_database_catalog,
             work_database_schema=self._work_database_schema,
             omop_database_catalog=self._omop_database_catalog,
             omop_database_schema=self._omop_database_schema,
             omop_table=omop_table,
-            concept_id_column=concept_id_column,
+            concept_id_columns=concept_id_columns,
+            domains=domains,
             process_semi_approved_mappings=self._process_semi_approved_mappings,
         )
         rows = self._db.run_query(sql)
-        if rows:
-            df = from_dicts(rows)
-            logging.warn(
-                f"Non-standard concepts found in the Usagi CSV's for concept column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly standard concepts are allowed!\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df}"
-            )
+        if not rows:
+            return
+        df = from_dicts(rows)
 
-        if domains:
-            template = self._template_env.get_template(
-                "etl/{omop_table}__{concept_id_column}_usagi_fk_domain_check.sql.jinja"
+        df_non_standard = df.filter(col("non_standard") == 1)
+        if len(df_non_standard):
+            logging.warning(
+                f"Non-standard concepts found in the Usagi CSV's of OMOP table '{omop_table}'!\nOnly standard concepts are allowed!\nQuery to get the non-standard concepts:\n{sql}\nNon-standard concepts:\n{df_non_standard}"
             )
-            sql = template.render(
-                work_database_catalog=self._work_database_catalog,
-                work_database_schema=self._work_database_schema,
-                omop_database_catalog=self._omop_database_catalog,
-                omop_database_schema=self._omop_database_schema,
-                omop_table=omop_table,
-                concept_id_column=concept_id_column,
-                domains=domains,
-                process_semi_approved_mappings=self._process_semi_approved_mappings,
+
+        df_invalid_domains = df.filter(col("invalid_domain") == 1)
+        if len(df_invalid_domains):
+            allowed_domains = "\n".join(f"{column}: {', '.join(domains[column])}" for column in domains)
+            raise Exception(
+                f"Invalid concept domains found in the Usagi CSV's of OMOP table '{omop_table}'!\nOnly these concept domains are allowed:\n{allowed_domains}\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df_invalid_domains}"
             )
-            rows = self._db.run_query(sql)
-            if rows:
-                df = from_dicts(rows)
-                raise Exception(
-                    f"Invalid concept domains found in the Usagi CSV's for concept column '{concept_id_column}' of OMOP table '{omop_table}'!\nOnly concept domains ({', '.join(domains)}) are allowed!\nQuery to get the invalid domains:\n{sql}\nInvalid domains:\n{df}"
-                )
 
     def _upload_riab_version_in_metadata_table(self) -> None:
         """Upload the riab version in the metadata table."""
@@ -718,3 +867,177 @@ class SqlServerEtl(Etl, SqlServerEtlBase):
 
         # load the results of the query in the tempopary work table
         self._query_into_upload_table("metadata__upload__git_commit_hash", sql, "metadata")
+
+    def _create_run_history_table(self) -> None:
+        """Creates the run history table (holds the durations of the ETL steps of previous runs)"""
+        template = self._template_env.get_template("etl/RUN_HISTORY_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(ddl)
+
+    def _get_historical_step_durations(self, last_runs: int) -> dict[tuple[str, str], float]:
+        """Gets the average duration (in seconds) of every ETL step of every OMOP table over the last runs.
+
+        Args:
+            last_runs (int): The number of previous runs to take into account
+
+        Returns:
+            dict[tuple[str, str], float]: The average duration per OMOP table and step
+        """
+        template = self._template_env.get_template("etl/RUN_HISTORY_get_step_durations.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            last_runs=last_runs,
+        )
+        rows = self._db.run_query(sql)
+        return {(row["omop_table"], row["step"]): row["duration"] for row in rows or []}
+
+    def _store_step_durations_in_run_history(
+        self, run_id: str, run_start: datetime, step_durations: list[tuple[str, str, float]]
+    ) -> None:
+        """Stores the durations of the ETL steps of this run in the run history table.
+
+        Args:
+            run_id (str): The id of the run
+            run_start (datetime): The start of the run
+            step_durations (list[tuple[str, str, float]]): The OMOP table, step and duration (in seconds) of every step
+        """
+        template = self._template_env.get_template("etl/RUN_HISTORY_insert.sql.jinja")
+        for i in range(0, len(step_durations), 1000):  # SQL Server allows max 1000 rows in a VALUES clause
+            sql = template.render(
+                work_database_catalog=self._work_database_catalog,
+                work_database_schema=self._work_database_schema,
+                step_durations=step_durations[i : i + 1000],
+            )
+            self._db.run_query(sql, {"run_id": run_id, "run_start": self._to_utc_datetime2(run_start)})
+
+    def _create_run_state_table(self) -> None:
+        """Creates the run state table (holds the completed steps of the runs, so that a failed run can be resumed)"""
+        template = self._template_env.get_template("etl/RUN_STATE_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(ddl)
+
+    def _get_completed_steps(self, run_id: str) -> dict[tuple[str, str, str], str]:
+        """Gets the completed steps of a run.
+
+        Args:
+            run_id (str): The id of the run
+
+        Returns:
+            dict[tuple[str, str, str], str]: The input hash per OMOP table, step and item
+        """
+        template = self._template_env.get_template("etl/RUN_STATE_get_completed_steps.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        rows = self._db.run_query(sql, {"run_id": run_id})
+        return {(row["omop_table"], row["step"], row["item"]): row["input_hash"] for row in rows or []}
+
+    def _store_completed_steps(self, run_id: str, completed_steps: list[tuple[str, str, str, str]]) -> None:
+        """Stores the completed steps in the run state table.
+
+        Args:
+            run_id (str): The id of the run
+            completed_steps (list[tuple[str, str, str, str]]): The OMOP table, step, item and input hash of every completed step
+        """  # noqa: E501 # pylint: disable=line-too-long
+        template = self._template_env.get_template("etl/RUN_STATE_insert.sql.jinja")
+        for i in range(0, len(completed_steps), 1000):  # SQL Server allows max 1000 rows in a VALUES clause
+            sql = template.render(
+                work_database_catalog=self._work_database_catalog,
+                work_database_schema=self._work_database_schema,
+                completed_steps=completed_steps[i : i + 1000],
+            )
+            self._db.run_query(sql, {"run_id": run_id})
+
+    def _create_table_fingerprint_table(self) -> None:
+        """Creates the table fingerprint table (holds the fingerprint of the inputs of every table at its last ETL)"""
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(ddl)
+
+    def _get_table_fingerprints(self) -> dict[str, str]:
+        """Gets the fingerprints of the tables at their last ETL.
+
+        Returns:
+            dict[str, str]: The fingerprint per OMOP table
+        """
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_get.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        rows = self._db.run_query(sql)
+        return {row["omop_table"]: row["fingerprint"] for row in rows or []}
+
+    def _store_table_fingerprints(self, table_fingerprints: dict[str, str]) -> None:
+        """Stores the fingerprints of the processed tables.
+
+        Args:
+            table_fingerprints (dict[str, str]): The fingerprint per OMOP table
+        """
+        template = self._template_env.get_template("etl/TABLE_FINGERPRINT_merge.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            table_fingerprints=table_fingerprints,
+        )
+        self._db.run_query(sql)
+
+    def _create_table_watermark_table(self) -> None:
+        """Creates the table watermark table (holds for every table the start of the run that last merged it)"""
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_create.sql.jinja")
+        ddl = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        self._db.run_query(ddl)
+
+    def _get_table_watermarks(self) -> dict[str, datetime]:
+        """Gets the watermarks of the tables.
+
+        Returns:
+            dict[str, datetime]: The start of the run that last merged the OMOP table (in UTC, without time zone)
+        """
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_get.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+        )
+        rows = self._db.run_query(sql)
+        return {row["omop_table"]: row["watermark"] for row in rows or []}
+
+    def _store_table_watermarks(self, omop_tables: list[str], watermark: datetime) -> None:
+        """Stores the watermark of the merged tables.
+
+        Args:
+            omop_tables (list[str]): The merged OMOP tables
+            watermark (datetime): The start of the run
+        """
+        template = self._template_env.get_template("etl/TABLE_WATERMARK_merge.sql.jinja")
+        sql = template.render(
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            omop_tables=omop_tables,
+        )
+        self._db.run_query(sql, {"watermark": self._to_utc_datetime2(watermark)})
+
+    def _to_utc_datetime2(self, timestamp: datetime) -> datetime:
+        """Converts a timestamp to UTC without time zone, the datetime2 columns of the work tables hold UTC.
+
+        Args:
+            timestamp (datetime): The timestamp (with time zone)
+
+        Returns:
+            datetime: The timestamp in UTC, without time zone
+        """
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
@@ -14,7 +14,7 @@ from typing import Optional, cast
 import polars as pl
 from sqlalchemy import engine
 
-from ..db import Db
+from ..db import Db, PlanDb
 from ..etl_base import EtlBase
 
 
@@ -37,6 +37,7 @@ class SqlServerEtlBase(EtlBase, ABC):
         achilles_database_schema: str,
         disable_fk_constraints: bool = True,
         bcp_code_page: str = "ACP",
+        max_connections: int = 15,
         **kwargs,
     ):
         """This class holds the SQL Server specific methods of the ETL process
@@ -83,10 +84,21 @@ class SqlServerEtlBase(EtlBase, ABC):
                 database=self._work_database_catalog,  # required for Azure SQL
             )
 
-        self._db = Db(url)
+        max_connections = min(max_connections, self._max_concurrent_db_operations)
+        if self._plan_recorder:
+            self._db: Db = PlanDb(self._plan_recorder, max_connections=max_connections)
+        else:
+            self._db = Db(url, max_connections=max_connections, tracer=self._tracer)
 
     def _upload_dataframe(self, catalog: str, schema: str, table: str, df: pl.DataFrame) -> None:
-        with TemporaryDirectory(prefix="riab_") as temp_dir_path:
+        if self._plan_recorder:
+            self._plan_recorder.record(f"-- bcp [{catalog}].[{schema}].[{table}] in ({len(df)} rows)", kind="load")
+            return
+        with (
+            self._db.concurrency_limiter.slot(),
+            self._tracer.span("bcp", "load", table=f"{catalog}.{schema}.{table}", rows_affected=len(df)),
+            TemporaryDirectory(prefix="riab_") as temp_dir_path,
+        ):
             upload_file = str(Path(temp_dir_path) / f"{table}.csv")
 
             df.write_csv(
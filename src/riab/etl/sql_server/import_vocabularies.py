@@ -3,6 +3,7 @@
 
 import logging
 from pathlib import Path
+from typing import cast
 
 from ..import_vocabularies import ImportVocabularies
 from .etl_base import SqlServerEtlBase
@@ -29,6 +30,32 @@ class SqlServerImportVocabularies(ImportVocabularies, SqlServerEtlBase):
         if not self._disable_fk_constraints:
             self._add_all_constraints()
 
+    def _get_vocabulary_target(self) -> str:
+        """Gets the database schema that holds the standardised vocabulary tables
+
+        Returns:
+            str: The OMOP database schema (format server.catalog.schema)
+        """
+        return f"{self._server}.{self._omop_database_catalog}.{self._omop_database_schema}"
+
+    def _get_vocabulary_table_row_count(self, vocabulary_table: str) -> int:
+        """Counts the rows of a specific standardised vocabulary table
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            int: The number of rows of the table
+        """
+        template = self._template_env.get_template("vocabulary/vocabulary_table_count.sql.jinja")
+        sql = template.render(
+            omop_database_catalog=self._omop_database_catalog,
+            omop_database_schema=self._omop_database_schema,
+            vocabulary_table=vocabulary_table,
+        )
+        rows = self._db.run_query(sql)
+        return cast(list[dict], rows)[0]["row_count"]
+
     def _clear_vocabulary_upload_table(self, vocabulary_table: str) -> None:
         """Removes a specific standardised vocabulary table
 
@@ -44,14 +71,23 @@ class SqlServerImportVocabularies(ImportVocabularies, SqlServerEtlBase):
         )
         self._db.run_query(sql)
 
-    def _load_vocabulary_parquet_in_upload_table(self, vocabulary_table: str, parquet_file: Path) -> None:
-        """Loads the CSV file in the specific standardised vocabulary table
+    def _upload_vocabulary_parquet_part(self, vocabulary_table: str, parquet_part: Path) -> None:
+        """Appends a Parquet part of the specific standardised vocabulary table to the table
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            parquet_part (Path): Path to the Parquet part
+        """
+        self._upload_parquet(self._omop_database_catalog, self._omop_database_schema, vocabulary_table, parquet_part)
+
+    def _load_vocabulary_parquet_in_upload_table(self, vocabulary_table: str, parquet_parts: list[Path]) -> None:
+        """Loads the uploaded Parquet parts in the specific standardised vocabulary table
 
         Args:
             vocabulary_table (str): The standardised vocabulary table
-            parquet_file (Path): Path to the CSV file
+            parquet_parts (list[Path]): The uploaded Parquet parts
         """
-        self._upload_parquet(self._omop_database_catalog, self._omop_database_schema, vocabulary_table, parquet_file)
+        pass  # the Parquet parts were already appended to the table
 
     def _refill_vocabulary_table(self, vocabulary_table: str) -> None:
         """Recreates a specific standardised vocabulary table from the upload table
@@ -60,3 +96,42 @@ class SqlServerImportVocabularies(ImportVocabularies, SqlServerEtlBase):
             vocabulary_table (str): The standardised vocabulary table
         """
         pass
+
+    def _apply_vocabulary_changes(
+        self, vocabulary_table: str, key_columns: list[str], upserts_parquet: Path, deletes_parquet: Path
+    ) -> None:
+        """Uploads the new and changed rows and the keys of the removed rows to work tables and applies them to
+        the specific standardised vocabulary table, in one transaction
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            key_columns (list[str]): The columns that identify a row of the vocabulary table
+            upserts_parquet (Path): Path to the Parquet file with the new and changed rows
+            deletes_parquet (Path): Path to the Parquet file with the key columns of the removed rows
+        """
+        template = self._template_env.get_template("vocabulary/vocabulary_table_changes_create.sql.jinja")
+        ddl = template.render(
+            omop_database_catalog=self._omop_database_catalog,
+            omop_database_schema=self._omop_database_schema,
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            vocabulary_table=vocabulary_table,
+            key_columns=key_columns,
+        )
+        self._db.run_query(ddl)
+        self._upload_parquet(self._work_database_catalog, self._work_database_schema, vocabulary_table, upserts_parquet)
+        self._upload_parquet(
+            self._work_database_catalog, self._work_database_schema, f"{vocabulary_table}__deletes", deletes_parquet
+        )
+
+        logging.info("Apply the changes to vocabulary table '%s'", vocabulary_table)
+        template = self._template_env.get_template("vocabulary/vocabulary_table_apply_changes.sql.jinja")
+        sql = template.render(
+            omop_database_catalog=self._omop_database_catalog,
+            omop_database_schema=self._omop_database_schema,
+            work_database_catalog=self._work_database_catalog,
+            work_database_schema=self._work_database_schema,
+            vocabulary_table=vocabulary_table,
+            key_columns=key_columns,
+        )
+        self._db.run_query(sql)
@@ -0,0 +1,95 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the tracer that records the ETL steps as spans in a Chrome trace"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, current_thread
+from typing import Any, Iterator, cast
+
+
+def sql_fingerprint(sql: str) -> str:
+    """Fingerprint of a SQL statement, to recognize the same statement over spans and runs.
+
+    Args:
+        sql (str): The SQL statement
+
+    Returns:
+        str: The fingerprint
+    """
+    return hashlib.sha1(" ".join(sql.split()).encode("UTF8")).hexdigest()[:16]
+
+
+class Tracer:
+    """
+    Records the ETL steps and database operations as spans (start, duration, thread and arguments).
+    The spans are written in the Chrome trace event format, viewable in chrome://tracing or https://ui.perfetto.dev.
+    A disabled tracer records nothing.
+    """
+
+    def __init__(self, enabled: bool = False):
+        """Constructor
+
+        Args:
+            enabled (bool): Record the spans
+        """
+        self._enabled = enabled
+        self._start = time.perf_counter()
+        self._events: list[dict[str, Any]] = []
+        self._thread_names: dict[int, str] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[dict[str, Any]]:
+        """Records the with-block as a span.
+        The arguments are yielded, so results that are only known at the end (ex. rows affected) can be added.
+
+        Args:
+            name (str): The name of the span
+            category (str): The category of the span (ex. step or query)
+        """
+        if not self._enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            thread = current_thread()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._start) * 1_000_000,
+                "dur": (end - start) * 1_000_000,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": {key: value for key, value in args.items() if value is not None},
+            }
+            with self._lock:
+                self._thread_names[cast(int, thread.ident)] = thread.name
+                self._events.append(event)
+
+    def write(self, trace_file: Path) -> None:
+        """Writes the recorded spans to the trace file.
+
+        Args:
+            trace_file (Path): The trace file (JSON)
+        """
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        thread_name_events = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ]
+        logging.info("Writing %i spans to trace file '%s'", len(events), trace_file)
+        with open(trace_file, "w", encoding="UTF8") as file:
+            json.dump({"traceEvents": thread_name_events + events, "displayTimeUnit": "ms"}, file, default=str)
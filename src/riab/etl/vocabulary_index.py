@@ -0,0 +1,139 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the local index of the standardised vocabularies"""
+
+import logging
+from pathlib import Path
+
+import polars as pl
+
+
+class VocabularyIndex:
+    """
+    Local index of the standardised vocabularies, a folder with slim Parquet files that is written when the vocabularies are imported.
+    The ETL uses it to validate the custom concept and Usagi CSV's in Polars, before they are uploaded to the database.
+    The Parquet files are memory mapped and the lookups (by concept_id or by vocabulary_id and concept_code) are hash joins.
+    """  # noqa: E501 # pylint: disable=line-too-long
+
+    _COLUMNS = {
+        "concept": [
+            "concept_id",
+            "concept_code",
+            "vocabulary_id",
+            "domain_id",
+            "concept_class_id",
+            "standard_concept",
+        ],
+        "concept_class": ["concept_class_id"],
+        "domain": ["domain_id"],
+        "vocabulary": ["vocabulary_id"],
+    }
+
+    def __init__(self, index_path: Path):
+        """Constructor
+
+        Args:
+            index_path (Path): The folder that holds the Parquet files of the index
+        """
+        self._index_path = index_path
+
+    @property
+    def index_path(self) -> Path:
+        """The folder that holds the Parquet files of the index"""
+        return self._index_path
+
+    def exists(self) -> bool:
+        """Checks that the Parquet files of all the indexed vocabulary tables exist.
+
+        Returns:
+            bool: True if the index can be used
+        """
+        return all(self._get_parquet_file(vocabulary_table).exists() for vocabulary_table in self._COLUMNS)
+
+    def is_indexed(self, vocabulary_table: str) -> bool:
+        """Checks that the standardised vocabulary table is part of the index.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            bool: True if the table is written to the index
+        """
+        return vocabulary_table in self._COLUMNS
+
+    def write(self, vocabulary_table: str, lf_vocabulary_table: pl.LazyFrame) -> None:
+        """Writes the indexed columns of a standardised vocabulary table to the index.
+        Tables that aren't part of the index are ignored.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            lf_vocabulary_table (pl.LazyFrame): The (streamed) content of the standardised vocabulary table
+        """
+        if not self.is_indexed(vocabulary_table):
+            return
+        logging.debug("Writing '%s' to vocabulary index '%s'", vocabulary_table, self._index_path)
+        self._index_path.mkdir(parents=True, exist_ok=True)
+        parquet_file = self._get_parquet_file(vocabulary_table)
+        # write to a temporary file first, so an interrupted import never leaves a half written index behind
+        temp_parquet_file = parquet_file.with_suffix(".parquet.tmp")
+        lf_vocabulary_table.select(self._COLUMNS[vocabulary_table]).sink_parquet(temp_parquet_file)
+        temp_parquet_file.replace(parquet_file)
+
+    def scan(self, vocabulary_table: str) -> pl.LazyFrame:
+        """Lazily scans the indexed columns of a standardised vocabulary table.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            pl.LazyFrame: Lazy frame with the indexed columns
+        """
+        return pl.scan_parquet(self._get_parquet_file(vocabulary_table))
+
+    def lookup_concept_ids(self, lf: pl.LazyFrame, concept_id_column: str) -> pl.LazyFrame:
+        """Adds the indexed concept columns to the rows, by concept_id.
+        The concept columns are null for the rows with an unknown concept_id.
+
+        Args:
+            lf (pl.LazyFrame): The rows
+            concept_id_column (str): The column of the rows that holds the concept_id
+
+        Returns:
+            pl.LazyFrame: The rows with the concept columns
+        """
+        return lf.join(
+            self.scan("concept").select(
+                pl.col("concept_id").alias(concept_id_column),
+                pl.col("vocabulary_id").alias("concept_vocabulary_id"),
+                pl.col("domain_id").alias("concept_domain_id"),
+                pl.col("standard_concept").alias("concept_standard_concept"),
+            ),
+            on=concept_id_column,
+            how="left",
+        )
+
+    def lookup_concept_codes(
+        self, lf: pl.LazyFrame, vocabulary_id_column: str, concept_code_column: str
+    ) -> pl.LazyFrame:
+        """Keeps only the rows whose vocabulary_id and concept_code belong to a concept of the index.
+
+        Args:
+            lf (pl.LazyFrame): The rows
+            vocabulary_id_column (str): The column of the rows that holds the vocabulary_id
+            concept_code_column (str): The column of the rows that holds the concept_code
+
+        Returns:
+            pl.LazyFrame: The rows with a known vocabulary_id and concept_code
+        """
+        return lf.join(
+            self.scan("concept").select(
+                pl.col("vocabulary_id").alias(vocabulary_id_column),
+                pl.col("concept_code").alias(concept_code_column),
+            ),
+            on=[vocabulary_id_column, concept_code_column],
+            how="semi",
+        )
+
+    def _get_parquet_file(self, vocabulary_table: str) -> Path:
+        return self._index_path / f"{vocabulary_table}.parquet"
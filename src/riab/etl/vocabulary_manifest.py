@@ -0,0 +1,158 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the local manifest of the loaded standardised vocabularies"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Optional
+
+import polars as pl
+import pyarrow.parquet as pq
+
+
+class VocabularyManifest:
+    """
+    Local manifest of the loaded standardised vocabularies, a folder with a Parquet file per vocabulary table that holds the key columns and a hash of every row.
+    Every target (the dataset or database schema that holds the vocabularies) has its own subfolder, so the manifest of one target is never diffed against another target.
+    It is written when the vocabularies are imported, so an incremental import can diff a new release against the loaded release without reading the tables from the database.
+    The row hashes are only stable within a Polars version, the version is kept next to every Parquet file, with the row count of the loaded table.
+    """  # noqa: E501 # pylint: disable=line-too-long
+
+    _ROW_HASH_COLUMN = "__row_hash"
+
+    _KEY_COLUMNS = {
+        "concept": ["concept_id"],
+        "concept_ancestor": ["ancestor_concept_id", "descendant_concept_id"],
+        "concept_class": ["concept_class_id"],
+        "concept_relationship": ["concept_id_1", "concept_id_2", "relationship_id"],
+        "concept_synonym": ["concept_id", "concept_synonym_name", "language_concept_id"],
+        "domain": ["domain_id"],
+        "drug_strength": ["drug_concept_id", "ingredient_concept_id"],
+        "relationship": ["relationship_id"],
+        "vocabulary": ["vocabulary_id"],
+    }
+
+    def __init__(self, manifest_path: Path, target: str):
+        """Constructor
+
+        Args:
+            manifest_path (Path): The folder that holds the manifests of the targets
+            target (str): The dataset or database schema that holds the vocabularies (ex. project.dataset or server.catalog.schema)
+        """  # noqa: E501 # pylint: disable=line-too-long
+        self._manifest_path = manifest_path / re.sub(r"[^\w.-]", "_", target)
+
+    @property
+    def manifest_path(self) -> Path:
+        """The folder that holds the Parquet files of the manifest of the target"""
+        return self._manifest_path
+
+    def get_key_columns(self, vocabulary_table: str) -> list[str]:
+        """Gets the columns that identify a row of the standardised vocabulary table.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            list[str]: The key columns
+        """
+        return self._KEY_COLUMNS[vocabulary_table]
+
+    def exists(self, vocabulary_table: str) -> bool:
+        """Checks that the manifest of the standardised vocabulary table exists and was hashed with this Polars version.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            bool: True if the manifest can be diffed against a new release
+        """
+        parquet_file = self._get_parquet_file(vocabulary_table)
+        version_file = self._get_version_file(vocabulary_table)
+        if not parquet_file.exists() or not version_file.exists():
+            return False
+        version = json.loads(version_file.read_text(encoding="UTF8"))
+        if version.get("polars_version") != pl.__version__:
+            logging.warning(
+                "The manifest of vocabulary table '%s' was hashed with Polars %s, not with Polars %s",
+                vocabulary_table,
+                version.get("polars_version"),
+                pl.__version__,
+            )
+            return False
+        return True
+
+    def write(self, vocabulary_table: str, lf_vocabulary_table: pl.LazyFrame) -> None:
+        """Writes the key columns and the row hashes of a loaded standardised vocabulary table to the manifest.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            lf_vocabulary_table (pl.LazyFrame): The (streamed) content of the loaded standardised vocabulary table
+        """
+        logging.debug("Writing '%s' to vocabulary manifest '%s'", vocabulary_table, self._manifest_path)
+        self._manifest_path.mkdir(parents=True, exist_ok=True)
+        parquet_file = self._get_parquet_file(vocabulary_table)
+        version_file = self._get_version_file(vocabulary_table)
+        # remove the version first, so an interrupted write never leaves a manifest that looks valid
+        version_file.unlink(missing_ok=True)
+        temp_parquet_file = parquet_file.with_suffix(".parquet.tmp")
+        self._hash_rows(lf_vocabulary_table).select(
+            [*self._KEY_COLUMNS[vocabulary_table], self._ROW_HASH_COLUMN]
+        ).sink_parquet(temp_parquet_file)
+        temp_parquet_file.replace(parquet_file)
+        version_file.write_text(
+            json.dumps({"polars_version": pl.__version__, "rows": pq.read_metadata(parquet_file).num_rows}),
+            encoding="UTF8",
+        )
+
+    def get_row_count(self, vocabulary_table: str) -> Optional[int]:
+        """Gets the number of rows of the standardised vocabulary table when the manifest was written.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            Optional[int]: The number of rows (None for a manifest written without the row count)
+        """
+        version = json.loads(self._get_version_file(vocabulary_table).read_text(encoding="UTF8"))
+        return version.get("rows")
+
+    def diff(
+        self, vocabulary_table: str, lf_vocabulary_table: pl.LazyFrame, upserts_parquet: Path, deletes_parquet: Path
+    ) -> tuple[int, int]:
+        """Diffs a new release of a standardised vocabulary table against the manifest of the loaded release.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            lf_vocabulary_table (pl.LazyFrame): The (streamed) content of the new release
+            upserts_parquet (Path): The Parquet file that gets the new and changed rows (all columns)
+            deletes_parquet (Path): The Parquet file that gets the key columns of the removed rows
+
+        Returns:
+            tuple[int, int]: The number of new and changed rows and the number of removed rows
+        """
+        key_columns = self._KEY_COLUMNS[vocabulary_table]
+        lf_manifest = pl.scan_parquet(self._get_parquet_file(vocabulary_table))
+
+        # a row is new or changed when its key and hash combination isn't in the manifest
+        self._hash_rows(lf_vocabulary_table).join(
+            lf_manifest, on=[*key_columns, self._ROW_HASH_COLUMN], how="anti"
+        ).drop(self._ROW_HASH_COLUMN).sink_parquet(upserts_parquet)
+        lf_manifest.select(key_columns).join(
+            lf_vocabulary_table.select(key_columns), on=key_columns, how="anti"
+        ).sink_parquet(deletes_parquet)
+
+        return pq.read_metadata(upserts_parquet).num_rows, pq.read_metadata(deletes_parquet).num_rows
+
+    def _hash_rows(self, lf_vocabulary_table: pl.LazyFrame) -> pl.LazyFrame:
+        return lf_vocabulary_table.with_columns(
+            pl.struct(pl.all()).hash(seed=0).alias(self._ROW_HASH_COLUMN)  # seeded, so the hash is reproducible
+        )
+
+    def _get_parquet_file(self, vocabulary_table: str) -> Path:
+        return self._manifest_path / f"{vocabulary_table}.parquet"
+
+    def _get_version_file(self, vocabulary_table: str) -> Path:
+        return self._manifest_path / f"{vocabulary_table}.json"
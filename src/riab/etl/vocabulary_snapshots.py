@@ -0,0 +1,164 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the local store of the vocabulary releases converted to Parquet"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from threading import get_ident
+
+import pyarrow.parquet as pq
+
+
+class VocabularySnapshots:
+    """
+    Local store of the vocabulary releases (zip files downloaded from Athena), converted to Parquet.
+    A snapshot is keyed by the SHA-256 hash of the zip content, so a release that is imported in multiple databases is only converted once.
+    A snapshot is a folder with the Parquet parts of every vocabulary table and a manifest with their row counts and schema.
+    """  # noqa: E501 # pylint: disable=line-too-long
+
+    _MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, snapshots_path: Path):
+        """Constructor
+
+        Args:
+            snapshots_path (Path): The folder that holds the snapshots
+        """
+        self._snapshots_path = snapshots_path
+        try:
+            self._riab_version = metadata.version("Rabbit-in-a-Blender")
+        except metadata.PackageNotFoundError:
+            self._riab_version = "unknown"
+
+    @property
+    def snapshots_path(self) -> Path:
+        """The folder that holds the snapshots"""
+        return self._snapshots_path
+
+    def get_snapshot_id(self, path_to_zip_file: Path) -> str:
+        """Gets the snapshot id of a vocabulary zip file.
+
+        Args:
+            path_to_zip_file (Path): The vocabularies zip file
+
+        Returns:
+            str: The SHA-256 hash of the zip content
+        """
+        sha = hashlib.sha256()
+        with open(path_to_zip_file, "rb") as zip_file:
+            while chunk := zip_file.read(1024 * 1024):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def exists(self, snapshot_id: str) -> bool:
+        """Checks that the snapshot exists and was converted by this RiaB version.
+
+        Args:
+            snapshot_id (str): The snapshot id
+
+        Returns:
+            bool: True if the snapshot can be imported
+        """
+        manifest_file = self._snapshots_path / snapshot_id / self._MANIFEST_FILE
+        if not manifest_file.exists():
+            return False
+        manifest = json.loads(manifest_file.read_text(encoding="UTF8"))
+        if manifest.get("riab_version") != self._riab_version:
+            logging.warning(
+                "Vocabulary snapshot '%s' was converted by RiaB %s, not by RiaB %s",
+                snapshot_id,
+                manifest.get("riab_version"),
+                self._riab_version,
+            )
+            return False
+        return True
+
+    def get_parquet_parts(self, snapshot_id: str, vocabulary_table: str) -> list[Path]:
+        """Gets the Parquet parts of a standardised vocabulary table in the snapshot.
+
+        Args:
+            snapshot_id (str): The snapshot id
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            list[Path]: The Parquet parts
+        """
+        manifest_table = self._get_manifest_table(snapshot_id, vocabulary_table)
+        return [self._snapshots_path / snapshot_id / parquet_part for parquet_part in manifest_table["parts"]]
+
+    def get_number_of_records(self, snapshot_id: str, vocabulary_table: str) -> int:
+        """Gets the number of records of a standardised vocabulary table in the snapshot.
+
+        Args:
+            snapshot_id (str): The snapshot id
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            int: The number of records
+        """
+        return self._get_manifest_table(snapshot_id, vocabulary_table)["rows"]
+
+    def create_staging_path(self, snapshot_id: str) -> Path:
+        """Creates the folder the vocabulary tables are converted in, before they are committed as a snapshot.
+
+        Args:
+            snapshot_id (str): The snapshot id
+
+        Returns:
+            Path: The staging folder
+        """
+        staging_path = self._snapshots_path / f"{snapshot_id}.{os.getpid()}_{get_ident()}.tmp"
+        staging_path.mkdir(parents=True)
+        return staging_path
+
+    def commit(
+        self, snapshot_id: str, staging_path: Path, zip_file_name: str, vocabulary_tables: dict[str, list[Path]]
+    ) -> None:
+        """Writes the manifest of the converted vocabulary tables and turns the staging folder into the snapshot.
+
+        Args:
+            snapshot_id (str): The snapshot id
+            staging_path (Path): The staging folder that holds the Parquet parts
+            zip_file_name (str): The name of the zip file the snapshot was converted from
+            vocabulary_tables (dict[str, list[Path]]): The Parquet parts of every vocabulary table
+        """
+        manifest = {
+            "snapshot_id": snapshot_id,
+            "zip_file_name": zip_file_name,
+            "riab_version": self._riab_version,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "tables": {
+                vocabulary_table: {
+                    "rows": sum(pq.read_metadata(parquet_part).num_rows for parquet_part in parquet_parts),
+                    "schema": {field.name: str(field.type) for field in pq.read_schema(parquet_parts[0])},
+                    "parts": [parquet_part.name for parquet_part in parquet_parts],
+                }
+                for vocabulary_table, parquet_parts in vocabulary_tables.items()
+            },
+        }
+        (staging_path / self._MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="UTF8")
+
+        snapshot_path = self._snapshots_path / snapshot_id
+        if snapshot_path.exists():  # converted by an older RiaB version
+            shutil.rmtree(snapshot_path)
+        staging_path.replace(snapshot_path)
+        logging.info("Stored the vocabularies in vocabulary snapshot '%s'", snapshot_id)
+
+    def discard(self, staging_path: Path) -> None:
+        """Removes a staging folder, after a failed conversion.
+
+        Args:
+            staging_path (Path): The staging folder
+        """
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    def _get_manifest_table(self, snapshot_id: str, vocabulary_table: str) -> dict:
+        manifest_file = self._snapshots_path / snapshot_id / self._MANIFEST_FILE
+        return json.loads(manifest_file.read_text(encoding="UTF8"))["tables"][vocabulary_table]
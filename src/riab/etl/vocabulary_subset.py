@@ -0,0 +1,158 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+"""Holds the subset of the standardised vocabularies that is referenced by a CDM folder"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import polars as pl
+
+
+class VocabularySubset:
+    """
+    Subset of the standardised vocabularies that is referenced by a CDM folder, for development and test environments.
+    The subset holds the concepts of the Usagi CSV's and the concepts that define the domains, vocabularies, concept classes and relationships,
+    the concepts they relate to, their ancestors, their drug strength concepts and the languages of their synonyms.
+    The concept tables are filtered in Polars on the converted Parquet parts, the small vocabulary tables (domain, vocabulary, concept_class and relationship)
+    are kept whole, so the domain, vocabulary and concept class ids of the custom concepts always exist.
+    """  # noqa: E501 # pylint: disable=line-too-long
+
+    # the concepts of the mappings that the ETL adds itself (ex. the OMOP CDM version and EHR type of the metadata)
+    _ETL_CONCEPT_IDS = [0, 756265, 32817]
+
+    _FILTERED_TABLES = ["concept", "concept_ancestor", "concept_relationship", "concept_synonym", "drug_strength"]
+
+    def __init__(self, cdm_folder_path: Path):
+        """Constructor
+
+        Args:
+            cdm_folder_path (Path): The CDM folder that holds the Usagi and custom concept CSV's
+        """
+        self._cdm_folder_path = cdm_folder_path
+        self._concept_ids: Optional[pl.DataFrame] = None
+
+    def is_filtered(self, vocabulary_table: str) -> bool:
+        """Checks that the standardised vocabulary table is filtered to the subset.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+
+        Returns:
+            bool: True if only the subset of the table is imported
+        """
+        return vocabulary_table in self._FILTERED_TABLES
+
+    def compute(self, parquet_parts: dict[str, list[Path]]) -> None:
+        """Computes the concept ids of the subset, from the Parquet parts of the vocabulary release.
+
+        Args:
+            parquet_parts (dict[str, list[Path]]): The Parquet parts of every standardised vocabulary table
+        """
+
+        def scan(vocabulary_table: str) -> pl.LazyFrame:
+            return pl.scan_parquet(parquet_parts[vocabulary_table])
+
+        def concept_ids(lf: pl.LazyFrame, *columns: str) -> list[pl.LazyFrame]:
+            return [lf.select(pl.col(column).cast(pl.Int64).alias("concept_id")) for column in columns]
+
+        def unique(lazy_frames: list[pl.LazyFrame]) -> pl.LazyFrame:
+            return pl.concat(lazy_frames).drop_nulls().unique()
+
+        lf_seeds = unique(
+            [
+                *self._scan_usagi_concept_ids(),
+                pl.LazyFrame({"concept_id": self._ETL_CONCEPT_IDS}, schema={"concept_id": pl.Int64}),
+                *concept_ids(scan("domain"), "domain_concept_id"),
+                *concept_ids(scan("vocabulary"), "vocabulary_concept_id"),
+                *concept_ids(scan("concept_class"), "concept_class_concept_id"),
+                *concept_ids(scan("relationship"), "relationship_concept_id"),
+            ]
+        )
+        # the concepts the seeds relate to (ex. the standard concepts they map to)
+        lf_related = unique(
+            [
+                lf_seeds,
+                *concept_ids(
+                    scan("concept_relationship").join(
+                        lf_seeds, left_on="concept_id_1", right_on="concept_id", how="semi"
+                    ),
+                    "concept_id_2",
+                ),
+            ]
+        )
+        lf_closure = unique(
+            [
+                lf_related,
+                *concept_ids(
+                    scan("concept_ancestor").join(
+                        lf_related, left_on="descendant_concept_id", right_on="concept_id", how="semi"
+                    ),
+                    "ancestor_concept_id",
+                ),
+                *concept_ids(
+                    scan("drug_strength").join(
+                        lf_related, left_on="drug_concept_id", right_on="concept_id", how="semi"
+                    ),
+                    "ingredient_concept_id",
+                    "amount_unit_concept_id",
+                    "numerator_unit_concept_id",
+                    "denominator_unit_concept_id",
+                ),
+            ]
+        )
+        self._concept_ids = unique(
+            [
+                lf_closure,
+                *concept_ids(
+                    scan("concept_synonym").join(lf_closure, on="concept_id", how="semi"), "language_concept_id"
+                ),
+            ]
+        ).collect()
+        logging.info("The vocabulary subset holds %i concepts", len(self._concept_ids))
+
+    def filter(self, vocabulary_table: str, lf_vocabulary_table: pl.LazyFrame) -> pl.LazyFrame:
+        """Filters a standardised vocabulary table to the rows of the concepts in the subset.
+
+        Args:
+            vocabulary_table (str): The standardised vocabulary table
+            lf_vocabulary_table (pl.LazyFrame): The (streamed) content of the standardised vocabulary table
+
+        Returns:
+            pl.LazyFrame: The rows of the subset
+        """
+        if self._concept_ids is None:
+            raise Exception("The concept ids of the vocabulary subset aren't computed yet")
+        concept_id_columns = {
+            "concept": ["concept_id"],
+            "concept_ancestor": ["ancestor_concept_id", "descendant_concept_id"],
+            "concept_relationship": ["concept_id_1", "concept_id_2"],
+            "concept_synonym": ["concept_id"],
+            "drug_strength": ["drug_concept_id"],
+        }[vocabulary_table]
+        schema = lf_vocabulary_table.collect_schema()
+        for concept_id_column in concept_id_columns:
+            lf_vocabulary_table = lf_vocabulary_table.join(
+                self._concept_ids.lazy().select(
+                    pl.col("concept_id").cast(schema[concept_id_column]).alias(concept_id_column)
+                ),
+                on=concept_id_column,
+                how="semi",
+            )
+        return lf_vocabulary_table
+
+    def _scan_usagi_concept_ids(self) -> list[pl.LazyFrame]:
+        """Lazily scans the concept ids of all the Usagi CSV's in the CDM folder.
+
+        Returns:
+            list[pl.LazyFrame]: Lazy frames with the concept_id column
+        """
+        usagi_csv_files = sorted(self._cdm_folder_path.glob("*/*/*_usagi.csv"))
+        logging.debug("Scanning the concept ids of %i Usagi CSV's", len(usagi_csv_files))
+        return [
+            pl.scan_csv(str(usagi_csv_file), schema_overrides={"conceptId": pl.Int64}).select(
+                pl.col("conceptId").alias("concept_id")
+            )
+            for usagi_csv_file in usagi_csv_files
+        ]
@@ -0,0 +1,100 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+import os
+from pathlib import Path
+
+import polars as pl
+
+from riab.etl.csv_cache import CsvCache
+
+_SCHEMA = {"sourceCode": pl.Utf8, "conceptId": pl.Int64}
+
+
+class _Converter:
+    def __init__(self, csv_file: Path, schema: dict = _SCHEMA):
+        self.csv_file = csv_file
+        self.schema = schema
+        self.conversions = 0
+
+    def __call__(self, parquet_file: Path):
+        self.conversions += 1
+        pl.read_csv(self.csv_file, schema=self.schema).write_parquet(parquet_file)
+
+
+def _write_csv(csv_file: Path, content: str, mtime: int):
+    csv_file.write_text(content, encoding="UTF8")
+    os.utime(csv_file, (mtime, mtime))
+
+
+def test_an_unchanged_csv_is_converted_once(tmp_path: Path):
+    csv_file = tmp_path / "sex_usagi.csv"
+    _write_csv(csv_file, "sourceCode,conceptId\nM,8507\n", 1_000)
+    convert = _Converter(csv_file)
+    csv_cache = CsvCache(tmp_path / "cache", 1024 * 1024)
+
+    parquet_file = csv_cache.get_parquet_file(csv_file, _SCHEMA, convert)
+
+    assert CsvCache(tmp_path / "cache", 1024 * 1024).get_parquet_file(csv_file, _SCHEMA, convert) == parquet_file
+    assert convert.conversions == 1
+    assert pl.read_parquet(parquet_file).rows() == [("M", 8507)]
+
+
+def test_a_changed_csv_is_converted_again(tmp_path: Path):
+    csv_file = tmp_path / "sex_usagi.csv"
+    _write_csv(csv_file, "sourceCode,conceptId\nM,8507\n", 1_000)
+    convert = _Converter(csv_file)
+    csv_cache = CsvCache(tmp_path / "cache", 1024 * 1024)
+    fingerprint = csv_cache.get_fingerprint([csv_file], _SCHEMA)
+    parquet_file = csv_cache.get_parquet_file(csv_file, _SCHEMA, convert)
+
+    _write_csv(csv_file, "sourceCode,conceptId\nF,8532\n", 2_000)
+    changed_parquet_file = csv_cache.get_parquet_file(csv_file, _SCHEMA, convert)
+
+    assert changed_parquet_file != parquet_file
+    assert convert.conversions == 2
+    assert pl.read_parquet(changed_parquet_file).rows() == [("F", 8532)]
+    assert csv_cache.get_fingerprint([csv_file], _SCHEMA) != fingerprint
+
+
+def test_a_changed_schema_gets_another_key(tmp_path: Path):
+    csv_file = tmp_path / "sex_usagi.csv"
+    _write_csv(csv_file, "sourceCode,conceptId\nM,8507\n", 1_000)
+    csv_cache = CsvCache(tmp_path / "cache", 1024 * 1024)
+
+    assert csv_cache.get_key(csv_file, _SCHEMA) != csv_cache.get_key(
+        csv_file, {"sourceCode": pl.Utf8, "conceptId": pl.Utf8}
+    )
+
+
+def test_the_least_recently_used_files_are_evicted(tmp_path: Path):
+    cache_path = tmp_path / "cache"
+    csv_files = []
+    for idx in range(4):
+        csv_files.append(tmp_path / f"usagi_{idx}.csv")
+        _write_csv(csv_files[-1], f"sourceCode,conceptId\n{idx},{idx}\n", 1_000)
+    csv_cache = CsvCache(cache_path, 1024 * 1024)
+    parquet_files = [csv_cache.get_parquet_file(csv_file, _SCHEMA, _Converter(csv_file)) for csv_file in csv_files[:3]]
+    # the modification time is the last use, the first file was used longest ago
+    for parquet_file, last_use in zip(parquet_files, [1_000, 3_000, 2_000], strict=True):
+        os.utime(parquet_file, (last_use, last_use))
+
+    # the next run only fits three Parquet files (of the same size)
+    max_size = 3 * parquet_files[0].stat().st_size
+    parquet_files.append(
+        CsvCache(cache_path, max_size).get_parquet_file(csv_files[3], _SCHEMA, _Converter(csv_files[3]))
+    )
+
+    assert [parquet_file.exists() for parquet_file in parquet_files] == [False, True, True, True]
+
+
+def test_the_files_of_the_run_are_never_evicted(tmp_path: Path):
+    csv_files = []
+    for idx in range(2):
+        csv_files.append(tmp_path / f"usagi_{idx}.csv")
+        _write_csv(csv_files[-1], f"sourceCode,conceptId\n{idx},{idx}\n", 1_000)
+    csv_cache = CsvCache(tmp_path / "cache", 1)
+
+    parquet_files = [csv_cache.get_parquet_file(csv_file, _SCHEMA, _Converter(csv_file)) for csv_file in csv_files]
+
+    assert all(parquet_file.exists() for parquet_file in parquet_files)
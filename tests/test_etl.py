@@ -0,0 +1,323 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+from datetime import datetime
+from pathlib import Path
+from threading import Event
+from typing import Optional
+
+import jinja2 as jj
+import polars as pl
+import pytest
+from jinja2.utils import select_autoescape
+
+from riab.etl.etl import Etl
+from riab.etl.etl_base import EtlBase
+from riab.etl.scheduler import WorkScheduler
+from riab.etl.trace import Tracer
+
+
+class _Etl(Etl):
+    """ETL without a database, the database operations of the tested steps are replaced in the tests"""
+
+    def _get_omop_column_names(self, omop_table: str) -> list[str]:
+        return []
+
+    def _get_query_from_sql_file(
+        self, sql_file: Path, omop_table: str, shard_index: Optional[int] = None, all_rows: bool = False
+    ) -> str:
+        select_query = sql_file.read_text(encoding="UTF8")
+        if sql_file.suffix == ".jinja":
+            select_query = self._template_env.from_string(select_query).render(
+                watermark=None if all_rows else self._get_watermark(omop_table),
+                shard=self._get_shard_function(shard_index),
+            )
+        return select_query
+
+    def _get_shard_predicate(self, column: str, shards: int, shard_index: int) -> str:
+        return f"COALESCE(ABS(CHECKSUM({column}) % {shards}), 0) = {shard_index}"
+
+
+_Etl.__abstractmethods__ = frozenset()
+
+
+def _etl(monkeypatch: pytest.MonkeyPatch, cdm_folder_path: Path, dependencies: dict[str, set[str]], **kwargs) -> Etl:
+    def etl_base_init(etl: EtlBase, upload_query_shards: int = 1, **kwargs):
+        etl._cdm_folder_path = cdm_folder_path
+        etl._cdm_tables_fks_dependencies_graph = dependencies
+        etl._omop_etl_tables = list(dependencies)
+        etl._max_parallel_tables = 2
+        etl._omop_cdm_version = "5.4"
+        etl._upload_query_shards = upload_query_shards
+        etl._template_env = jj.Environment(autoescape=select_autoescape(["sql"]))
+        etl._plan_recorder = None
+        etl._tracer = Tracer()
+        etl._vocabulary_index = None
+
+    monkeypatch.setattr(EtlBase, "__init__", etl_base_init)
+    return _Etl(**kwargs)
+
+
+def _write_sql_files(cdm_folder_path: Path, *omop_tables: str):
+    for omop_table in omop_tables:
+        (cdm_folder_path / omop_table).mkdir()
+        (cdm_folder_path / omop_table / f"{omop_table}.sql").write_text("SELECT 1", encoding="UTF8")
+
+
+def test_pipeline_mode_starts_the_upload_queries_before_the_foreign_key_order(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    _write_sql_files(tmp_path, "person", "visit_occurrence")
+    visit_upload_query_started = Event()
+    processed: list[str] = []
+
+    def run_upload_query(sql_file: Path, omop_table: str, *args):
+        if omop_table == "visit_occurrence":
+            visit_upload_query_started.set()
+
+    def process_omop_table(omop_table: str, only_queries=None, upload_query_futures=None):
+        if omop_table == "person":
+            # the upload query of visit_occurrence doesn't wait on its foreign key to person
+            assert visit_upload_query_started.wait(timeout=5)
+        for future in upload_query_futures or []:
+            future.result()
+        processed.append(omop_table)
+
+    etl = _etl(monkeypatch, tmp_path, {"person": set(), "visit_occurrence": {"person"}}, pipeline_upload_queries=True)
+    etl._run_upload_query = run_upload_query
+    etl._process_omop_table = process_omop_table
+    with WorkScheduler(max_workers=2, lane_limits={"upload_queries": 1}) as etl._work_scheduler:
+        etl._process_all_omop_tables()
+
+    assert processed == ["person", "visit_occurrence"]
+
+
+def test_resume_skips_the_steps_that_were_completed_with_the_same_inputs(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    _write_sql_files(tmp_path, "person")
+    (tmp_path / "person" / "patient.sql").write_text("SELECT 2", encoding="UTF8")
+    etl = _etl(monkeypatch, tmp_path, {"person": set()}, resume="20240101000000")
+    input_hashes = etl._get_step_input_hashes("person")
+    etl._completed_steps = {
+        ("person", "upload_query", "person.sql"): input_hashes[("upload_query", "person.sql")],
+        ("person", "upload_query", "patient.sql"): "the hash of a previous version of the query",
+    }
+
+    run_queries: list[str] = []
+    for sql_file in ["person.sql", "patient.sql"]:
+        etl._run_step("person", "upload_query", sql_file, run_queries.append, sql_file)
+
+    assert run_queries == ["patient.sql"]
+    assert etl._pending_completed_steps == [
+        ("person", "upload_query", "patient.sql", input_hashes[("upload_query", "patient.sql")])
+    ]
+
+
+def test_the_inputs_of_the_steps_are_only_hashed_when_a_run_uses_them(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    _write_sql_files(tmp_path, "person")
+    etl = _etl(monkeypatch, tmp_path, {"person": set()})
+    monkeypatch.setattr(etl, "_get_step_input_hashes", lambda omop_table: pytest.fail("the inputs were hashed"))
+
+    run_queries: list[str] = []
+    etl._run_step("person", "upload_query", "person.sql", run_queries.append, "person.sql")
+
+    assert run_queries == ["person.sql"]
+    assert etl._pending_completed_steps == []
+
+
+def test_a_changed_table_invalidates_the_completed_steps_of_the_tables_that_depend_on_it(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    _write_sql_files(tmp_path, "person", "visit_occurrence")
+    dependencies = {"person": set(), "visit_occurrence": {"person"}}
+    input_hashes = _etl(monkeypatch, tmp_path, dependencies)._get_step_input_hashes("visit_occurrence")
+
+    (tmp_path / "person" / "person.sql").write_text("SELECT 2", encoding="UTF8")
+    changed_input_hashes = _etl(monkeypatch, tmp_path, dependencies)._get_step_input_hashes("visit_occurrence")
+
+    assert (
+        changed_input_hashes[("upload_query", "visit_occurrence.sql")]
+        == input_hashes[("upload_query", "visit_occurrence.sql")]
+    )
+    assert changed_input_hashes[("merge", "")] != input_hashes[("merge", "")]
+
+
+def test_a_table_with_an_unchanged_fingerprint_is_skipped(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    _write_sql_files(tmp_path, "person", "visit_occurrence")
+    etl = _etl(monkeypatch, tmp_path, {"person": set(), "visit_occurrence": {"person"}}, skip_unchanged_tables=True)
+    etl._stored_table_fingerprints = {
+        "person": etl._get_step_input_hashes("person")[("merge", "")],
+        "visit_occurrence": "the fingerprint of a previous version of the table",
+    }
+    work_tables: list[str] = []
+    etl._create_omop_work_table = lambda omop_table, events: work_tables.append(omop_table)
+
+    etl._process_omop_table("person")
+
+    assert work_tables == []
+    assert etl._work_skipped
+    assert not etl._is_table_unchanged("visit_occurrence")
+
+
+def test_an_unchanged_table_is_only_skipped_with_skip_unchanged_tables(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    _write_sql_files(tmp_path, "person")
+    etl = _etl(monkeypatch, tmp_path, {"person": set()})
+    etl._stored_table_fingerprints = {"person": etl._get_step_input_hashes("person")[("merge", "")]}
+
+    assert not etl._is_table_unchanged("person")
+
+
+def test_only_the_jinja_queries_with_the_shard_function_are_sharded(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    _write_sql_files(tmp_path, "person")
+    (tmp_path / "person" / "patient.sql.jinja").write_text(
+        "SELECT * FROM patient WHERE {{ shard('patient_id') }}", encoding="UTF8"
+    )
+    (tmp_path / "person" / "employee.sql.jinja").write_text("SELECT * FROM employee", encoding="UTF8")
+    etl = _etl(monkeypatch, tmp_path, {"person": set()}, upload_query_shards=3)
+
+    assert etl._get_upload_query_shard_indexes(tmp_path / "person" / "patient.sql.jinja") == [0, 1, 2]
+    assert etl._get_upload_query_shard_indexes(tmp_path / "person" / "employee.sql.jinja") == [None]
+    assert etl._get_upload_query_shard_indexes(tmp_path / "person" / "person.sql") == [None]
+
+
+def test_every_shard_renders_its_own_predicate(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    _write_sql_files(tmp_path, "person")
+    sql_file = tmp_path / "person" / "patient.sql.jinja"
+    sql_file.write_text("SELECT * FROM patient WHERE {{ shard('patient_id') }}", encoding="UTF8")
+    etl = _etl(monkeypatch, tmp_path, {"person": set()}, upload_query_shards=2)
+
+    assert [etl._get_query_from_sql_file(sql_file, "person", shard_index) for shard_index in [0, 1, None]] == [
+        "SELECT * FROM patient WHERE COALESCE(ABS(CHECKSUM(patient_id) % 2), 0) = 0",
+        "SELECT * FROM patient WHERE COALESCE(ABS(CHECKSUM(patient_id) % 2), 0) = 1",
+        "SELECT * FROM patient WHERE 1 = 1",
+    ]
+    assert [etl._get_upload_table(sql_file, shard_index) for shard_index in [0, 1]] == [
+        "patient__shard0",
+        "patient__shard1",
+    ]
+    assert {item for step, item in etl._get_step_input_hashes("person") if step == "upload_query"} == {
+        "person.sql",
+        "patient.sql.jinja#shard0",
+        "patient.sql.jinja#shard1",
+    }
+
+
+def test_the_metadata_rows_of_riab_keep_their_mapped_concepts_without_usagi_csvs(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    etl = _etl(monkeypatch, tmp_path, {"metadata": set()})
+
+    assert etl._get_mapped_concept_id_columns(
+        "metadata", ["metadata_concept_id", "metadata_type_concept_id", "value_as_concept_id"]
+    ) == ["metadata_concept_id", "metadata_type_concept_id"]
+    usagi = pl.concat(etl._get_usagi_lazy_frames("metadata", "metadata_type_concept_id", [])).collect()
+    assert usagi.select("sourceCode", "conceptId").rows() == [("RIAB_EHR", 32817), ("GIT_EHR", 32817)]
+
+
+def test_a_watermark_query_also_loads_all_the_keys_of_the_source(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    (tmp_path / "person").mkdir()
+    sql_file = tmp_path / "person" / "person.sql.jinja"
+    sql_file.write_text(
+        "SELECT * FROM patients{% if watermark %} WHERE modified >= '{{ watermark.date() }}'{% endif %}",
+        encoding="UTF8",
+    )
+    etl = _etl(monkeypatch, tmp_path, {"person": set()}, incremental=True)
+    monkeypatch.setattr(etl, "_get_pk", lambda omop_table: "person_id")
+    monkeypatch.setattr(etl, "_get_fks", lambda omop_table: {})
+    queries = []
+    monkeypatch.setattr(
+        etl,
+        "_query_into_upload_table",
+        lambda upload_table, select_query, omop_table: queries.append((upload_table, select_query)),
+    )
+    monkeypatch.setattr(
+        etl,
+        "_query_into_keys_table",
+        lambda keys_table, select_query, omop_table, key_columns: queries.append(
+            (keys_table, select_query, key_columns)
+        ),
+    )
+
+    # without a watermark the query returns all the rows, and the table is rebuilt
+    etl._run_upload_query(sql_file, "person")
+    etl._table_watermarks = {"person": datetime(2024, 1, 1)}
+    etl._run_upload_query(sql_file, "person")
+
+    upload_table = etl._get_upload_table(sql_file)
+    assert queries == [
+        (f"person__upload__{upload_table}", "SELECT * FROM patients"),
+        (f"person__upload__{upload_table}", "SELECT * FROM patients WHERE modified >= '2024-01-01'"),
+        (f"person__keys__{upload_table}", "SELECT * FROM patients", ["person_id"]),
+    ]
+
+
+def test_a_combined_mapping_load_only_loads_the_mapped_columns_of_the_tables_of_the_run(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    for omop_table, concept_id_column in [("person", "gender_concept_id"), ("death", "cause_concept_id")]:
+        (tmp_path / omop_table / concept_id_column).mkdir(parents=True)
+        (tmp_path / omop_table / concept_id_column / f"{concept_id_column}_usagi.csv").write_text(
+            "sourceCode,sourceName,mappingStatus,conceptId,conceptName,domainId\nM,Male,APPROVED,8507,MALE,Gender\n",
+            encoding="UTF8",
+        )
+    etl = _etl(
+        monkeypatch,
+        tmp_path,
+        {"person": set(), "death": {"person"}, "metadata": set()},
+        only_omop_table=["person", "metadata"],
+    )
+    etl._csv_cache = None
+    column_names = {
+        "person": ["gender_concept_id", "race_concept_id"],
+        "death": ["cause_concept_id"],
+        "metadata": ["metadata_concept_id", "metadata_type_concept_id", "value_as_concept_id"],
+    }
+    monkeypatch.setattr(etl, "_get_omop_column_names", lambda omop_table: column_names[omop_table])
+    monkeypatch.setattr(etl, "_upload_combined_mapping", lambda *args: None)
+    mapping_views = []
+    monkeypatch.setattr(etl, "_create_mapping_views", lambda *args: mapping_views.append(args))
+
+    etl._upload_combined_mappings()
+
+    assert mapping_views == [
+        (
+            [
+                ("person", "gender_concept_id"),
+                ("metadata", "metadata_concept_id"),
+                ("metadata", "metadata_type_concept_id"),
+            ],
+            [],
+        )
+    ]
+
+
+def test_the_custom_concepts_of_all_the_tables_are_merged_at_once(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    for omop_table, concept_id_column in [
+        ("person", "gender_concept_id"),
+        ("observation", "observation_concept_id"),
+        ("observation", "value_as_concept_id"),
+    ]:
+        (tmp_path / omop_table / concept_id_column / "custom").mkdir(parents=True)
+        (tmp_path / omop_table / concept_id_column / "custom" / f"{concept_id_column}_concept.csv").touch()
+    etl = _etl(monkeypatch, tmp_path, {"person": set(), "observation": {"person"}})
+    column_names = {
+        "person": ["gender_concept_id", "race_concept_id"],
+        "observation": ["observation_concept_id", "value_as_concept_id"],
+    }
+    monkeypatch.setattr(etl, "_get_omop_column_names", lambda omop_table: column_names[omop_table])
+    monkeypatch.setattr(etl, "_process_concept_id_column_mappings", lambda omop_table, concept_id_column: None)
+    monkeypatch.setattr(etl, "_process_omop_table_mappings", lambda omop_table, concept_id_columns: None)
+    merges = []
+    monkeypatch.setattr(etl, "_merge_custom_concepts_with_the_omop_concepts", merges.append)
+
+    with WorkScheduler(max_workers=2) as etl._work_scheduler:
+        etl._process_all_mappings(["person", "observation"])
+
+    assert merges == [
+        [
+            ("person", "gender_concept_id"),
+            ("observation", "observation_concept_id"),
+            ("observation", "value_as_concept_id"),
+        ]
+    ]
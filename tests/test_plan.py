@@ -0,0 +1,47 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+from pathlib import Path
+
+from riab.etl.db import PlanDb
+from riab.etl.plan import PlanRecorder
+
+
+def test_plan_db_records_the_queries_without_running_them(tmp_path: Path):
+    plan_recorder = PlanRecorder()
+    db = PlanDb(plan_recorder)
+
+    with plan_recorder.step("person", "merge"):
+        assert db.run_query("MERGE INTO omop.person", {"etl_start": "2024-01-01"}) == []
+    plan_recorder.write(tmp_path / "plan.sql", {"person": 1}, {})
+
+    plan = (tmp_path / "plan.sql").read_text(encoding="UTF8")
+    assert "-- 1 | person | 1 | 22 | 0.000\n" in plan
+    assert "| table: person | step: merge | query | 22 characters\n" in plan
+    assert "-- parameters: {'etl_start': '2024-01-01'}\nMERGE INTO omop.person;\n" in plan
+
+
+def test_the_plan_lists_the_statements_in_the_order_they_were_issued(tmp_path: Path):
+    plan_recorder = PlanRecorder()
+    plan_recorder.record("CREATE TABLE work.run_history")
+    with plan_recorder.step("visit_occurrence", "upload_queries"):
+        plan_recorder.record("SELECT * FROM raw.visit")
+        with plan_recorder.step("person", "merge"):
+            plan_recorder.record("MERGE INTO omop.person")
+        plan_recorder.record("load visit.parquet", kind="load")
+    plan_recorder.write(tmp_path / "plan.sql", {"person": 1, "visit_occurrence": 2}, {("person", "merge"): 0.25})
+
+    plan = (tmp_path / "plan.sql").read_text(encoding="UTF8")
+    summary = [line for line in plan.splitlines() if line.startswith("-- ") and line.count("|") == 4]
+    assert summary[1:] == [
+        "--  | (run) | 1 | 29 | 0.000",
+        "-- 1 | person | 1 | 22 | 0.250",
+        "-- 2 | visit_occurrence | 2 | 41 | 0.000",
+    ]
+    statements = [line for line in plan.splitlines() if line.startswith("-- #")]
+    assert [statement.split(" | ")[3:6] for statement in statements] == [
+        ["table: (run)", "step: (run)", "query"],
+        ["table: visit_occurrence", "step: upload_queries", "query"],
+        ["table: person", "step: merge", "query"],
+        ["table: visit_occurrence", "step: upload_queries", "load"],
+    ]
@@ -0,0 +1,183 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+import time
+from threading import Event, Lock, Thread
+
+import pytest
+
+from riab.etl.scheduler import DagScheduler, WorkScheduler, get_current_priority, longest_remaining_paths
+
+
+def test_longest_remaining_paths_of_a_chain():
+    dependencies = {"person": set(), "visit_occurrence": {"person"}, "condition_occurrence": {"visit_occurrence"}}
+
+    assert longest_remaining_paths(dependencies) == {"person": 3, "visit_occurrence": 2, "condition_occurrence": 1}
+
+
+def test_longest_remaining_paths_follows_the_most_expensive_branch():
+    dependencies = {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}}
+    costs = {"a": 1, "b": 10, "c": 2, "d": 5}
+
+    assert longest_remaining_paths(dependencies, costs) == {"a": 16, "b": 15, "c": 7, "d": 5}
+
+
+def test_longest_remaining_paths_raises_on_a_circular_reference():
+    with pytest.raises(Exception, match="Circular reference"):
+        longest_remaining_paths({"a": {"b"}, "b": {"a"}})
+
+
+def test_dag_scheduler_starts_a_node_after_its_dependencies():
+    dependencies = {"vocabulary": set(), "person": {"vocabulary"}, "visit": {"person"}, "provider": {"vocabulary"}}
+    finished: list[str] = []
+    lock = Lock()
+
+    def task(node: str):
+        with lock:
+            assert dependencies[node] <= set(finished)
+        time.sleep(0.01)
+        with lock:
+            finished.append(node)
+
+    DagScheduler(max_workers=4).run(dependencies, task)
+
+    assert sorted(finished) == sorted(dependencies)
+
+
+def test_dag_scheduler_ignores_dependencies_outside_the_graph():
+    finished: list[str] = []
+
+    DagScheduler(max_workers=2).run({"person": {"vocabulary"}}, finished.append)
+
+    assert finished == ["person"]
+
+
+def test_dag_scheduler_starts_the_ready_node_with_the_highest_priority_first():
+    started: list[str] = []
+
+    DagScheduler(max_workers=1).run(
+        {"low": set(), "high": set(), "middle": set()}, started.append, {"low": 1, "middle": 2, "high": 3}
+    )
+
+    assert started == ["high", "middle", "low"]
+
+
+def test_dag_scheduler_runs_the_task_with_the_priority_of_the_node():
+    priorities: dict[str, float] = {}
+
+    def task(node: str):
+        priorities[node] = get_current_priority()
+
+    DagScheduler(max_workers=2).run({"a": set(), "b": {"a"}}, task, {"a": 7, "b": 3})
+
+    assert priorities == {"a": 7, "b": 3}
+
+
+def test_dag_scheduler_raises_on_a_circular_reference():
+    with pytest.raises(Exception, match="Circular reference"):
+        DagScheduler(max_workers=2).run({"a": {"b"}, "b": {"a"}}, lambda node: None)
+
+
+def test_dag_scheduler_raises_the_exception_of_a_task():
+    def task(node: str):
+        raise ValueError(node)
+
+    with pytest.raises(ValueError, match="person"):
+        DagScheduler(max_workers=2).run({"person": set()}, task)
+
+
+def test_work_scheduler_starts_the_work_with_the_highest_priority_first():
+    started: list[str] = []
+    release = Event()
+
+    with WorkScheduler(max_workers=1) as work_scheduler:
+        blocker = work_scheduler.submit(release.wait)
+        futures = [
+            work_scheduler.submit(started.append, name, priority=priority)
+            for name, priority in [("low", 1), ("high", 3), ("middle", 2)]
+        ]
+        release.set()
+        work_scheduler.wait_all([blocker, *futures])
+
+    assert started == ["high", "middle", "low"]
+
+
+def test_work_scheduler_limits_the_running_work_of_a_lane():
+    running = 0
+    max_running = 0
+    lock = Lock()
+
+    def work():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    with WorkScheduler(max_workers=4, lane_limits={"mappings": 2}) as work_scheduler:
+        work_scheduler.run_all(work, [() for _ in range(10)], lane="mappings")
+
+    assert max_running == 2
+
+
+def test_work_scheduler_runs_the_work_of_other_lanes_next_to_a_full_lane():
+    release = Event()
+    other_lane_done = Event()
+
+    with WorkScheduler(max_workers=2, lane_limits={"mappings": 1}) as work_scheduler:
+        futures = [work_scheduler.submit(release.wait, lane="mappings") for _ in range(2)]
+        work_scheduler.submit(other_lane_done.set, lane="upload_queries").result(timeout=5)
+        release.set()
+        work_scheduler.wait_all(futures)
+
+    assert other_lane_done.is_set()
+
+
+def test_work_scheduler_raises_the_exception_of_the_work():
+    def work(value: int):
+        if value == 3:
+            raise ValueError(value)
+
+    with WorkScheduler(max_workers=2) as work_scheduler, pytest.raises(ValueError):
+        work_scheduler.run_all(work, [(value,) for value in range(5)])
+
+
+def test_work_scheduler_doesnt_deadlock_when_the_tables_wait_on_their_pipelined_work():
+    # like in pipeline mode, the tables wait (on the threads of the DagScheduler) on their work, that fills both lanes
+    # of a single worker thread
+    done = []
+
+    with WorkScheduler(max_workers=1, lane_limits={"mappings": 1, "upload_queries": 1}) as work_scheduler:
+        futures = {
+            omop_table: [
+                work_scheduler.submit(time.sleep, 0.01, lane=lane)
+                for lane in ["mappings", "upload_queries"]
+                for _ in range(3)
+            ]
+            for omop_table in ["person", "visit_occurrence"]
+        }
+
+        def process_omop_table(omop_table: str):
+            work_scheduler.wait_all(futures[omop_table])
+            done.append(omop_table)
+
+        thread = Thread(
+            target=DagScheduler(max_workers=2).run,
+            args=({"person": set(), "visit_occurrence": {"person"}}, process_omop_table),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert done == ["person", "visit_occurrence"]
+
+
+def test_work_scheduler_raises_when_work_on_the_pool_waits_on_other_work_of_the_pool():
+    with WorkScheduler(max_workers=1) as work_scheduler:
+        future = work_scheduler.submit(lambda: work_scheduler.wait_all([work_scheduler.submit(time.sleep, 0)]))
+
+        with pytest.raises(Exception, match="can't wait on other work of the pool"):
+            future.result(timeout=5)
@@ -0,0 +1,75 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+import json
+from pathlib import Path
+
+import polars as pl
+
+from riab.etl.vocabulary_manifest import VocabularyManifest
+
+
+def _vocabularies(*rows: tuple[str, str, int]) -> pl.LazyFrame:
+    return pl.LazyFrame(
+        rows,
+        schema={"vocabulary_id": pl.Utf8, "vocabulary_name": pl.Utf8, "vocabulary_concept_id": pl.Int64},
+        orient="row",
+    )
+
+
+def test_diff_finds_the_inserted_updated_and_deleted_rows(tmp_path: Path):
+    manifest = VocabularyManifest(tmp_path / "manifest", "project.omop")
+    manifest.write("vocabulary", _vocabularies(("ICD10", "ICD10", 1), ("LOINC", "LOINC", 2), ("SNOMED", "SNOMED", 3)))
+
+    upserts_parquet = tmp_path / "upserts.parquet"
+    deletes_parquet = tmp_path / "deletes.parquet"
+    number_of_upserts, number_of_deletes = manifest.diff(
+        "vocabulary",
+        _vocabularies(("ICD10", "ICD10", 1), ("LOINC", "LOINC 2.77", 2), ("RxNorm", "RxNorm", 4)),
+        upserts_parquet,
+        deletes_parquet,
+    )
+
+    assert (number_of_upserts, number_of_deletes) == (2, 1)
+    assert pl.read_parquet(upserts_parquet).sort("vocabulary_id").rows() == [
+        ("LOINC", "LOINC 2.77", 2),
+        ("RxNorm", "RxNorm", 4),
+    ]
+    assert pl.read_parquet(deletes_parquet).rows() == [("SNOMED",)]
+
+
+def test_diff_of_an_unchanged_release_is_empty(tmp_path: Path):
+    manifest = VocabularyManifest(tmp_path, "project.omop")
+    release = _vocabularies(("ICD10", "ICD10", 1), ("LOINC", "LOINC", 2))
+    manifest.write("vocabulary", release)
+
+    assert manifest.diff("vocabulary", release, tmp_path / "upserts.parquet", tmp_path / "deletes.parquet") == (0, 0)
+
+
+def test_exists_only_after_a_write_with_this_polars_version(tmp_path: Path):
+    manifest = VocabularyManifest(tmp_path, "project.omop")
+    assert not manifest.exists("vocabulary")
+
+    manifest.write("vocabulary", _vocabularies(("ICD10", "ICD10", 1)))
+    assert manifest.exists("vocabulary")
+
+    (manifest.manifest_path / "vocabulary.json").write_text(json.dumps({"polars_version": "0.0.0"}), encoding="UTF8")
+    assert not manifest.exists("vocabulary")
+
+
+def test_every_target_has_its_own_manifest(tmp_path: Path):
+    VocabularyManifest(tmp_path, "project.omop").write("vocabulary", _vocabularies(("ICD10", "ICD10", 1)))
+
+    assert VocabularyManifest(tmp_path, "project.omop").exists("vocabulary")
+    assert not VocabularyManifest(tmp_path, "server\\instance.riab.omop").exists("vocabulary")
+
+
+def test_write_stores_the_row_count_of_the_table(tmp_path: Path):
+    manifest = VocabularyManifest(tmp_path, "project.omop")
+    manifest.write("vocabulary", _vocabularies(("ICD10", "ICD10", 1), ("LOINC", "LOINC", 2)))
+    assert manifest.get_row_count("vocabulary") == 2
+
+    (manifest.manifest_path / "vocabulary.json").write_text(
+        json.dumps({"polars_version": pl.__version__}), encoding="UTF8"
+    )
+    assert manifest.get_row_count("vocabulary") is None
@@ -0,0 +1,56 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+import hashlib
+import json
+from pathlib import Path
+
+import polars as pl
+
+from riab.etl.vocabulary_snapshots import VocabularySnapshots
+
+
+def _convert(vocabulary_snapshots: VocabularySnapshots, snapshot_id: str) -> Path:
+    staging_path = vocabulary_snapshots.create_staging_path(snapshot_id)
+    parquet_parts = [staging_path / f"vocabulary_{idx}.parquet" for idx in range(2)]
+    pl.DataFrame({"vocabulary_id": ["ICD10", "LOINC"]}).write_parquet(parquet_parts[0])
+    pl.DataFrame({"vocabulary_id": ["SNOMED"]}).write_parquet(parquet_parts[1])
+    vocabulary_snapshots.commit(snapshot_id, staging_path, "vocabulary_download_v5.zip", {"vocabulary": parquet_parts})
+    return staging_path
+
+
+def test_the_snapshot_id_is_the_hash_of_the_zip(tmp_path: Path):
+    zip_file = tmp_path / "vocabulary_download_v5.zip"
+    zip_file.write_bytes(b"PK vocabularies")
+
+    assert VocabularySnapshots(tmp_path / "snapshots").get_snapshot_id(zip_file) == (
+        hashlib.sha256(b"PK vocabularies").hexdigest()
+    )
+
+
+def test_a_committed_snapshot_holds_the_parquet_parts_and_row_counts(tmp_path: Path):
+    vocabulary_snapshots = VocabularySnapshots(tmp_path)
+    assert not vocabulary_snapshots.exists("abc")
+
+    staging_path = _convert(vocabulary_snapshots, "abc")
+
+    assert not staging_path.exists()
+    assert vocabulary_snapshots.exists("abc")
+    assert vocabulary_snapshots.get_number_of_records("abc", "vocabulary") == 3
+    assert vocabulary_snapshots.get_parquet_parts("abc", "vocabulary") == [
+        tmp_path / "abc" / "vocabulary_0.parquet",
+        tmp_path / "abc" / "vocabulary_1.parquet",
+    ]
+
+
+def test_a_snapshot_converted_by_another_riab_version_is_converted_again(tmp_path: Path):
+    vocabulary_snapshots = VocabularySnapshots(tmp_path)
+    _convert(vocabulary_snapshots, "abc")
+    manifest_file = tmp_path / "abc" / "manifest.json"
+    manifest = json.loads(manifest_file.read_text(encoding="UTF8"))
+    manifest_file.write_text(json.dumps(manifest | {"riab_version": "0.0.0"}), encoding="UTF8")
+
+    assert not vocabulary_snapshots.exists("abc")
+
+    _convert(vocabulary_snapshots, "abc")
+    assert vocabulary_snapshots.exists("abc")
@@ -0,0 +1,89 @@
+# Copyright 2024 RADar-AZDelta
+# SPDX-License-Identifier: gpl3+
+
+from pathlib import Path
+
+import polars as pl
+
+from riab.etl.vocabulary_subset import VocabularySubset
+
+
+def _write_parquet_parts(path: Path, tables: dict[str, dict[str, list]]) -> dict[str, list[Path]]:
+    parquet_parts = {}
+    for vocabulary_table, columns in tables.items():
+        parquet_part = path / f"{vocabulary_table}.parquet"
+        pl.DataFrame(columns, schema={column: pl.Int64 for column in columns}).write_parquet(parquet_part)
+        parquet_parts[vocabulary_table] = [parquet_part]
+    return parquet_parts
+
+
+def test_the_subset_holds_the_closure_of_the_mapped_concepts(tmp_path: Path):
+    cdm_folder_path = tmp_path / "omop"
+    (cdm_folder_path / "drug_exposure" / "drug_concept_id").mkdir(parents=True)
+    (cdm_folder_path / "drug_exposure" / "drug_concept_id" / "drugs_usagi.csv").write_text(
+        "sourceCode,conceptId\nparacetamol,1\n", encoding="UTF8"
+    )
+    parquet_parts = _write_parquet_parts(
+        tmp_path,
+        {
+            "concept": {"concept_id": [1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 12, 13, 99]},
+            # 1 maps to 2, and 2 maps to 7 (a second hop, that isn't part of the subset)
+            "concept_relationship": {"concept_id_1": [1, 2, 99], "concept_id_2": [2, 7, 98]},
+            "concept_ancestor": {"ancestor_concept_id": [3, 97], "descendant_concept_id": [2, 99]},
+            "drug_strength": {
+                "drug_concept_id": [2],
+                "ingredient_concept_id": [4],
+                "amount_unit_concept_id": [5],
+                "numerator_unit_concept_id": [None],
+                "denominator_unit_concept_id": [None],
+            },
+            "concept_synonym": {"concept_id": [3, 99], "language_concept_id": [6, 96]},
+            "domain": {"domain_concept_id": [10]},
+            "vocabulary": {"vocabulary_concept_id": [11]},
+            "concept_class": {"concept_class_concept_id": [12]},
+            "relationship": {"relationship_concept_id": [13]},
+        },
+    )
+
+    vocabulary_subset = VocabularySubset(cdm_folder_path)
+    vocabulary_subset.compute(parquet_parts)
+    concept_ids = (
+        vocabulary_subset.filter("concept", pl.scan_parquet(parquet_parts["concept"])).collect()["concept_id"].to_list()
+    )
+
+    assert sorted(concept_ids) == [1, 2, 3, 4, 5, 6, 10, 11, 12, 13]
+
+
+def test_the_relationships_are_filtered_on_both_concepts(tmp_path: Path):
+    cdm_folder_path = tmp_path / "omop"
+    cdm_folder_path.mkdir()
+    parquet_parts = _write_parquet_parts(
+        tmp_path,
+        {
+            "concept_relationship": {"concept_id_1": [0, 0, 5], "concept_id_2": [32817, 5, 0]},
+            "concept_ancestor": {"ancestor_concept_id": [], "descendant_concept_id": []},
+            "drug_strength": {
+                "drug_concept_id": [],
+                "ingredient_concept_id": [],
+                "amount_unit_concept_id": [],
+                "numerator_unit_concept_id": [],
+                "denominator_unit_concept_id": [],
+            },
+            "concept_synonym": {"concept_id": [], "language_concept_id": []},
+            "domain": {"domain_concept_id": []},
+            "vocabulary": {"vocabulary_concept_id": []},
+            "concept_class": {"concept_class_concept_id": []},
+            "relationship": {"relationship_concept_id": []},
+        },
+    )
+
+    vocabulary_subset = VocabularySubset(cdm_folder_path)
+    vocabulary_subset.compute(parquet_parts)
+    relationships = vocabulary_subset.filter(
+        "concept_relationship", pl.scan_parquet(parquet_parts["concept_relationship"])
+    ).collect()
+
+    # the concepts the ETL adds itself are part of the subset, concept 5 only through its relationship with 0
+    assert sorted(relationships.rows()) == [(0, 5), (0, 32817), (5, 0)]
+    assert vocabulary_subset.is_filtered("concept_relationship")
+    assert not vocabulary_subset.is_filtered("vocabulary")